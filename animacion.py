@@ -0,0 +1,581 @@
+"""
+Este script crea una animación con los sismos registrados dentro de la CDMX a lo largo del tiempo.
+
+Cada cuadro es el mapa de cdmx.py con los sismos de un mes o una semana,
+ya sea acumulados desde el inicio o dentro de una ventana móvil. Los sismos
+se ordenan una sola vez y los renglones de cada cuadro se obtienen con una
+búsqueda binaria, sin volver a filtrar el catálogo.
+
+Los cuadros se reparten en bloques entre varios procesos. Cada proceso abre
+el catálogo compartido (np.memmap) en lugar de recibir o leer su propia
+copia, crea los cuadros de su bloque uno por uno y los exporta. Después
+ffmpeg los une leyéndolos uno por uno, así la memoria no crece con la
+duración de la animación.
+
+"""
+
+import glob
+import os
+import shutil
+import subprocess
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from PIL import Image
+
+from catalogo import CARPETA_CACHE, abrir_compartido, preparar_compartido
+from cdmx import BINS, MESES, crear_mapa_base
+from exportar import crear_pool, ejecutar_en_paralelo, exportar_figura
+from grupos import dividir_por_rangos
+from instrumentacion import etapa
+
+
+# La frecuencia de los cuadros, como periodos de pandas.
+FRECUENCIAS = {"mes": "M", "semana": "W"}
+
+# La carpeta donde se guardan los cuadros antes de unirlos.
+CARPETA_CUADROS = os.path.join(CARPETA_CACHE, "cuadros")
+
+# El máximo de cuadros en espera por proceso.
+CUADROS_POR_PROCESO = 2
+
+# El número de cuadros que crea y exporta cada proceso por tarea.
+CUADROS_POR_BLOQUE = 25
+
+# El primer año de la animación.
+AÑO_INICIAL = 2010
+
+
+def main(
+    frecuencia="mes",
+    ventana=None,
+    salida="./cdmx.gif",
+    fps=10,
+    procesos=None,
+    df=None,
+):
+    """
+    Crea la animación de los sismos registrados dentro de la CDMX desde 2010.
+
+    Parameters
+    ----------
+    frecuencia : str
+        La duración de cada cuadro, "mes" o "semana".
+
+    ventana : int
+        El número de periodos que se muestran en cada cuadro. Si no se
+        especifica, los sismos se acumulan desde el inicio.
+
+    salida : str
+        La ruta de la animación, con extensión .gif, .apng o .mp4.
+
+    fps : int
+        Los cuadros por segundo.
+
+    procesos : int
+        El número de procesos para exportar los cuadros.
+
+    df : pandas.DataFrame
+        El catálogo ya cargado. Si se especifica, los cuadros se crean en
+        este proceso y solo se exportan en los demás. Si no, cada proceso
+        crea sus cuadros desde el catálogo compartido.
+
+    """
+
+    carpeta_compartida = None
+
+    if df is None:
+        with etapa("animacion.carga") as registro:
+            carpeta_compartida = preparar_compartido()
+            df = abrir_compartido(carpeta_compartida, año_inicial=AÑO_INICIAL)
+            registro.renglones = len(df)
+
+    # Los cuadros se crean mientras se exportan, por eso se miden juntos.
+    with etapa("animacion.cuadros") as registro:
+        if carpeta_compartida is None:
+            cuadros = crear_cuadros(df, frecuencia, ventana)
+            rutas = exportar_cuadros(cuadros, CARPETA_CUADROS, procesos)
+        else:
+            _, periodos = preparar_sismos(df, frecuencia)
+            rutas = exportar_cuadros_compartidos(
+                carpeta_compartida,
+                len(periodos),
+                frecuencia,
+                ventana,
+                CARPETA_CUADROS,
+                procesos,
+            )
+
+        registro.renglones = len(rutas)
+
+    with etapa("animacion.ensamblado"):
+        ensamblar_animacion(rutas, salida, fps)
+
+
+def calcular_limites(fechas, periodos, ventana=None):
+    """
+    Calcula el primer y el último renglón de cada cuadro.
+
+    Parameters
+    ----------
+    fechas : pandas.DatetimeIndex
+        Las fechas de los sismos, ordenadas.
+
+    periodos : pandas.PeriodIndex
+        Los periodos de la animación, uno por cuadro.
+
+    ventana : int
+        El número de periodos por cuadro, None para acumular desde el inicio.
+
+    Returns
+    -------
+    tuple
+        Dos arreglos con el inicio (inclusive) y el fin (exclusive) de
+        cada cuadro, como posiciones dentro de las fechas.
+
+    """
+
+    fechas = fechas.to_numpy()
+
+    # Cada cuadro termina donde empieza el siguiente periodo.
+    finales = np.searchsorted(fechas, (periodos + 1).start_time.to_numpy())
+
+    if ventana is None:
+        inicios = np.zeros_like(finales)
+    else:
+        primeros = (periodos - (ventana - 1)).start_time
+        inicios = np.searchsorted(fechas, primeros.to_numpy())
+
+    return inicios, finales
+
+
+def etiquetar_periodo(periodo, frecuencia):
+    """
+    Regresa el texto que identifica a un cuadro, por ejemplo "Octubre 2024".
+    """
+
+    if frecuencia == "mes":
+        return f"{MESES[periodo.month]} {periodo.year}"
+
+    return f"Semana del {periodo.start_time:%d/%m/%Y}"
+
+
+def preparar_sismos(df, frecuencia="mes"):
+    """
+    Escoge los sismos de la animación y calcula sus periodos.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El catálogo de sismos. No se modifica.
+
+    frecuencia : str
+        La duración de cada cuadro, "mes" o "semana".
+
+    Returns
+    -------
+    tuple
+        Los sismos de la CDMX con magnitud, ordenados por fecha, y los
+        periodos de la animación, uno por cuadro.
+
+    """
+
+    # Escogemos solamente sismos ocurridos en la CDMX y con magnitud.
+    df = df[(df["estado"] == "CDMX") & df["Magnitud"].notna()]
+    df = df.sort_index(kind="stable")
+
+    if df.empty:
+        raise ValueError("No hay sismos de la CDMX con magnitud para animar.")
+
+    periodos = pd.period_range(
+        df.index.min(), df.index.max(), freq=FRECUENCIAS[frecuencia]
+    )
+
+    return df, periodos
+
+
+def crear_cuadros(df, frecuencia="mes", ventana=None, primero=0, ultimo=None):
+    """
+    Crea los cuadros de la animación uno por uno.
+
+    Los sismos se dividen por rango de magnitud y se ordenan una sola vez.
+    Cada cuadro solo toma una rebanada de cada rango y reemplaza los
+    sismos del mapa base.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El catálogo de sismos. No se modifica.
+
+    frecuencia : str
+        La duración de cada cuadro, "mes" o "semana".
+
+    ventana : int
+        El número de periodos por cuadro, None para acumular desde el inicio.
+
+    primero, ultimo : int
+        Opcionalmente, solo se crean los cuadros en este rango (el último
+        no se incluye), ver exportar_bloque().
+
+    Yields
+    ------
+    str
+        Cada cuadro como figura en formato JSON.
+
+    """
+
+    df, periodos = preparar_sismos(df, frecuencia)
+
+    # Cada rango conserva el orden por fecha, así sus límites se pueden
+    # calcular para todos los cuadros de una sola vez.
+    grupos = dividir_por_rangos(df, [(start, end) for start, end, _, _ in BINS])
+
+    columnas = [
+        (
+            grupo["Longitud"].to_numpy(),
+            grupo["Latitud"].to_numpy(),
+            grupo["Magnitud"].to_numpy() * 4,
+        )
+        for grupo in grupos
+    ]
+
+    limites = [calcular_limites(grupo.index, periodos, ventana) for grupo in grupos]
+
+    fig = crear_mapa_base()
+
+    for i in range(*slice(primero, ultimo).indices(len(periodos))):
+        periodo = periodos[i]
+
+        # Quitamos los sismos del cuadro anterior y conservamos el Choropleth.
+        fig.data = fig.data[:1]
+
+        total = 0
+
+        for (_, _, color, nombre), (lon, lat, tamaño), (inicios, finales) in zip(
+            BINS, columnas, limites
+        ):
+            inicio, fin = inicios[i], finales[i]
+            cantidad = fin - inicio
+            total += cantidad
+
+            fig.add_traces(
+                go.Scattergeo(
+                    lon=lon[inicio:fin],
+                    lat=lat[inicio:fin],
+                    marker_color=color,
+                    marker_size=tamaño[inicio:fin],
+                    marker_line_width=2.25,
+                    marker_opacity=1.0,
+                    marker_symbol="circle-open",
+                    name=f"{nombre} ({cantidad} sismos)"
+                    if cantidad != 1
+                    else f"{nombre} ({cantidad} sismo)",
+                )
+            )
+
+        fig.update_layout(
+            annotations=[
+                dict(
+                    x=0.94,
+                    y=0.95,
+                    xanchor="right",
+                    yanchor="top",
+                    text=f"<b>{etiquetar_periodo(periodo, frecuencia)}</b>",
+                    borderpad=10,
+                    bordercolor="#FFFFFF",
+                    borderwidth=1.0,
+                    bgcolor="#1B4242",
+                    font_size=24,
+                ),
+                dict(
+                    x=0.5,
+                    y=1.015,
+                    xanchor="center",
+                    yanchor="top",
+                    text="Sismos registrados con epicentro cerca o dentro de la <b>Ciudad de México</b>",
+                    font_size=26,
+                ),
+                dict(
+                    x=0.06,
+                    y=-0.039,
+                    xanchor="left",
+                    yanchor="top",
+                    text="Fuente: SSN (01/10/2024)",
+                    font_size=22,
+                ),
+                dict(
+                    x=0.5,
+                    y=-0.039,
+                    xanchor="center",
+                    yanchor="top",
+                    text=f"<b>{total}</b> registros",
+                    font_size=22,
+                ),
+                dict(
+                    x=0.96,
+                    y=-0.039,
+                    xanchor="right",
+                    yanchor="top",
+                    text="🧁 @lapanquecita",
+                    font_size=22,
+                ),
+            ],
+        )
+
+        yield fig.to_json()
+
+
+def exportar_cuadros(cuadros, carpeta=CARPETA_CUADROS, procesos=None):
+    """
+    Exporta los cuadros a PNG usando varios procesos.
+
+    Solo se mantienen en memoria unos cuantos cuadros por proceso: el
+    siguiente cuadro se crea hasta que alguno de los anteriores terminó.
+
+    Parameters
+    ----------
+    cuadros : iterable
+        Los cuadros como figuras en formato JSON, ver crear_cuadros().
+
+    carpeta : str
+        La carpeta donde se guardan los cuadros.
+
+    procesos : int
+        El número de procesos a utilizar. Si no se especifica se usa
+        el número de núcleos.
+
+    Returns
+    -------
+    list
+        Las rutas de los cuadros, en orden.
+
+    """
+
+    if procesos is None:
+        procesos = os.cpu_count() or 1
+
+    limpiar_cuadros(carpeta)
+
+    rutas = list()
+    pendientes = set()
+
+    with crear_pool(procesos) as executor:
+        for i, spec in enumerate(cuadros):
+            if len(pendientes) >= procesos * CUADROS_POR_PROCESO:
+                terminados, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+
+                # Propagamos cualquier error de los procesos.
+                for futuro in terminados:
+                    futuro.result()
+
+            ruta = os.path.join(carpeta, f"cuadro_{i:05d}.png")
+            pendientes.add(executor.submit(exportar_figura, spec, ruta))
+            rutas.append(ruta)
+
+        for futuro in pendientes:
+            futuro.result()
+
+    return rutas
+
+
+def exportar_bloque(carpeta_compartida, primero, ultimo, frecuencia, ventana, carpeta):
+    """
+    Crea y exporta un bloque de cuadros dentro de un proceso del pool.
+
+    El catálogo se abre desde el almacén compartido, así los procesos no
+    reciben ni leen su propia copia. Solo los sismos de la CDMX se copian
+    a la memoria del proceso.
+
+    Parameters
+    ----------
+    carpeta_compartida : str
+        La carpeta del almacén compartido, ver catalogo.preparar_compartido().
+
+    primero, ultimo : int
+        El rango de cuadros del bloque (el último no se incluye).
+
+    frecuencia, ventana, carpeta
+        Ver exportar_cuadros_compartidos().
+
+    Returns
+    -------
+    list
+        Las rutas de los cuadros del bloque, en orden.
+
+    """
+
+    df = abrir_compartido(carpeta_compartida, año_inicial=AÑO_INICIAL)
+    rutas = list()
+
+    for i, spec in enumerate(
+        crear_cuadros(df, frecuencia, ventana, primero, ultimo), start=primero
+    ):
+        ruta = os.path.join(carpeta, f"cuadro_{i:05d}.png")
+        exportar_figura(spec, ruta)
+        rutas.append(ruta)
+
+    return rutas
+
+
+def exportar_cuadros_compartidos(
+    carpeta_compartida,
+    cuadros,
+    frecuencia="mes",
+    ventana=None,
+    carpeta=CARPETA_CUADROS,
+    procesos=None,
+):
+    """
+    Crea y exporta los cuadros en varios procesos desde el catálogo compartido.
+
+    Los cuadros se reparten en bloques de CUADROS_POR_BLOQUE. Cada proceso
+    solo recibe la carpeta del almacén compartido y el rango de su bloque,
+    ver exportar_bloque().
+
+    Parameters
+    ----------
+    carpeta_compartida : str
+        La carpeta del almacén compartido, ver catalogo.preparar_compartido().
+
+    cuadros : int
+        El número de cuadros de la animación.
+
+    frecuencia : str
+        La duración de cada cuadro, "mes" o "semana".
+
+    ventana : int
+        El número de periodos por cuadro, None para acumular desde el inicio.
+
+    carpeta : str
+        La carpeta donde se guardan los cuadros.
+
+    procesos : int
+        El número de procesos a utilizar. Si no se especifica se usa
+        el número de núcleos.
+
+    Returns
+    -------
+    list
+        Las rutas de los cuadros, en orden.
+
+    """
+
+    limpiar_cuadros(carpeta)
+
+    argumentos = [
+        (
+            carpeta_compartida,
+            primero,
+            min(primero + CUADROS_POR_BLOQUE, cuadros),
+            frecuencia,
+            ventana,
+            carpeta,
+        )
+        for primero in range(0, cuadros, CUADROS_POR_BLOQUE)
+    ]
+
+    bloques = ejecutar_en_paralelo(
+        exportar_bloque, argumentos, procesos, con_kaleido=True
+    )
+
+    return [ruta for rutas in bloques for ruta in rutas]
+
+
+def limpiar_cuadros(carpeta):
+    """
+    Crea la carpeta de los cuadros y borra los de una animación anterior.
+    """
+
+    os.makedirs(carpeta, exist_ok=True)
+
+    for anterior in glob.glob(os.path.join(carpeta, "cuadro_*.png")):
+        os.remove(anterior)
+
+
+def ensamblar_animacion(rutas, salida, fps=10):
+    """
+    Une los cuadros en una animación GIF, APNG o MP4.
+
+    Los tres formatos se crean con ffmpeg, el cual lee y codifica los
+    cuadros uno por uno, así la memoria no crece con el número de cuadros.
+    Los GIF se crean en dos pasadas: primero se calcula la paleta de
+    colores de todos los cuadros y después se codifican con ella.
+
+    Sin ffmpeg, los GIF y APNG se crean con Pillow, el cual carga todos los
+    cuadros en memoria antes de codificarlos. Solo conviene para
+    animaciones cortas.
+
+    Parameters
+    ----------
+    rutas : list
+        Las rutas de los cuadros, en orden.
+
+    salida : str
+        La ruta de la animación. El formato se obtiene de la extensión.
+
+    fps : int
+        Los cuadros por segundo.
+
+    """
+
+    extension = os.path.splitext(salida)[1].lower()
+
+    if extension not in (".gif", ".apng", ".mp4"):
+        raise ValueError(f"Formato de animación no soportado: {extension}")
+
+    if shutil.which("ffmpeg") is None:
+        if extension == ".mp4":
+            raise RuntimeError("Se necesita ffmpeg para crear animaciones MP4.")
+
+        ensamblar_con_pillow(rutas, salida, fps)
+        return
+
+    patron = os.path.join(os.path.dirname(rutas[0]), "cuadro_%05d.png")
+    entrada = ["ffmpeg", "-y", "-loglevel", "error", "-framerate", str(fps)]
+    entrada += ["-i", patron]
+
+    if extension == ".mp4":
+        subprocess.run(
+            [*entrada, "-c:v", "libx264", "-pix_fmt", "yuv420p", salida], check=True
+        )
+
+    elif extension == ".apng":
+        subprocess.run([*entrada, "-plays", "0", "-f", "apng", salida], check=True)
+
+    else:
+        paleta = os.path.join(os.path.dirname(rutas[0]), "paleta.png")
+
+        subprocess.run([*entrada, "-vf", "palettegen", paleta], check=True)
+        subprocess.run(
+            [*entrada, "-i", paleta, "-lavfi", "paletteuse", "-loop", "0", salida],
+            check=True,
+        )
+
+        os.remove(paleta)
+
+
+def ensamblar_con_pillow(rutas, salida, fps=10):
+    """
+    Une los cuadros en un GIF o APNG con Pillow, cargándolos todos en memoria.
+    """
+
+    def leer(ruta):
+        with Image.open(ruta) as imagen:
+            return imagen.convert("RGB")
+
+    leer(rutas[0]).save(
+        salida,
+        format="GIF" if salida.lower().endswith(".gif") else "PNG",
+        save_all=True,
+        append_images=[leer(ruta) for ruta in rutas[1:]],
+        duration=1000 // fps,
+        loop=0,
+    )
+
+
+if __name__ == "__main__":
+    main()
+
+    # main(frecuencia="semana", ventana=4, salida="./cdmx.mp4")
@@ -0,0 +1,100 @@
+"""
+Compara la carga del catálogo desde el CSV contra la carga desde el almacén.
+
+Se mide read_csv sin normalizar (como lo hacían los scripts), leer_csv()
+(lectura y normalización), la creación del almacén y la carga del catálogo
+completo desde el almacén ya creado, junto con su tamaño en disco. También
+se mide una carga filtrada por magnitud (M >= 6, como strip_chart.py), la
+cual solo lee los row groups que pueden coincidir.
+
+El programa termina con un error si la carga desde el almacén no es al
+menos ACELERACION_MINIMA veces más rápida que read_csv o si la carga
+filtrada no es al menos REDUCCION_FILTRADO veces más rápida que la completa.
+
+Se ejecuta desde la raíz del repositorio:
+
+python -m benchmarks.almacen 1000000
+
+"""
+
+import os
+import sys
+import time
+
+import pandas as pd
+
+from benchmarks.estados import medir
+from benchmarks.etapas import preparar_csv
+from catalogo import (
+    actualizar_almacen,
+    carpeta_almacen,
+    cargar_catalogo,
+    leer_csv,
+    reporte_memoria,
+)
+
+
+# Cuántas veces más rápida debe ser la carga desde el almacén que read_csv.
+ACELERACION_MINIMA = 3
+
+# Cuántas veces más rápida debe ser la carga filtrada que la completa.
+REDUCCION_FILTRADO = 4
+
+
+def tamaño_carpeta(carpeta):
+    """
+    Regresa el tamaño en MB de todos los archivos de una carpeta.
+    """
+
+    total = 0
+
+    for raiz, _, archivos in os.walk(carpeta):
+        for archivo in archivos:
+            total += os.path.getsize(os.path.join(raiz, archivo))
+
+    return total / 1024**2
+
+
+def main(renglones=1_000_000):
+    ruta = preparar_csv(renglones)
+
+    tiempo_csv, _ = medir(
+        lambda: pd.read_csv(ruta, parse_dates=["Fecha"], index_col="Fecha")
+    )
+    tiempo_normalizado, _ = medir(lambda: leer_csv(ruta))
+
+    inicio = time.perf_counter()
+    actualizar_almacen(ruta, forzar=True)
+    tiempo_creacion = time.perf_counter() - inicio
+
+    tiempo_almacen, df = medir(lambda: cargar_catalogo(ruta))
+    tiempo_filtrado, filtrado = medir(lambda: cargar_catalogo(ruta, magnitud_minima=6))
+
+    memoria = reporte_memoria(df).loc["Total", "bytes"] / 1024**2
+
+    print(f"Renglones: {renglones:,}")
+    print(f"read_csv:            {tiempo_csv:.3f} s")
+    print(f"leer_csv:            {tiempo_normalizado:.3f} s")
+    print(f"creación almacén:    {tiempo_creacion:.3f} s")
+    print(f"carga del almacén:   {tiempo_almacen:.3f} s")
+    print(f"almacén en disco:    {tamaño_carpeta(carpeta_almacen(ruta)):.1f} MB")
+    print(f"catálogo en memoria: {memoria:.1f} MB")
+    print(f"carga M >= 6:        {tiempo_filtrado:.3f} s ({len(filtrado):,} sismos)")
+    print(f"Aceleración contra read_csv: {tiempo_csv / tiempo_almacen:.1f}x")
+    print(f"Carga filtrada contra completa: {tiempo_almacen / tiempo_filtrado:.1f}x")
+
+    if tiempo_almacen * ACELERACION_MINIMA > tiempo_csv:
+        sys.exit(
+            f"La carga desde el almacén no es {ACELERACION_MINIMA}x más rápida "
+            "que read_csv."
+        )
+
+    if tiempo_filtrado * REDUCCION_FILTRADO > tiempo_almacen:
+        sys.exit(
+            f"La carga filtrada no es {REDUCCION_FILTRADO}x más rápida "
+            "que la completa."
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(valor) for valor in sys.argv[1:]))
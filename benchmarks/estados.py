@@ -0,0 +1,103 @@
+"""
+Compara la extracción del estado usando apply contra la versión vectorizada.
+
+La versión vectorizada debe ser al menos ACELERACION_MINIMA veces más
+rápida, de lo contrario el programa termina con un error.
+
+Se ejecuta desde la raíz del repositorio:
+
+python -m benchmarks.estados
+
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from catalogo import ESTADOS, extraer_estados
+
+
+# Direcciones usadas por el SSN en la referencia de localización.
+DIRECCIONES = ["N", "NE", "E", "SE", "S", "SW", "W", "NW", "NNE", "ENE", "ESE", "SSE"]
+
+# La aceleración mínima aceptable contra apply.
+ACELERACION_MINIMA = 10
+
+
+def crear_referencias(renglones, semilla=0):
+    """
+    Crea una columna sintética con el formato de la "Referencia de localizacion".
+
+    Parameters
+    ----------
+    renglones : int
+        El número de referencias a crear.
+
+    semilla : int
+        La semilla del generador aleatorio.
+
+    Returns
+    -------
+    pandas.Series
+        Textos del tipo "12 km al SW de PINOTEPA NACIONAL, OAX".
+
+    """
+
+    rng = np.random.default_rng(semilla)
+
+    distancias = rng.integers(1, 300, renglones).astype(str)
+    direcciones = rng.choice(DIRECCIONES, renglones)
+    ciudades = np.char.add("CIUDAD ", rng.integers(0, 500, renglones).astype(str))
+    estados = rng.choice(ESTADOS, renglones)
+
+    referencias = np.char.add(distancias, " km al ")
+    referencias = np.char.add(referencias, direcciones)
+    referencias = np.char.add(referencias, " de ")
+    referencias = np.char.add(referencias, ciudades)
+    referencias = np.char.add(referencias, ", ")
+    referencias = np.char.add(referencias, estados)
+
+    return pd.Series(referencias.astype(object))
+
+
+def medir(funcion, repeticiones=3):
+    """
+    Regresa el mejor tiempo en segundos de varias ejecuciones de una función.
+    """
+
+    tiempos = list()
+
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+
+    return min(tiempos), resultado
+
+
+def main(renglones=1_000_000):
+    referencias = crear_referencias(renglones)
+
+    tiempo_apply, original = medir(
+        lambda: referencias.apply(lambda x: x.split(",")[-1].strip())
+    )
+
+    tiempo_vectorizado, vectorizado = medir(lambda: extraer_estados(referencias))
+
+    # Ambos métodos deben dar exactamente el mismo resultado.
+    assert (pd.Series(vectorizado).astype(str) == original).all()
+
+    print(f"Renglones: {renglones:,}")
+    print(f"apply:       {tiempo_apply:.3f} s")
+    print(f"vectorizado: {tiempo_vectorizado:.3f} s")
+    aceleracion = tiempo_apply / tiempo_vectorizado
+    print(f"Aceleración: {aceleracion:.1f}x")
+
+    if aceleracion < ACELERACION_MINIMA:
+        sys.exit(f"La aceleración es menor a {ACELERACION_MINIMA}x.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+Mide cada etapa de las gráficas con catálogos sintéticos de varios tamaños.
+
+Las etapas son la lectura del CSV, la limpieza de las columnas numéricas
+(como la magnitud), la extracción del estado y, para cada gráfica (cdmx,
+magnitud, strip_chart y top10), el filtrado y agrupación, la creación de
+la figura y su exportación a imagen.
+
+Los catálogos sintéticos se guardan en benchmarks/datos para reutilizarlos y
+los resultados se guardan como JSON en benchmarks/resultados, junto con las
+versiones de las librerías y el commit, para comparar entre versiones.
+
+Se ejecuta desde la raíz del repositorio:
+
+python -m benchmarks.etapas 10000 1000000 10000000
+
+python -m benchmarks.etapas 10000 --sin-imagenes
+
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from importlib import metadata
+
+import numpy as np
+import pandas as pd
+import plotly
+import plotly.io as pio
+
+import cdmx
+import magnitud
+import strip_chart
+import top10
+from benchmarks.sintetico import escribir_catalogo
+from catalogo import COLUMNAS_CATEGORICAS, COLUMNAS_NUMERICAS, extraer_estados
+
+
+CARPETA_DATOS = os.path.join("benchmarks", "datos")
+CARPETA_RESULTADOS = os.path.join("benchmarks", "resultados")
+
+# Los tamaños por defecto del catálogo sintético.
+TAMAÑOS = [10_000, 1_000_000, 10_000_000]
+
+
+def preparar_csv(renglones):
+    """
+    Regresa la ruta de un catálogo sintético, creándolo si no existe.
+    """
+
+    os.makedirs(CARPETA_DATOS, exist_ok=True)
+    ruta = os.path.join(CARPETA_DATOS, f"sintetico_{renglones}.csv")
+
+    if not os.path.exists(ruta):
+        escribir_catalogo(ruta, renglones)
+
+    return ruta
+
+
+def limpiar_numericos(df):
+    """
+    Convierte las columnas numéricas a float32, igual que catalogo.normalizar().
+    """
+
+    for columna in COLUMNAS_NUMERICAS:
+        df[columna] = pd.to_numeric(df[columna], errors="coerce").astype(np.float32)
+
+
+def agregar_estados(df):
+    """
+    Agrega las columnas de estado y mes, igual que catalogo.normalizar().
+    """
+
+    df["estado"] = extraer_estados(df["Referencia de localizacion"])
+    df["mes"] = df.index.month.to_numpy().astype(np.int8)
+
+
+def etapas_magnitud(df, carpeta):
+    """
+    Las etapas de la gráfica de magnitud: conteos, figuras y la imagen combinada.
+    """
+
+    def agrupar():
+        return [
+            df[df["Magnitud"].between(low, high)].index.month.value_counts()
+            for low, high in magnitud.RANGOS
+        ]
+
+    def crear(conteos):
+        return [
+            magnitud.figura_desde_conteos(c, low, high)
+            for c, (low, high) in zip(conteos, magnitud.RANGOS)
+        ]
+
+    def exportar(figuras):
+        paneles = [pio.to_image(fig, format="png") for fig in figuras]
+        magnitud.combine_images(carpeta, paneles)
+
+    return agrupar, crear, exportar
+
+
+def etapas_strip_chart(df, carpeta):
+    """
+    Las etapas de la gráfica de puntos por mes.
+    """
+
+    def agrupar():
+        return df[df["Magnitud"] >= 6.0]
+
+    def exportar(fig):
+        pio.write_image(fig, os.path.join(carpeta, "strip_chart.png"))
+
+    return agrupar, strip_chart.crear_figura, exportar
+
+
+def etapas_top10(df, carpeta):
+    """
+    Las etapas de la gráfica de los 10 sismos más fuertes por año.
+    """
+
+    def agrupar():
+        años = df.index.year
+        top = top10.seleccionar_top_k(df[(años >= 2011) & (años <= 2023)], 10)
+        return top.drop(columns=["grupo", "posicion"]).set_index("Fecha")
+
+    def exportar(fig):
+        pio.write_image(fig, os.path.join(carpeta, "top10.png"))
+
+    return agrupar, top10.crear_figura, exportar
+
+
+def etapas_cdmx(df, carpeta):
+    """
+    Las etapas del mapa de la CDMX.
+    """
+
+    def agrupar():
+        return df[(df["estado"] == "CDMX") & (df.index.year >= 2010)]
+
+    def exportar(fig):
+        pio.write_image(fig, os.path.join(carpeta, "cdmx.png"))
+
+    return agrupar, cdmx.crear_mapa, exportar
+
+
+GRAFICAS = {
+    "cdmx": etapas_cdmx,
+    "magnitud": etapas_magnitud,
+    "strip_chart": etapas_strip_chart,
+    "top10": etapas_top10,
+}
+
+
+def medir(resultados, renglones, grafica, etapa, funcion, *args):
+    """
+    Ejecuta una función, agrega su tiempo a los resultados y regresa su valor.
+    """
+
+    inicio = time.perf_counter()
+    valor = funcion(*args)
+    segundos = time.perf_counter() - inicio
+
+    resultados.append(
+        {
+            "renglones": renglones,
+            "grafica": grafica,
+            "etapa": etapa,
+            "segundos": segundos,
+        }
+    )
+
+    print(f"{renglones:>12,} {grafica:<12} {etapa:<10} {segundos:9.3f} s")
+
+    return valor
+
+
+def medir_tamaño(renglones, imagenes=True):
+    """
+    Mide todas las etapas con un catálogo sintético del tamaño indicado.
+
+    Parameters
+    ----------
+    renglones : int
+        El número de sismos del catálogo sintético.
+
+    imagenes : bool
+        Si es False, no se mide la exportación a imagen.
+
+    Returns
+    -------
+    list
+        Un diccionario por etapa con los segundos que tomó.
+
+    """
+
+    ruta = preparar_csv(renglones)
+    resultados = list()
+
+    df = medir(
+        resultados,
+        renglones,
+        "catalogo",
+        "lectura",
+        lambda: pd.read_csv(
+            ruta,
+            parse_dates=["Fecha"],
+            index_col="Fecha",
+            dtype={columna: "category" for columna in COLUMNAS_CATEGORICAS},
+        ),
+    )
+
+    medir(resultados, renglones, "catalogo", "limpieza", limpiar_numericos, df)
+    medir(resultados, renglones, "catalogo", "estados", agregar_estados, df)
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        for grafica, etapas in GRAFICAS.items():
+            agrupar, crear, exportar = etapas(df, carpeta)
+
+            datos = medir(resultados, renglones, grafica, "agrupacion", agrupar)
+            figura = medir(resultados, renglones, grafica, "figura", crear, datos)
+
+            if imagenes:
+                medir(resultados, renglones, grafica, "imagen", exportar, figura)
+
+    return resultados
+
+
+def version_paquete(nombre):
+    """
+    Regresa la versión instalada de un paquete, None si no está instalado.
+    """
+
+    try:
+        return metadata.version(nombre)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def describir_entorno():
+    """
+    Regresa las versiones y el commit con los que se midieron los tiempos.
+    """
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "plotly": plotly.__version__,
+        "kaleido": version_paquete("kaleido"),
+        "procesador": platform.processor() or platform.machine(),
+        "nucleos": os.cpu_count(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Mide cada etapa de las gráficas con catálogos sintéticos."
+    )
+    parser.add_argument(
+        "renglones", nargs="*", type=int, help="Tamaños del catálogo sintético."
+    )
+    parser.add_argument(
+        "--sin-imagenes",
+        action="store_true",
+        help="No mide la exportación a imagen (kaleido).",
+    )
+    args = parser.parse_args()
+
+    resultados = list()
+
+    for renglones in args.renglones or TAMAÑOS:
+        resultados.extend(medir_tamaño(renglones, not args.sin_imagenes))
+
+    entorno = describir_entorno()
+
+    os.makedirs(CARPETA_RESULTADOS, exist_ok=True)
+    nombre = f"etapas_{datetime.now():%Y%m%d_%H%M%S}.json"
+    ruta = os.path.join(CARPETA_RESULTADOS, nombre)
+
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        json.dump(
+            {"entorno": entorno, "resultados": resultados},
+            archivo,
+            ensure_ascii=False,
+            indent=2,
+        )
+
+    print(ruta)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Mide el efecto de simplificar el GeoJSON de la CDMX en los mapas.
+
+Compara el GeoJSON original contra el simplificado: número de vértices,
+tamaño del archivo, tamaño del JSON de la figura y tiempo de exportación
+con kaleido. Se ejecuta desde la raíz del repositorio:
+
+python -m benchmarks.geojson
+
+"""
+
+import json
+import time
+
+import plotly.graph_objects as go
+
+from geometria import RUTA_CDMX, cargar_geojson
+
+
+def contar_vertices(geojson):
+    """
+    Cuenta los vértices de todos los polígonos de un GeoJSON.
+    """
+
+    total = 0
+
+    for item in geojson["features"]:
+        geometria = item["geometry"]
+
+        if geometria["type"] == "Polygon":
+            poligonos = [geometria["coordinates"]]
+        else:
+            poligonos = geometria["coordinates"]
+
+        total += sum(len(anillo) for poligono in poligonos for anillo in poligono)
+
+    return total
+
+
+def crear_figura(geojson):
+    """
+    Crea una figura con la misma capa de contornos que usa cdmx.py.
+    """
+
+    ubicaciones = [item["properties"]["CVEGEO"] for item in geojson["features"]]
+
+    fig = go.Figure()
+
+    fig.add_traces(
+        go.Choropleth(
+            geojson=geojson,
+            locations=ubicaciones,
+            z=[1] * len(ubicaciones),
+            showscale=False,
+            featureidkey="properties.CVEGEO",
+            colorscale=["#000000", "#000000"],
+            marker_line_color="#FFFFFF",
+            marker_line_width=1.5,
+            zmin=0.0,
+            zmax=1.0,
+        )
+    )
+
+    fig.update_geos(fitbounds="geojson", projection_type="mercator")
+    fig.update_layout(width=1280, height=1280)
+
+    return fig
+
+
+def medir(geojson, repeticiones=3):
+    """
+    Regresa el tamaño del JSON de la figura y el mejor tiempo de exportación.
+    """
+
+    fig = crear_figura(geojson)
+    tamaño = len(fig.to_json().encode("utf-8"))
+
+    # La primera exportación inicia kaleido, así que no la contamos.
+    fig.to_image(format="png")
+
+    tiempos = list()
+
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        fig.to_image(format="png")
+        tiempos.append(time.perf_counter() - inicio)
+
+    return tamaño, min(tiempos)
+
+
+def main():
+    with open(RUTA_CDMX, "r", encoding="utf-8") as archivo:
+        original = json.load(archivo)
+
+    simplificado = cargar_geojson()
+
+    for nombre, geojson in [("original", original), ("simplificado", simplificado)]:
+        texto = json.dumps(geojson, separators=(",", ":"))
+        tamaño_geojson = len(texto.encode("utf-8"))
+        tamaño_figura, segundos = medir(geojson)
+
+        print(f"{nombre}:")
+        print(f"  vértices:       {contar_vertices(geojson):,}")
+        print(f"  GeoJSON:        {tamaño_geojson / 1024:,.1f} KB")
+        print(f"  JSON de figura: {tamaño_figura / 1024:,.1f} KB")
+        print(f"  exportación:    {segundos:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
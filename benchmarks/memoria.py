@@ -0,0 +1,44 @@
+"""
+Compara la memoria del catálogo leído con read_csv contra el catálogo normalizado.
+
+Se ejecuta desde la raíz del repositorio:
+
+python -m benchmarks.memoria ./data.csv
+
+"""
+
+import sys
+
+import pandas as pd
+
+from catalogo import RUTA_CSV, leer_csv, reporte_memoria
+
+
+def main(ruta=RUTA_CSV):
+    # Así es como los scripts leían el catálogo originalmente.
+    original = pd.read_csv(ruta, parse_dates=["Fecha"], index_col="Fecha")
+    original["estado"] = original["Referencia de localizacion"].apply(
+        lambda x: x.split(",")[-1].strip()
+    )
+    original["mes"] = original.index.month
+
+    compacto = leer_csv(ruta)
+
+    antes = reporte_memoria(original)
+    despues = reporte_memoria(compacto)
+
+    reporte = antes.join(despues, lsuffix="_antes", rsuffix="_despues", how="outer")
+    reporte["MB_antes"] = reporte["bytes_antes"] / 1024**2
+    reporte["MB_despues"] = reporte["bytes_despues"] / 1024**2
+
+    with pd.option_context("display.width", 120):
+        print(reporte[["tipo_antes", "MB_antes", "tipo_despues", "MB_despues"]])
+
+    total_antes = antes.loc["Total", "bytes"]
+    total_despues = despues.loc["Total", "bytes"]
+
+    print(f"\nReducción: {total_antes / total_despues:.1f}x")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,142 @@
+"""
+Mide la identificación de réplicas con catálogos sintéticos de varios tamaños.
+
+Para cada tamaño se mide identificar_principales() y su tiempo por sismo.
+Hasta TAMAÑO_REFERENCIA sismos también se mide el recorrido de un sismo a
+la vez (la definición directa del método), el cual debe dar exactamente el
+mismo resultado.
+
+El programa termina con un error si algún resultado es distinto al del
+recorrido o si el tiempo por sismo del catálogo más grande es más de
+CRECIMIENTO_MAXIMO veces el del más chico.
+
+Se ejecuta desde la raíz del repositorio:
+
+python -m benchmarks.replicas 100000 300000 1000000
+
+"""
+
+import sys
+
+import numpy as np
+
+from benchmarks.estados import medir
+from benchmarks.etapas import preparar_csv
+from catalogo import cargar_catalogo
+from replicas import (
+    RADIO_TIERRA,
+    calcular_tiempos,
+    identificar_principales,
+    proyectar,
+    ventanas_gardner_knopoff,
+)
+
+
+# Los tamaños por defecto del catálogo sintético.
+TAMAÑOS = [100_000, 300_000, 1_000_000]
+
+# El tamaño máximo con el que se mide el recorrido de un sismo a la vez.
+TAMAÑO_REFERENCIA = 300_000
+
+# Cuántas veces puede crecer el tiempo por sismo del catálogo más chico al
+# más grande.
+CRECIMIENTO_MAXIMO = 3
+
+
+def identificar_secuencial(df):
+    """
+    Identifica los sismos principales recorriendo un sismo a la vez.
+
+    Cada sismo que no es dependiente compara las distancias contra todos los
+    sismos de su ventana de tiempo, ver replicas.identificar_principales().
+    """
+
+    principales = np.ones(len(df), dtype=bool)
+
+    magnitudes = df["Magnitud"].to_numpy(dtype=np.float64)
+    latitudes = df["Latitud"].to_numpy(dtype=np.float64)
+    longitudes = df["Longitud"].to_numpy(dtype=np.float64)
+
+    validos = np.flatnonzero(
+        np.isfinite(magnitudes) & np.isfinite(latitudes) & np.isfinite(longitudes)
+    )
+
+    if len(validos) < 2:
+        return principales
+
+    tiempos = calcular_tiempos(df)[validos]
+    orden = np.argsort(tiempos, kind="stable")
+    validos = validos[orden]
+    tiempos = tiempos[orden]
+    magnitudes = magnitudes[validos]
+
+    puntos = proyectar(latitudes[validos], longitudes[validos])
+
+    distancias, dias = ventanas_gardner_knopoff(magnitudes)
+    angulos = np.minimum(distancias / (2 * RADIO_TIERRA), np.pi / 2)
+    cuerdas = 2 * RADIO_TIERRA * np.sin(angulos)
+
+    inicios = np.searchsorted(tiempos, tiempos - dias, side="left")
+    finales = np.searchsorted(tiempos, tiempos + dias, side="right")
+
+    dependientes = np.zeros(len(validos), dtype=bool)
+
+    for i in np.lexsort((np.arange(len(validos)), -magnitudes)):
+        if dependientes[i]:
+            continue
+
+        inicio, fin = inicios[i], finales[i]
+        diferencias = puntos[inicio:fin] - puntos[i]
+        cuadrados = np.einsum("ij,ij->i", diferencias, diferencias)
+
+        vecinos = inicio + np.flatnonzero(cuadrados <= cuerdas[i] ** 2)
+        vecinos = vecinos[(vecinos != i) & (magnitudes[vecinos] <= magnitudes[i])]
+        dependientes[vecinos] = True
+
+    principales[validos[dependientes]] = False
+
+    return principales
+
+
+def main(tamaños=TAMAÑOS):
+    tiempos_por_sismo = list()
+
+    for renglones in tamaños:
+        df = cargar_catalogo(preparar_csv(renglones))
+
+        tiempo, principales = medir(lambda: identificar_principales(df))
+        por_sismo = tiempo / len(df)
+        tiempos_por_sismo.append(por_sismo)
+
+        print(f"Renglones: {len(df):,}")
+        print(f"  por niveles: {tiempo:.3f} s ({por_sismo * 1e6:.1f} µs por sismo)")
+        print(f"  principales: {principales.sum():,}")
+
+        if renglones > TAMAÑO_REFERENCIA:
+            continue
+
+        tiempo_secuencial, secuencial = medir(
+            lambda: identificar_secuencial(df), repeticiones=1
+        )
+
+        print(f"  un sismo a la vez: {tiempo_secuencial:.3f} s")
+        print(f"  aceleración: {tiempo_secuencial / tiempo:.1f}x")
+
+        if not np.array_equal(principales, secuencial):
+            sys.exit(
+                f"Con {renglones:,} renglones el resultado es distinto al del "
+                "recorrido de un sismo a la vez."
+            )
+
+    crecimiento = tiempos_por_sismo[-1] / tiempos_por_sismo[0]
+    print(f"Crecimiento del tiempo por sismo: {crecimiento:.1f}x")
+
+    if crecimiento > CRECIMIENTO_MAXIMO:
+        sys.exit(
+            f"El tiempo por sismo creció más de {CRECIMIENTO_MAXIMO}x "
+            "con el tamaño del catálogo."
+        )
+
+
+if __name__ == "__main__":
+    main([int(valor) for valor in sys.argv[1:]] or TAMAÑOS)
@@ -0,0 +1,177 @@
+"""
+Verifica el caché del servidor HTTP sin necesitar Chromium.
+
+Se inicia crear_servidor() en un puerto libre con una función de imagen
+falsa que tarda TIEMPO_IMAGEN segundos y cuenta cuántas veces se llama.
+Se verifica que:
+
+- Varias peticiones simultáneas de la misma gráfica crean una sola imagen.
+- Al llenarse el caché se descarta la imagen usada hace más tiempo.
+- Si la imagen falla, todas las peticiones que la esperaban reciben un
+  error 500 y el error no se guarda en el caché.
+- Los parámetros inválidos regresan 400 y las gráficas desconocidas 404.
+
+El programa termina con un error si alguna verificación falla. Se ejecuta
+desde la raíz del repositorio:
+
+python -m benchmarks.servidor
+
+"""
+
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pandas as pd
+
+from servidor import crear_servidor
+
+
+# Cuánto tarda cada imagen falsa, así las peticiones simultáneas se enciman.
+TIEMPO_IMAGEN = 0.3
+
+# El tamaño de cada imagen falsa. En el caché de prueba solo caben dos.
+TAMAÑO_IMAGEN = 400 * 1024
+CACHE_MB = 1
+
+# El número de peticiones simultáneas de la misma gráfica.
+PETICIONES = 8
+
+# Con este valor de k la imagen falsa falla.
+K_ERROR = 13
+
+
+class ImagenFalsa:
+    """
+    Crea imágenes sin kaleido y cuenta cuántas se crearon para cada k.
+    """
+
+    def __init__(self):
+        self.llamadas = Counter()
+        self._candado = threading.Lock()
+
+    def __call__(self, df, spec):
+        with self._candado:
+            self.llamadas[spec["k"]] += 1
+
+        time.sleep(TIEMPO_IMAGEN)
+
+        if spec["k"] == K_ERROR:
+            raise RuntimeError("falla de prueba")
+
+        return bytes([spec["k"]]) * TAMAÑO_IMAGEN
+
+
+def pedir(url):
+    """
+    Hace una petición GET y regresa el estatus, el encabezado X-Cache y el cuerpo.
+    """
+
+    try:
+        with urlopen(url, timeout=30) as respuesta:
+            return respuesta.status, respuesta.headers["X-Cache"], respuesta.read()
+    except HTTPError as error:
+        return error.code, None, error.read()
+
+
+def verificar(condicion, descripcion):
+    """
+    Termina el programa con un error si la condición no se cumple.
+    """
+
+    if not condicion:
+        sys.exit(f"Falló: {descripcion}")
+
+    print(f"ok: {descripcion}")
+
+
+def pedir_simultaneas(url):
+    """
+    Hace PETICIONES peticiones simultáneas a la misma URL.
+    """
+
+    with ThreadPoolExecutor(PETICIONES) as pool:
+        return list(pool.map(pedir, [url] * PETICIONES))
+
+
+def main():
+    imagen = ImagenFalsa()
+    servidor = crear_servidor(
+        puerto=0, df=pd.DataFrame(), cache_mb=CACHE_MB, crear_imagen=imagen
+    )
+    host, puerto = servidor.server_address[:2]
+    raiz = f"http://{host}:{puerto}"
+
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+    try:
+        # Las peticiones simultáneas esperan a una sola imagen.
+        inicio = time.perf_counter()
+        respuestas = pedir_simultaneas(f"{raiz}/top10?k=1")
+        tiempo = time.perf_counter() - inicio
+        origenes = Counter(origen for _, origen, _ in respuestas)
+
+        print(f"{PETICIONES} peticiones simultáneas: {tiempo:.3f} s {dict(origenes)}")
+        verificar(
+            all(estatus == 200 for estatus, _, _ in respuestas),
+            "todas las peticiones regresan 200",
+        )
+        verificar(
+            len({cuerpo for _, _, cuerpo in respuestas}) == 1,
+            "todas las peticiones reciben la misma imagen",
+        )
+        verificar(
+            imagen.llamadas[1] == 1 and origenes["miss"] == 1,
+            "la imagen se creó una sola vez",
+        )
+
+        # En el caché caben dos imágenes. Al usar k=1 antes de crear k=3,
+        # la menos usada es k=2 y es la que se descarta.
+        verificar(pedir(f"{raiz}/top10?k=2")[1] == "miss", "k=2 se crea")
+        verificar(pedir(f"{raiz}/top10?k=1")[1] == "hit", "k=1 sigue en el caché")
+        verificar(pedir(f"{raiz}/top10?k=3")[1] == "miss", "k=3 se crea")
+
+        estado = json.loads(pedir(f"{raiz}/")[2])["cache"]
+        print(f"caché: {estado}")
+        verificar(estado["imagenes"] == 2, "el caché conserva dos imágenes")
+        verificar(pedir(f"{raiz}/top10?k=1")[1] == "hit", "k=1 no se descartó")
+        verificar(pedir(f"{raiz}/top10?k=2")[1] == "miss", "k=2 se descartó")
+        verificar(imagen.llamadas[2] == 2, "k=2 se volvió a crear")
+
+        # Un error llega a todas las peticiones que esperaban la imagen.
+        respuestas = pedir_simultaneas(f"{raiz}/top10?k={K_ERROR}")
+        verificar(
+            all(estatus == 500 for estatus, _, _ in respuestas),
+            "todas las peticiones de una imagen que falla regresan 500",
+        )
+        verificar(
+            all(
+                json.loads(cuerpo)["error"] == "falla de prueba"
+                for _, _, cuerpo in respuestas
+            ),
+            "todas reciben el mensaje del error",
+        )
+        verificar(
+            imagen.llamadas[K_ERROR] == 1, "la imagen que falla se intentó una vez"
+        )
+        verificar(pedir(f"{raiz}/top10?k={K_ERROR}")[0] == 500, "el error se repite")
+        verificar(imagen.llamadas[K_ERROR] == 2, "el error no se guardó en el caché")
+
+        verificar(
+            pedir(f"{raiz}/top10?k=abc")[0] == 400, "un parámetro inválido es 400"
+        )
+        verificar(
+            pedir(f"{raiz}/desconocida")[0] == 404, "una gráfica desconocida es 404"
+        )
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
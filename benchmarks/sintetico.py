@@ -0,0 +1,113 @@
+"""
+Crea un catálogo sintético con el mismo formato que el CSV del SSN.
+
+Los sismos tienen fechas ordenadas, magnitudes con la distribución de
+Gutenberg-Richter, coordenadas dentro de México y referencias de localización
+con los 32 estados. Algunos registros no tienen magnitud ("no calculable"),
+igual que en el catálogo real.
+
+Se ejecuta desde la raíz del repositorio:
+
+python -m benchmarks.sintetico 1000000 ./sintetico.csv
+
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.estados import crear_referencias
+
+
+# Los renglones que se escriben al CSV en cada bloque.
+RENGLONES_POR_BLOQUE = 1_000_000
+
+# La proporción de sismos sin magnitud.
+PROPORCION_SIN_MAGNITUD = 0.01
+
+
+def crear_catalogo(renglones, semilla=0, inicio="1990-01-01", fin="2024-10-01"):
+    """
+    Crea un catálogo sintético con las columnas del CSV del SSN.
+
+    Parameters
+    ----------
+    renglones : int
+        El número de sismos.
+
+    semilla : int
+        La semilla del generador aleatorio.
+
+    inicio, fin : str
+        El rango de fechas de los sismos.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Las columnas como texto, tal como aparecen en el CSV.
+
+    """
+
+    rng = np.random.default_rng(semilla)
+
+    # Las fechas se reparten de forma uniforme y se ordenan, igual que el catálogo.
+    # Fijamos la unidad en ns, pandas 3 usa µs por defecto al convertir texto.
+    limites = pd.to_datetime([inicio, fin]).as_unit("ns").asi8
+    fechas = pd.to_datetime(
+        np.sort(rng.integers(limites[0], limites[1], renglones)), unit="ns"
+    )
+    utc = fechas + pd.Timedelta(hours=6)
+
+    # Con b = 1 la magnitud sobre el mínimo sigue una distribución exponencial.
+    magnitudes = np.minimum(2.0 + rng.exponential(1 / np.log(10), renglones), 8.6)
+    magnitudes = np.round(magnitudes, 1).astype(str).astype(object)
+    magnitudes[rng.random(renglones) < PROPORCION_SIN_MAGNITUD] = "no calculable"
+
+    return pd.DataFrame(
+        {
+            "Fecha": fechas.strftime("%Y-%m-%d"),
+            "Hora": fechas.strftime("%H:%M:%S"),
+            "Magnitud": magnitudes,
+            "Latitud": np.round(rng.uniform(14.0, 33.0, renglones), 4),
+            "Longitud": np.round(rng.uniform(-118.0, -86.0, renglones), 4),
+            "Profundidad": np.round(rng.gamma(2.0, 10.0, renglones), 1),
+            "Referencia de localizacion": crear_referencias(renglones, semilla),
+            "Fecha UTC": utc.strftime("%Y-%m-%d"),
+            "Hora UTC": utc.strftime("%H:%M:%S"),
+            "Estatus": rng.choice(["revisado", "verificado"], renglones),
+        }
+    )
+
+
+def escribir_catalogo(ruta, renglones, semilla=0):
+    """
+    Escribe un catálogo sintético a un CSV por bloques.
+
+    Cada bloque cubre un rango de fechas consecutivo, así el CSV queda
+    ordenado y nunca se tiene todo el catálogo en memoria.
+
+    Parameters
+    ----------
+    ruta : str
+        La ruta del CSV a crear.
+
+    renglones : int
+        El número de sismos.
+
+    semilla : int
+        La semilla del generador aleatorio.
+
+    """
+
+    bloques = max(1, -(-renglones // RENGLONES_POR_BLOQUE))
+    limites = pd.date_range("1990-01-01", "2024-10-01", periods=bloques + 1)
+    tamaños = np.diff(np.linspace(0, renglones, bloques + 1).astype(int))
+
+    for i, tamaño in enumerate(tamaños):
+        df = crear_catalogo(tamaño, semilla + i, limites[i], limites[i + 1])
+        df.to_csv(ruta, mode="w" if i == 0 else "a", header=i == 0, index=False)
+
+
+if __name__ == "__main__":
+    escribir_catalogo(sys.argv[2], int(sys.argv[1]))
@@ -0,0 +1,1224 @@
+"""
+Este módulo concentra la carga del catálogo de sismos del SSN.
+
+El CSV original se procesa una sola vez: se normalizan los tipos de cada
+columna y el resultado se guarda en un almacén dentro de la carpeta ./cache,
+con un archivo Parquet por año. Las siguientes cargas leen directamente los
+años que se necesitan y el almacén solo se actualiza cuando el CSV cambia.
+
+Cuando se descarga un CSV nuevo del SSN solo se agregan los sismos nuevos
+o revisados, sin reescribir los años que no cambiaron.
+
+Para compartir el catálogo entre varios procesos también se puede guardar
+como arreglos binarios de ancho fijo, los cuales se abren con np.memmap
+y comparten una sola copia en memoria a través del sistema operativo.
+
+Los datos más nuevos se pueden obtener del siguiente enlace:
+
+http://www2.ssn.unam.mx:8080/catalogo/
+
+"""
+
+import glob
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from instrumentacion import etapa
+
+
+# Ubicación por defecto del CSV y de la carpeta donde guardamos los almacenes.
+RUTA_CSV = "./data.csv"
+CARPETA_CACHE = "./cache"
+
+# Si cambiamos la forma de normalizar el catálogo debemos incrementar
+# este número para invalidar los almacenes existentes.
+VERSION_ESQUEMA = 8
+
+# Columnas numéricas del catálogo. Los valores que no se pueden convertir,
+# como "no calculable", se convierten en NaN. Con float32 la precisión
+# sobra para magnitudes de un decimal y coordenadas de milésimas de grado.
+COLUMNAS_NUMERICAS = ["Magnitud", "Latitud", "Longitud", "Profundidad"]
+
+# Columnas de texto con muchos valores repetidos. Se guardan como categorías
+# (codificadas por diccionario) en lugar de un objeto de Python por renglón.
+# La "Referencia de localizacion" no está aquí: casi cada sismo tiene una
+# distinta, así que como categoría el diccionario ocupa lo mismo que el
+# texto y unir los diccionarios de las particiones al cargar es muy lento.
+# Se queda como texto de Arrow.
+COLUMNAS_CATEGORICAS = ["Estatus", "Fecha UTC"]
+
+# Columnas de hora ("HH:MM:SS"). Se guardan como timedelta, 8 bytes por renglón
+# en lugar de un objeto de Python, y se pueden sumar directamente a la fecha.
+COLUMNAS_HORA = ["Hora", "Hora UTC"]
+
+# Las columnas que identifican a un sismo al comparar dos versiones del catálogo.
+LLAVE = ["Fecha", "Hora", "Latitud", "Longitud", "Magnitud"]
+
+# Las columnas del almacén compartido y su tipo. La fecha se guarda como
+# nanosegundos desde 1970, la hora como nanosegundos desde la medianoche y
+# el estado como el código de su categoría.
+COLUMNAS_COMPARTIDAS = {
+    "fecha": np.int64,
+    "Hora": np.int64,
+    "Latitud": np.float32,
+    "Longitud": np.float32,
+    "Profundidad": np.float32,
+    "Magnitud": np.float32,
+    "estado": np.int8,
+    "mes": np.int8,
+}
+
+# El número de renglones por row group dentro de cada partición. Cada row group
+# guarda su magnitud mínima y máxima, así los filtros por magnitud pueden
+# saltarse los que no coinciden.
+RENGLONES_POR_GRUPO = 4096
+
+# Abreviaturas de las entidades tal como aparecen al final de la
+# "Referencia de localizacion". El orden es el mismo que el de COLORES
+# en top10.py, así los códigos de la columna categórica coinciden.
+ESTADOS = [
+    "AGS",
+    "BC",
+    "BCS",
+    "CAMP",
+    "COAH",
+    "COL",
+    "CHIS",
+    "CHIH",
+    "CDMX",
+    "DGO",
+    "GTO",
+    "GRO",
+    "HGO",
+    "JAL",
+    "MEX",
+    "MICH",
+    "MOR",
+    "NAY",
+    "NL",
+    "OAX",
+    "PUE",
+    "QRO",
+    "QR",
+    "SLP",
+    "SIN",
+    "SON",
+    "TAB",
+    "TAMS",
+    "TLAX",
+    "VER",
+    "YUC",
+    "ZAC",
+]
+
+# Los estados tienen hasta 4 letras, así que la última coma de una referencia
+# ("..., CDMX") casi siempre está entre sus últimos 6 bytes.
+BYTES_FINALES = 6
+
+
+def firma_archivo(ruta):
+    """
+    Obtiene el tamaño y la fecha de modificación de un archivo.
+
+    Parameters
+    ----------
+    ruta : str
+        La ruta del archivo.
+
+    Returns
+    -------
+    dict
+        Un diccionario con el tamaño en bytes y el mtime en nanosegundos.
+
+    """
+
+    stat = os.stat(ruta)
+
+    return {"tamaño": stat.st_size, "mtime": stat.st_mtime_ns}
+
+
+def calcular_hash(ruta):
+    """
+    Calcula el hash SHA-256 de un archivo leyéndolo por bloques.
+
+    Parameters
+    ----------
+    ruta : str
+        La ruta del archivo.
+
+    Returns
+    -------
+    str
+        El hash en formato hexadecimal.
+
+    """
+
+    sha = hashlib.sha256()
+
+    with open(ruta, "rb") as archivo:
+        for bloque in iter(lambda: archivo.read(1 << 20), b""):
+            sha.update(bloque)
+
+    return sha.hexdigest()
+
+
+def extraer_estados(referencias):
+    """
+    Extrae la abreviatura del estado al final de cada referencia de localización.
+
+    En lugar de aplicar una función de Python a cada renglón codificamos
+    por diccionario los últimos BYTES_FINALES bytes de cada referencia con
+    Arrow, así la última coma se busca una sola vez por final distinto.
+    Solo las referencias cuyo final no tiene coma se procesan completas
+    con una expresión regular.
+
+    Parameters
+    ----------
+    referencias : pandas.Series
+        La columna "Referencia de localizacion", como texto o como categoría.
+
+    Returns
+    -------
+    pandas.Categorical
+        Los estados como categoría. Las primeras categorías son ESTADOS
+        y cualquier otra abreviatura encontrada se agrega al final.
+
+    """
+
+    # Si la columna ya es categórica solo procesamos cada referencia distinta
+    # y después traducimos los códigos (-1 es NaN y se queda igual).
+    if isinstance(referencias.dtype, pd.CategoricalDtype):
+        estados = extraer_estados(pd.Series(referencias.cat.categories))
+        codigos = np.append(estados.codes, -1)[referencias.cat.codes.to_numpy()]
+
+        return pd.Categorical.from_codes(codigos, categories=estados.categories)
+
+    arreglo = pa.array(referencias, type=pa.string(), from_pandas=True)
+
+    # Codificamos por diccionario: un índice por renglón y los finales distintos.
+    # Cortamos como binario porque el corte puede partir un carácter UTF-8,
+    # pero lo que sigue a la última coma siempre queda completo.
+    finales = pc.dictionary_encode(
+        pc.binary_slice(arreglo.cast(pa.binary()), -BYTES_FINALES)
+    )
+    indices = pc.fill_null(finales.indices, -1).to_numpy()
+
+    # Tomamos el texto después de la última coma y quitamos los espacios.
+    estados = [
+        final.rpartition(b",")[2].decode("utf-8").strip() if b"," in final else None
+        for final in finales.dictionary.to_pylist()
+    ]
+
+    sin_coma = [numero for numero, estado in enumerate(estados) if estado is None]
+    renglones = np.flatnonzero(np.isin(indices, sin_coma))
+
+    completos = pc.dictionary_encode(
+        pc.utf8_trim_whitespace(
+            pc.struct_field(
+                pc.extract_regex(arreglo.take(renglones), r"(?P<estado>[^,]*)$"),
+                [0],
+            )
+        )
+    )
+    distintos = completos.dictionary.to_pylist()
+
+    encontrados = set(distintos) | (set(estados) - {None})
+    categorias = ESTADOS + sorted(encontrados - set(ESTADOS))
+
+    # Traducimos cada estado distinto a su código. Agregamos un -1 al final
+    # para que los índices nulos (-1) se conviertan en NaN.
+    indexador = pd.Index(categorias)
+    codigos = np.append(indexador.get_indexer(estados), -1)[indices]
+    codigos[renglones] = np.append(indexador.get_indexer(distintos), -1)[
+        pc.fill_null(completos.indices, -1).to_numpy()
+    ]
+
+    return pd.Categorical.from_codes(codigos, categories=categorias)
+
+
+def convertir_horas(horas):
+    """
+    Convierte texto con el formato "HH:MM:SS" en timedelta.
+
+    pd.to_timedelta() interpreta cada texto por separado y es lento con
+    millones de renglones. Aquí las horas, minutos y segundos se extraen
+    con las funciones vectorizadas de Arrow.
+
+    Parameters
+    ----------
+    horas : pandas.Series
+        Las horas como texto.
+
+    Returns
+    -------
+    numpy.ndarray
+        Las horas como timedelta64[s]. Los valores que no tienen el formato
+        esperado quedan como NaT.
+
+    """
+
+    texto = pa.array(horas, type=pa.string(), from_pandas=True)
+    partes = pc.extract_regex(texto, r"^(?P<h>\d{1,2}):(?P<m>\d{2}):(?P<s>\d{2})$")
+
+    h, m, s = (pc.cast(pc.struct_field(partes, [i]), pa.int64()) for i in range(3))
+    segundos = pc.add(pc.add(pc.multiply(h, 3600), pc.multiply(m, 60)), s)
+
+    return pc.cast(segundos, pa.duration("s")).to_numpy(zero_copy_only=False)
+
+
+def normalizar(df):
+    """
+    Normaliza los tipos de un DataFrame con el formato del CSV del SSN.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El DataFrame tal como lo regresa read_csv, con la fecha como índice.
+
+    Returns
+    -------
+    pandas.DataFrame
+        El mismo DataFrame con las columnas numéricas como float32, las de
+        texto repetido como categorías, las horas como timedelta y dos
+        columnas nuevas: el estado (categoría) y el mes de ocurrencia (int8).
+
+    """
+
+    for columna in COLUMNAS_NUMERICAS:
+        if columna in df.columns:
+            df[columna] = pd.to_numeric(df[columna], errors="coerce").astype(
+                np.float32
+            )
+
+    for columna in COLUMNAS_CATEGORICAS:
+        if columna in df.columns:
+            df[columna] = df[columna].astype("category")
+
+    for columna in COLUMNAS_HORA:
+        if columna in df.columns and df[columna].dtype.kind != "m":
+            df[columna] = convertir_horas(df[columna])
+
+    # Extraemos el estado una sola vez al momento de cargar el catálogo.
+    if "Referencia de localizacion" in df.columns:
+        df["estado"] = extraer_estados(df["Referencia de localizacion"])
+
+    df["mes"] = df.index.month.to_numpy().astype(np.int8)
+
+    return df
+
+
+def reporte_memoria(df):
+    """
+    Calcula la memoria utilizada por cada columna de un DataFrame.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El DataFrame a medir.
+
+    Returns
+    -------
+    pandas.DataFrame
+        El tipo y los bytes de cada columna (incluyendo el índice y el total).
+
+    """
+
+    bytes_ = df.memory_usage(deep=True)
+    tipos = df.dtypes.astype(str).reindex(bytes_.index, fill_value=str(df.index.dtype))
+
+    reporte = pd.DataFrame({"tipo": tipos, "bytes": bytes_})
+    reporte.loc["Total"] = ["", bytes_.sum()]
+
+    return reporte
+
+
+def leer_csv(ruta=RUTA_CSV):
+    """
+    Lee y normaliza el CSV del SSN sin utilizar el almacén.
+
+    Parameters
+    ----------
+    ruta : str
+        La ruta del CSV.
+
+    Returns
+    -------
+    pandas.DataFrame
+        El catálogo normalizado con la fecha como índice.
+
+    """
+
+    # Las columnas de texto repetido se leen directamente como categorías.
+    with etapa("lectura") as registro:
+        df = pd.read_csv(
+            ruta,
+            parse_dates=["Fecha"],
+            index_col="Fecha",
+            dtype={columna: "category" for columna in COLUMNAS_CATEGORICAS},
+        )
+        registro.renglones = len(df)
+
+    with etapa("limpieza") as registro:
+        df = normalizar(df)
+        registro.renglones = len(df)
+
+    return df
+
+
+def unificar_categorias(df):
+    """
+    Vuelve a convertir en categorías las columnas categóricas del catálogo.
+
+    Al juntar DataFrames cuyas categorías no son idénticas pandas convierte
+    las columnas a texto. Aquí recuperamos las categorías, con ESTADOS al
+    inicio de las categorías del estado.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El DataFrame a modificar.
+
+    Returns
+    -------
+    pandas.DataFrame
+        El mismo DataFrame.
+
+    """
+
+    for columna in COLUMNAS_CATEGORICAS:
+        if columna in df.columns and not isinstance(
+            df[columna].dtype, pd.CategoricalDtype
+        ):
+            df[columna] = df[columna].astype("category")
+
+    if "estado" in df.columns:
+        distintos = set(df["estado"].dropna().astype(str))
+        categorias = ESTADOS + sorted(distintos - set(ESTADOS))
+        df["estado"] = pd.Categorical(
+            df["estado"].astype(object), categories=categorias
+        )
+
+    return df
+
+
+def filas_ausentes(df, referencia, columnas):
+    """
+    Marca los renglones de df cuyos valores no aparecen en referencia.
+
+    Es un anti-join: dos renglones coinciden si son iguales en todas las
+    columnas indicadas, incluyendo los valores faltantes.
+
+    Parameters
+    ----------
+    df, referencia : pandas.DataFrame
+        Los DataFrames a comparar.
+
+    columnas : list
+        Las columnas que se comparan.
+
+    Returns
+    -------
+    numpy.ndarray
+        Un arreglo booleano con un valor por renglón de df, True si el
+        renglón no está en referencia.
+
+    """
+
+    # Comparamos los valores, no los códigos de las categorías, que cambian
+    # de una partición a otra.
+    def valores(tabla):
+        return pd.DataFrame(
+            {
+                columna: tabla[columna].astype(object)
+                if isinstance(tabla[columna].dtype, pd.CategoricalDtype)
+                else tabla[columna]
+                for columna in columnas
+            }
+        )
+
+    unidos = valores(df).merge(
+        valores(referencia).drop_duplicates(), on=columnas, how="left", indicator=True
+    )
+
+    return (unidos["_merge"] == "left_only").to_numpy()
+
+
+def carpeta_almacen(ruta):
+    """
+    Regresa la carpeta del almacén de un CSV.
+
+    Usamos el hash de la ruta absoluta para que distintos catálogos
+    (nacional, global, etc.) no compartan el mismo almacén.
+
+    Parameters
+    ----------
+    ruta : str
+        La ruta del CSV.
+
+    Returns
+    -------
+    str
+        La ruta de la carpeta.
+
+    """
+
+    clave = hashlib.md5(os.path.abspath(ruta).encode("utf-8")).hexdigest()[:12]
+
+    return os.path.join(CARPETA_CACHE, f"catalogo_{clave}")
+
+
+def leer_manifiesto(carpeta):
+    """
+    Lee el manifiesto de un almacén.
+
+    El manifiesto guarda la firma de cada CSV ingerido y el número de
+    renglones de cada partición anual.
+
+    Parameters
+    ----------
+    carpeta : str
+        La carpeta del almacén.
+
+    Returns
+    -------
+    dict
+        El manifiesto. Si no existe o es de otra versión se regresa uno vacío.
+
+    """
+
+    ruta_manifiesto = os.path.join(carpeta, "manifiesto.json")
+
+    if os.path.exists(ruta_manifiesto):
+        with open(ruta_manifiesto, "r", encoding="utf-8") as archivo:
+            manifiesto = json.load(archivo)
+
+        if manifiesto.get("version") == VERSION_ESQUEMA:
+            return manifiesto
+
+    return {"version": VERSION_ESQUEMA, "fuentes": {}, "particiones": {}}
+
+
+def fuentes_anteriores(carpeta):
+    """
+    Regresa los CSV ingeridos en un almacén de otra versión del esquema.
+
+    Parameters
+    ----------
+    carpeta : str
+        La carpeta del almacén.
+
+    Returns
+    -------
+    list
+        Las rutas absolutas de los CSV. Vacía si el almacén no existe o es de
+        la versión actual.
+
+    """
+
+    ruta_manifiesto = os.path.join(carpeta, "manifiesto.json")
+
+    if not os.path.exists(ruta_manifiesto):
+        return []
+
+    with open(ruta_manifiesto, "r", encoding="utf-8") as archivo:
+        manifiesto = json.load(archivo)
+
+    if manifiesto.get("version") == VERSION_ESQUEMA:
+        return []
+
+    return list(manifiesto.get("fuentes", {}))
+
+
+def csv_vigente(ruta, carpeta):
+    """
+    Verifica si el CSV ya fue ingerido en el almacén en su versión actual.
+
+    Primero comparamos el tamaño y el mtime, lo cual es inmediato. Si alguno
+    cambió, comparamos el hash del contenido para no volver a ingerir el CSV
+    cuando el archivo solo fue copiado o tocado.
+
+    Parameters
+    ----------
+    ruta : str
+        La ruta del CSV.
+
+    carpeta : str
+        La carpeta del almacén.
+
+    Returns
+    -------
+    bool
+        True si el almacén ya contiene este CSV.
+
+    """
+
+    manifiesto = leer_manifiesto(carpeta)
+    fuente = manifiesto["fuentes"].get(os.path.abspath(ruta))
+
+    if fuente is None:
+        return False
+
+    firma = firma_archivo(ruta)
+
+    if firma["tamaño"] == fuente["tamaño"] and firma["mtime"] == fuente["mtime"]:
+        return True
+
+    if firma["tamaño"] != fuente["tamaño"] or calcular_hash(ruta) != fuente["sha256"]:
+        return False
+
+    # El contenido es el mismo, solo actualizamos el mtime guardado.
+    fuente["mtime"] = firma["mtime"]
+    guardar_json(manifiesto, os.path.join(carpeta, "manifiesto.json"))
+
+    return True
+
+
+def guardar_json(datos, ruta):
+    """
+    Guarda un diccionario como JSON de forma atómica.
+
+    Parameters
+    ----------
+    datos : dict
+        Los datos a guardar.
+
+    ruta : str
+        La ruta del archivo JSON.
+
+    """
+
+    temporal = f"{ruta}.tmp"
+
+    with open(temporal, "w", encoding="utf-8") as archivo:
+        json.dump(datos, archivo, ensure_ascii=False, indent=2)
+
+    os.replace(temporal, ruta)
+
+
+def ruta_particion(carpeta, año):
+    """
+    Regresa la ruta del archivo Parquet de un año.
+    """
+
+    return os.path.join(carpeta, f"{año}.parquet")
+
+
+def escribir_particion(carpeta, año, df):
+    """
+    Guarda la partición de un año y regresa sus estadísticas.
+
+    Los renglones se guardan ordenados por magnitud para que cada row group
+    cubra un rango angosto de magnitudes y los filtros puedan descartarlos.
+    Las columnas categóricas solo conservan las categorías del año, de lo
+    contrario cada partición guardaría el diccionario de todo el catálogo.
+
+    Parameters
+    ----------
+    carpeta : str
+        La carpeta del almacén.
+
+    año : int
+        El año de la partición.
+
+    df : pandas.DataFrame
+        Los sismos de ese año con la fecha como índice.
+
+    Returns
+    -------
+    dict
+        El número de renglones y la magnitud mínima y máxima.
+
+    """
+
+    df = df.sort_values("Magnitud", kind="stable", na_position="last")
+
+    for columna in COLUMNAS_CATEGORICAS:
+        if columna in df.columns:
+            df[columna] = df[columna].cat.remove_unused_categories()
+
+    temporal = f"{ruta_particion(carpeta, año)}.tmp"
+    df.to_parquet(temporal, row_group_size=RENGLONES_POR_GRUPO)
+    os.replace(temporal, ruta_particion(carpeta, año))
+
+    magnitudes = df["Magnitud"].dropna()
+
+    return {
+        "renglones": len(df),
+        "magnitud_min": float(magnitudes.min()) if len(magnitudes) else None,
+        "magnitud_max": float(magnitudes.max()) if len(magnitudes) else None,
+    }
+
+
+def particion_coincide(estadisticas, magnitud_minima, magnitud_maxima):
+    """
+    Verifica si una partición puede tener sismos dentro del rango de magnitud.
+
+    Parameters
+    ----------
+    estadisticas : dict
+        Las estadísticas de la partición guardadas en el manifiesto.
+
+    magnitud_minima, magnitud_maxima : float
+        El rango de magnitud solicitado, None si no hay límite.
+
+    Returns
+    -------
+    bool
+        False si es seguro que ningún sismo de la partición coincide.
+
+    """
+
+    if magnitud_minima is None and magnitud_maxima is None:
+        return True
+
+    # Las magnitudes se guardan como float32, así que comparamos contra
+    # el mismo valor en float32 (por ejemplo 5.9 es 5.9000001 en float32).
+    if magnitud_minima is not None:
+        magnitud_minima = float(np.float32(magnitud_minima))
+
+    if magnitud_maxima is not None:
+        magnitud_maxima = float(np.float32(magnitud_maxima))
+
+    # Una partición sin magnitudes no puede cumplir ningún filtro de magnitud.
+    if estadisticas["magnitud_max"] is None:
+        return False
+
+    if magnitud_minima is not None and estadisticas["magnitud_max"] < magnitud_minima:
+        return False
+
+    if magnitud_maxima is not None and estadisticas["magnitud_min"] > magnitud_maxima:
+        return False
+
+    return True
+
+
+def leer_particion(ruta, magnitud_minima=None, magnitud_maxima=None):
+    """
+    Lee una partición como tabla de Arrow, filtrando por magnitud.
+
+    Con las estadísticas de cada row group se descartan los que no pueden
+    coincidir, sin leerlos, y los renglones de los demás se filtran después.
+
+    Parameters
+    ----------
+    ruta : str
+        La ruta de la partición.
+
+    magnitud_minima, magnitud_maxima : float
+        El rango de magnitud (inclusive), None si no hay límite.
+
+    Returns
+    -------
+    pyarrow.Table
+        Los renglones de la partición que coinciden.
+
+    """
+
+    archivo = pq.ParquetFile(ruta)
+
+    if magnitud_minima is None and magnitud_maxima is None:
+        return archivo.read()
+
+    columna = archivo.metadata.schema.names.index("Magnitud")
+    grupos = list()
+
+    for grupo in range(archivo.num_row_groups):
+        estadisticas = archivo.metadata.row_group(grupo).column(columna).statistics
+
+        if (
+            estadisticas is None
+            or not estadisticas.has_min_max
+            or particion_coincide(
+                {"magnitud_min": estadisticas.min, "magnitud_max": estadisticas.max},
+                magnitud_minima,
+                magnitud_maxima,
+            )
+        ):
+            grupos.append(grupo)
+
+    tabla = archivo.read_row_groups(grupos)
+
+    # Comparamos contra float32, la precisión con la que se guardaron las
+    # magnitudes. Los NaN no cumplen ninguna comparación.
+    filtro = pa.array(np.ones(len(tabla), dtype=bool))
+
+    if magnitud_minima is not None:
+        minimo = pa.scalar(np.float32(magnitud_minima))
+        filtro = pc.and_(filtro, pc.greater_equal(tabla["Magnitud"], minimo))
+
+    if magnitud_maxima is not None:
+        maximo = pa.scalar(np.float32(magnitud_maxima))
+        filtro = pc.and_(filtro, pc.less_equal(tabla["Magnitud"], maximo))
+
+    return tabla.filter(filtro)
+
+
+def leer_particiones(carpeta, años, magnitud_minima=None, magnitud_maxima=None):
+    """
+    Lee y junta las particiones de los años especificados.
+
+    Los filtros de magnitud se aplican al leer cada partición, ver
+    leer_particion(). Las particiones se juntan como tablas de Arrow y se
+    convierten a pandas una sola vez; Arrow une los diccionarios de las
+    columnas categóricas al convertirlas.
+
+    Parameters
+    ----------
+    carpeta : str
+        La carpeta del almacén.
+
+    años : list
+        Los años a leer.
+
+    magnitud_minima, magnitud_maxima : float
+        El rango de magnitud (inclusive), None si no hay límite.
+
+    Returns
+    -------
+    pandas.DataFrame
+        El catálogo de esos años ordenado por fecha y hora.
+
+    """
+
+    tablas = [
+        leer_particion(ruta_particion(carpeta, año), magnitud_minima, magnitud_maxima)
+        for año in años
+    ]
+
+    # Cada partición guarda los códigos de sus categorías con el entero más
+    # chico que le alcanza. Para juntarlas todas usan int32.
+    esquema = tablas[0].schema
+
+    for posicion, campo in enumerate(esquema):
+        if pa.types.is_dictionary(campo.type):
+            tipo = pa.dictionary(pa.int32(), campo.type.value_type)
+            esquema = esquema.set(posicion, campo.with_type(tipo))
+
+    tabla = pa.concat_tables([tabla.cast(esquema) for tabla in tablas])
+
+    # Las particiones están ordenadas por magnitud, regresamos al orden
+    # cronológico. El ordenamiento de Arrow es estable y deja los nulos al final.
+    return tabla.sort_by([("Fecha", "ascending"), ("Hora", "ascending")]).to_pandas()
+
+
+def ingestar_csv(ruta_nuevo, ruta=RUTA_CSV):
+    """
+    Agrega al almacén de un catálogo los sismos nuevos o revisados de un CSV.
+
+    Cada año del CSV nuevo se compara contra su partición con un anti-join
+    sobre todas las columnas. Los renglones que ya existen sin cambios se
+    ignoran. Del resto, los que tienen la misma LLAVE que un renglón de la
+    partición pero otros valores (por ejemplo el estatus) lo reemplazan y
+    los demás se agregan. Solo se reescriben los años con cambios.
+
+    Si el almacén es de otra versión del esquema se vuelve a crear con todos
+    los CSV que tenía y este, del más antiguo al más reciente según su mtime.
+    Si alguno de ellos ya no existe se lanza un error sin borrar el almacén.
+
+    Parameters
+    ----------
+    ruta_nuevo : str
+        La ruta del CSV descargado del SSN. Puede contener solo los sismos recientes.
+
+    ruta : str
+        La ruta del CSV del catálogo al que pertenece el almacén.
+
+    Returns
+    -------
+    dict
+        El número de renglones nuevos o revisados por año modificado.
+
+    Raises
+    ------
+    FileNotFoundError
+        Si el almacén es de otra versión y falta alguno de sus CSV.
+
+    """
+
+    carpeta = carpeta_almacen(ruta)
+    manifiesto = leer_manifiesto(carpeta)
+
+    # Las descargas incrementales solo existen en el almacén, así que no
+    # podemos recrearlo únicamente con este CSV sin perderlas.
+    anteriores = fuentes_anteriores(carpeta)
+
+    if anteriores:
+        fuentes = set(anteriores) | {os.path.abspath(ruta_nuevo)}
+        faltantes = sorted(fuente for fuente in fuentes if not os.path.exists(fuente))
+
+        if faltantes:
+            raise FileNotFoundError(
+                "El almacén es de otra versión y no se puede recrear porque "
+                f"faltan estos CSV: {', '.join(faltantes)}. Descarga el catálogo "
+                "completo y vuelve a crear el almacén con "
+                "cargar_catalogo(ruta, forzar=True)."
+            )
+
+        shutil.rmtree(carpeta)
+        cambios = dict()
+
+        # Las revisiones más recientes se aplican al final.
+        for fuente in sorted(fuentes, key=os.path.getmtime):
+            for año, agregados in ingestar_csv(fuente, ruta).items():
+                cambios[año] = cambios.get(año, 0) + agregados
+
+        return cambios
+
+    # Si el almacén es de otra versión y no tiene fuentes lo creamos desde cero.
+    if not manifiesto["particiones"] and os.path.exists(carpeta):
+        shutil.rmtree(carpeta)
+
+    os.makedirs(carpeta, exist_ok=True)
+
+    nuevo = leer_csv(ruta_nuevo)
+    cambios = dict()
+
+    for año, df_año in nuevo.groupby(nuevo.index.year):
+        año = int(año)
+        df_año = df_año.reset_index()
+
+        if str(año) in manifiesto["particiones"]:
+            existente = pd.read_parquet(ruta_particion(carpeta, año)).reset_index()
+
+            # Quitamos los renglones que ya existen exactamente igual.
+            columnas = list(df_año.columns)
+            nuevos = df_año[filas_ausentes(df_año, existente, columnas)]
+            nuevos = nuevos.drop_duplicates()
+
+            if nuevos.empty:
+                continue
+
+            # Si hay una versión revisada de un sismo nos quedamos con la nueva.
+            conservados = existente[filas_ausentes(existente, nuevos, LLAVE)]
+            df_año = pd.concat([conservados, nuevos], ignore_index=True)
+
+            agregados = len(nuevos)
+        else:
+            agregados = len(df_año)
+
+        df_año = unificar_categorias(df_año.set_index("Fecha"))
+
+        estadisticas = escribir_particion(carpeta, año, df_año)
+
+        manifiesto["particiones"][str(año)] = estadisticas
+        cambios[año] = agregados
+
+    # Registramos la firma del CSV para no volver a ingerirlo.
+    fuente = firma_archivo(ruta_nuevo)
+    fuente["sha256"] = calcular_hash(ruta_nuevo)
+    manifiesto["fuentes"][os.path.abspath(ruta_nuevo)] = fuente
+
+    guardar_json(manifiesto, os.path.join(carpeta, "manifiesto.json"))
+
+    return cambios
+
+
+def actualizar_almacen(ruta=RUTA_CSV, forzar=False):
+    """
+    Se asegura de que el almacén contenga la versión actual del CSV.
+
+    Parameters
+    ----------
+    ruta : str
+        La ruta del CSV del SSN.
+
+    forzar : bool
+        Si es True, se borra el almacén y se vuelve a crear desde el CSV.
+
+    Returns
+    -------
+    dict
+        El manifiesto del almacén.
+
+    """
+
+    carpeta = carpeta_almacen(ruta)
+
+    if forzar and os.path.exists(carpeta):
+        shutil.rmtree(carpeta)
+
+    if not csv_vigente(ruta, carpeta):
+        ingestar_csv(ruta, ruta)
+
+    return leer_manifiesto(carpeta)
+
+
+def version_catalogo(manifiesto):
+    """
+    Calcula un identificador de la versión de los datos de un almacén.
+
+    Cambia cada vez que se agregan o revisan sismos en cualquier partición.
+
+    Parameters
+    ----------
+    manifiesto : dict
+        El manifiesto del almacén.
+
+    Returns
+    -------
+    str
+        Un hash corto del contenido de las particiones.
+
+    """
+
+    texto = json.dumps(
+        [manifiesto["version"], manifiesto["particiones"], manifiesto["fuentes"]],
+        sort_keys=True,
+    )
+
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()[:16]
+
+
+def crear_compartido(df, carpeta):
+    """
+    Guarda las columnas principales del catálogo como arreglos .npy.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El catálogo completo ordenado por fecha.
+
+    carpeta : str
+        La carpeta donde se guardan los arreglos. Si otro proceso la crea
+        al mismo tiempo se conserva la suya.
+
+    """
+
+    # Cada proceso escribe en su propia carpeta temporal.
+    temporal = f"{carpeta}.{os.getpid()}.tmp"
+    os.makedirs(temporal)
+
+    arreglos = {
+        "fecha": df.index.to_numpy(dtype="datetime64[ns]").view(np.int64),
+        "Hora": df["Hora"].to_numpy(dtype="timedelta64[ns]").view(np.int64),
+        "estado": df["estado"].cat.codes.to_numpy(),
+    }
+
+    for columna, tipo in COLUMNAS_COMPARTIDAS.items():
+        valores = arreglos.get(columna)
+
+        if valores is None:
+            valores = df[columna].to_numpy()
+
+        np.save(os.path.join(temporal, f"{columna}.npy"), valores.astype(tipo))
+
+    guardar_json(
+        {"renglones": len(df), "estados": list(df["estado"].cat.categories)},
+        os.path.join(temporal, "meta.json"),
+    )
+
+    try:
+        os.replace(temporal, carpeta)
+    except OSError:
+        shutil.rmtree(temporal, ignore_errors=True)
+
+
+def abrir_compartido(
+    carpeta,
+    año_inicial=None,
+    año_final=None,
+    magnitud_minima=None,
+    magnitud_maxima=None,
+):
+    """
+    Abre el almacén compartido sin copiar los arreglos a la memoria del proceso.
+
+    Los arreglos se abren con np.memmap, así todos los procesos que los
+    abren comparten las mismas páginas del sistema operativo. El rango de
+    años se obtiene con una búsqueda binaria y sigue sin copiar datos; el
+    filtro de magnitud sí crea una copia, pero solo de los renglones que
+    coinciden.
+
+    Parameters
+    ----------
+    carpeta : str
+        La carpeta creada por crear_compartido().
+
+    año_inicial, año_final : int
+        El rango de años (inclusive), None si no hay límite.
+
+    magnitud_minima, magnitud_maxima : float
+        El rango de magnitud (inclusive), None si no hay límite.
+
+    Returns
+    -------
+    pandas.DataFrame
+        El catálogo con la fecha como índice y las columnas Hora, Latitud,
+        Longitud, Profundidad, Magnitud, estado y mes. Los arreglos son de
+        solo lectura.
+
+    """
+
+    with open(os.path.join(carpeta, "meta.json"), "r", encoding="utf-8") as archivo:
+        meta = json.load(archivo)
+
+    arreglos = {
+        columna: np.load(os.path.join(carpeta, f"{columna}.npy"), mmap_mode="r")
+        for columna in COLUMNAS_COMPARTIDAS
+    }
+
+    # Las fechas están ordenadas, así que el rango de años es una rebanada.
+    fechas = arreglos["fecha"]
+    inicio, fin = 0, len(fechas)
+
+    if año_inicial is not None:
+        limite = np.datetime64(f"{año_inicial}-01-01", "ns").astype(np.int64)
+        inicio = np.searchsorted(fechas, limite, side="left")
+
+    if año_final is not None:
+        limite = np.datetime64(f"{año_final + 1}-01-01", "ns").astype(np.int64)
+        fin = np.searchsorted(fechas, limite, side="left")
+
+    arreglos = {columna: valores[inicio:fin] for columna, valores in arreglos.items()}
+
+    if magnitud_minima is not None or magnitud_maxima is not None:
+        magnitudes = arreglos["Magnitud"]
+        filtro = ~np.isnan(magnitudes)
+
+        if magnitud_minima is not None:
+            filtro &= magnitudes >= np.float32(magnitud_minima)
+
+        if magnitud_maxima is not None:
+            filtro &= magnitudes <= np.float32(magnitud_maxima)
+
+        arreglos = {columna: valores[filtro] for columna, valores in arreglos.items()}
+
+    fechas = arreglos.pop("fecha").view("datetime64[ns]")
+    arreglos["Hora"] = arreglos["Hora"].view("timedelta64[ns]")
+    estados = pd.Categorical.from_codes(arreglos.pop("estado"), meta["estados"])
+
+    # Con copy=False pandas usa los arreglos directamente, sin copiarlos.
+    return pd.DataFrame(
+        {**arreglos, "estado": estados},
+        index=pd.DatetimeIndex(fechas, name="Fecha"),
+        copy=False,
+    )
+
+
+def preparar_compartido(ruta=RUTA_CSV, forzar=False):
+    """
+    Se asegura de que exista el almacén compartido de la versión actual del CSV.
+
+    Se crea una sola vez por versión del catálogo. El proceso principal
+    puede llamar esta función y pasar la carpeta a sus procesos, que la
+    abren con abrir_compartido().
+
+    Parameters
+    ----------
+    ruta : str
+        La ruta del CSV del SSN.
+
+    forzar : bool
+        Si es True, se borra el almacén y se vuelve a crear desde el CSV.
+
+    Returns
+    -------
+    str
+        La carpeta del almacén compartido.
+
+    """
+
+    carpeta = carpeta_almacen(ruta)
+    manifiesto = actualizar_almacen(ruta, forzar)
+
+    carpeta_compartida = os.path.join(
+        carpeta, f"compartido_{version_catalogo(manifiesto)}"
+    )
+
+    if not os.path.exists(carpeta_compartida):
+        años = sorted(int(año) for año in manifiesto["particiones"])
+        crear_compartido(leer_particiones(carpeta, años), carpeta_compartida)
+
+        # Borramos los almacenes compartidos de versiones anteriores.
+        for anterior in glob.glob(os.path.join(carpeta, "compartido_*")):
+            if anterior != carpeta_compartida:
+                shutil.rmtree(anterior, ignore_errors=True)
+
+    return carpeta_compartida
+
+
+def cargar_catalogo(
+    ruta=RUTA_CSV,
+    año_inicial=None,
+    año_final=None,
+    magnitud_minima=None,
+    magnitud_maxima=None,
+    forzar=False,
+    compartido=False,
+):
+    """
+    Carga el catálogo de sismos desde el almacén o, si no está al día, desde el CSV.
+
+    Parameters
+    ----------
+    ruta : str
+        La ruta del CSV del SSN.
+
+    año_inicial : int
+        Si se especifica, solo se leen los años a partir de este.
+
+    año_final : int
+        Si se especifica, solo se leen los años hasta este (inclusive).
+
+    magnitud_minima : float
+        Si se especifica, solo se leen los sismos con esta magnitud o mayor.
+        Esto también descarta los sismos sin magnitud.
+
+    magnitud_maxima : float
+        Si se especifica, solo se leen los sismos con esta magnitud o menor.
+
+    forzar : bool
+        Si es True, se borra el almacén y se vuelve a crear desde el CSV.
+
+    compartido : bool
+        Si es True, el catálogo se abre desde el almacén compartido (np.memmap).
+        Es útil cuando varios procesos necesitan el catálogo al mismo tiempo,
+        ver preparar_compartido(). Solo incluye la hora, las columnas
+        numéricas, el estado y el mes.
+
+    Returns
+    -------
+    pandas.DataFrame
+        El catálogo normalizado con la fecha como índice. Las magnitudes
+        que no se pudieron calcular quedan como NaN.
+
+    """
+
+    if compartido:
+        return abrir_compartido(
+            preparar_compartido(ruta, forzar),
+            año_inicial,
+            año_final,
+            magnitud_minima,
+            magnitud_maxima,
+        )
+
+    carpeta = carpeta_almacen(ruta)
+    manifiesto = actualizar_almacen(ruta, forzar)
+
+    # Solo leemos las particiones de los años solicitados cuyas
+    # estadísticas de magnitud coinciden con el filtro.
+    años = sorted(
+        int(año)
+        for año, estadisticas in manifiesto["particiones"].items()
+        if (año_inicial is None or int(año) >= año_inicial)
+        and (año_final is None or int(año) <= año_final)
+        and particion_coincide(estadisticas, magnitud_minima, magnitud_maxima)
+    )
+
+    # Si ningún año coincide regresamos un DataFrame vacío con las mismas columnas.
+    if not años:
+        if not manifiesto["particiones"]:
+            return pd.DataFrame()
+
+        return leer_particiones(carpeta, [min(manifiesto["particiones"])]).iloc[:0]
+
+    return leer_particiones(carpeta, años, magnitud_minima, magnitud_maxima)
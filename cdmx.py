@@ -7,11 +7,18 @@ http://www2.ssn.unam.mx:8080/catalogo/
 
 """
 
-import json
+import os
 
-import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 
+from catalogo import cargar_catalogo
+from exportar import exportar_imagenes
+from geometria import asignar_poligonos, cargar_geojson
+from densidad import agregar_celdas
+from grupos import dividir_por_rangos
+from instrumentacion import etapa
+
 
 MESES = {
     1: "Enero",
@@ -28,31 +35,73 @@ MESES = {
     12: "Diciembre",
 }
 
+# Esta lista de listas nos ayudará a definir el color de cada grupo de sismos.
+# Así como su nombre y rango.
+BINS = [
+    [0, 0.99999, "#ea80fc", "< 1.0"],
+    [1.0, 1.9999, "#00e5ff", "De 1.0 a 1.9"],
+    [2.0, 2.9999, "#fdd835", "De 2.0 a 2.9"],
+    [3.0, 10, "#FFA500", "≥ 3.0"],
+]
+
+# Con más sismos que este número se dibujan celdas en lugar de un marcador por sismo.
+UMBRAL_PUNTOS = 20_000
+
 
-def main():
+def main(df=None):
     """
     Crea un mapa choropleth con los sismos registrados dentro de la CDMX.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El catálogo ya cargado. Si no se especifica se carga desde el disco.
+
     """
 
-    # Cargamos el CSV de terremotos.
-    df = pd.read_csv("./data.csv", parse_dates=["Fecha"], index_col="Fecha")
+    # Cargamos el catálogo de terremotos, solo desde el 2010.
+    if df is None:
+        with etapa("cdmx.carga") as registro:
+            df = cargar_catalogo(año_inicial=2010)
+            registro.renglones = len(df)
 
-    # Seleccionamos registros del año 2010 en adelante.
-    df = df[df.index.year >= 2010]
+    with etapa("cdmx.figura"):
+        fig = crear_mapa(df)
 
-    # Extraemos el nombre del estado.
-    df["estado"] = df["Referencia de localizacion"].apply(
-        lambda x: x.split(",")[-1].strip()
-    )
+    with etapa("cdmx.exportacion"):
+        fig.write_image("./cdmx.png")
+
+
+def crear_mapa(df, año_inicial=2010, periodo="2010-2024"):
+    """
+    Crea la figura del mapa con los sismos registrados dentro de la CDMX desde 2010.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El catálogo de sismos. No se modifica.
+
+    año_inicial : int
+        El primer año a graficar.
+
+    periodo : str
+        El periodo que se muestra en el título.
+
+    Returns
+    -------
+    plotly.graph_objects.Figure
+        La figura lista para exportarse.
+
+    """
+
+    # Seleccionamos registros del año inicial en adelante.
+    df = df[df.index.year >= año_inicial]
 
     # Escogemos solamente sismos ocurridos en la CDMX.
     df = df[df["estado"] == "CDMX"]
 
     # Filtramos sismos sin magnitud.
-    df = df[df["Magnitud"] != "no calculable"]
-
-    # Convertimos la magnitud a float.
-    df["Magnitud"] = df["Magnitud"].astype(float)
+    df = df[df["Magnitud"].notna()]
 
     # Iniciamos el string para nuestra anotación por año.
     por_año = ["<b>Registros por año</b>"]
@@ -74,8 +123,8 @@ def main():
     ubicaciones = list()
     valores = list()
 
-    # Cargamos el GeoJSON de la CDMX.
-    geojson = json.load(open("./assets/Ciudad de México.json", "r", encoding="utf-8"))
+    # Cargamos el GeoJSON simplificado de la CDMX.
+    geojson = cargar_geojson()
 
     # Iteramos sobre las alcaldías dentro del GeoJSON.
     for item in geojson["features"]:
@@ -103,37 +152,13 @@ def main():
         )
     )
 
-    # Esta lista de listas nos ayudará a definir el color de cada grupo de sismos.
-    # Así como su nombre y rango.
-    bins = [
-        [0, 0.99999, "#ea80fc", "< 1.0"],
-        [1.0, 1.9999, "#00e5ff", "De 1.0 a 1.9"],
-        [2.0, 2.9999, "#fdd835", "De 2.0 a 2.9"],
-        [3.0, 10, "#FFA500", "≥ 3.0"],
-    ]
-
-    # Iteramos sobre la lista anterior y creamos un Scattergeo para cada una.
-    for start, end, color, nombre in bins:
-        # Creamos un DataFrame temporal con el rango de sismos.
-        temp_df = df[df["Magnitud"].between(start, end)]
-
-        # Contamos el número de sismos.
-        cantidad = len(temp_df)
+    # Dividimos los sismos en los rangos anteriores recorriendo el DataFrame una sola vez.
+    with etapa("cdmx.agregacion") as registro:
+        grupos = dividir_por_rangos(df, [(start, end) for start, end, _, _ in BINS])
+        registro.renglones = len(df)
 
-        fig.add_traces(
-            go.Scattergeo(
-                lon=temp_df["Longitud"],
-                lat=temp_df["Latitud"],
-                marker_color=color,
-                marker_size=temp_df["Magnitud"] * 4,
-                marker_line_width=2.25,
-                marker_opacity=1.0,
-                marker_symbol="circle-open",
-                name=f"{nombre} ({cantidad} sismos)"
-                if cantidad != 1
-                else f"{nombre} ({cantidad} sismo)",
-            )
-        )
+    # Creamos un Scattergeo para cada rango.
+    fig.add_traces(crear_trazas(grupos))
 
     fig.update_geos(
         fitbounds="geojson",
@@ -184,7 +209,7 @@ def main():
                 y=1.015,
                 xanchor="center",
                 yanchor="top",
-                text="Sismos registrados con epicentro cerca o dentro de la Ciudad de México (2010-2024)",
+                text=f"Sismos registrados con epicentro cerca o dentro de la Ciudad de México ({periodo})",
                 font_size=26,
             ),
             dict(
@@ -214,53 +239,134 @@ def main():
         ],
     )
 
-    fig.write_image("./cdmx.png")
+    return fig
 
 
-def registros_anuales(año):
+def crear_trazas(grupos):
     """
-    Crea un mapa choropleth con los sismos registrados dentro de la CDMX.
+    Crea un Scattergeo por cada rango de magnitud de BINS.
+
+    Si en total hay más de UMBRAL_PUNTOS sismos, los rangos se agrupan en
+    las celdas de un solo índice de densidad: hay un marcador por celda, su
+    tamaño depende de la magnitud máxima y su opacidad del número de sismos.
+
+    Parameters
+    ----------
+    grupos : list
+        Un DataFrame por rango de BINS, ver grupos.dividir_por_rangos().
+
+    Returns
+    -------
+    list
+        Las trazas, en el mismo orden que BINS.
+
     """
 
-    # Cargamos el CSV de terremotos.
-    df = pd.read_csv("./data.csv", parse_dates=["Fecha"], index_col="Fecha")
+    agregar = sum(len(temp_df) for temp_df in grupos) > UMBRAL_PUNTOS
+    trazas = list()
 
-    # Seleccionamos registros del año especificado.
-    df = df[df.index.year == año]
+    # Creamos el índice una sola vez para todos los rangos.
+    if agregar:
+        with etapa("cdmx.celdas") as registro:
+            por_rango = agregar_celdas(grupos)
+            registro.renglones = sum(len(celdas) for celdas in por_rango)
 
-    # Extraemos el nombre del estado.
-    df["estado"] = df["Referencia de localizacion"].apply(
-        lambda x: x.split(",")[-1].strip()
-    )
+    # Iteramos sobre la lista anterior y creamos un Scattergeo para cada una.
+    for numero, ((start, end, color, nombre), temp_df) in enumerate(zip(BINS, grupos)):
 
-    # Escogemos solamente sismos ocurridos en la CDMX.
-    df = df[df["estado"] == "CDMX"]
+        # Contamos el número de sismos.
+        cantidad = len(temp_df)
+        nombre = (
+            f"{nombre} ({cantidad} sismos)"
+            if cantidad != 1
+            else f"{nombre} ({cantidad} sismo)"
+        )
 
-    # Filtramos sismos sin magnitud.
-    df = df[df["Magnitud"] != "no calculable"]
+        if not agregar:
+            trazas.append(
+                go.Scattergeo(
+                    lon=temp_df["Longitud"],
+                    lat=temp_df["Latitud"],
+                    marker_color=color,
+                    marker_size=temp_df["Magnitud"] * 4,
+                    marker_line_width=2.25,
+                    marker_opacity=1.0,
+                    marker_symbol="circle-open",
+                    name=nombre,
+                )
+            )
+            continue
 
-    # Convertimos la magnitud a float.
-    df["Magnitud"] = df["Magnitud"].astype(float)
+        celdas = por_rango[numero]
 
-    # Iniciamos el string para nuestra anotación por mes.
-    por_mes = ["<b>Registros por mes</b>"]
+        # La opacidad crece con el logaritmo del número de sismos de la celda.
+        conteos = np.log1p(celdas["conteo"].to_numpy())
+        opacidades = 0.25 + 0.75 * conteos / max(conteos.max(initial=0), 1)
 
-    # Creamos un DataFrame con los registros por mes.
-    df_mes = df.resample("ME").count()["Magnitud"]
+        trazas.append(
+            go.Scattergeo(
+                lon=celdas["Longitud"],
+                lat=celdas["Latitud"],
+                marker_color=color,
+                marker_size=celdas["maximo"] * 4,
+                marker_line_width=0,
+                marker_opacity=opacidades,
+                marker_symbol="square",
+                name=nombre,
+            )
+        )
 
-    # Iteramos sobre este nuevo DataFrame para crear nuestros totales por año.
-    for index, row in df_mes.items():
-        por_mes.append(f"{MESES[index.month]}: <b>{row}</b>")
+    return trazas
 
-    # Contamos todos los sismos de nuestro DataFrame filtrado.
-    subtitulo = f"<b>{len(df)}</b> registros totales"
+
+def registros_anuales(año, df=None):
+    """
+    Crea un mapa choropleth con los sismos registrados dentro de la CDMX.
+
+    Parameters
+    ----------
+    año : int
+        El año a graficar.
+
+    df : pandas.DataFrame
+        El catálogo ya cargado. Si no se especifica se carga desde el disco.
+
+    """
+
+    # Cargamos el catálogo de terremotos, solo del año especificado.
+    if df is None:
+        with etapa("cdmx_anual.carga") as registro:
+            df = cargar_catalogo(año_inicial=año, año_final=año)
+            registro.renglones = len(df)
+
+    with etapa("cdmx_anual.figura"):
+        fig = crear_mapa_anual(df, año)
+
+    with etapa("cdmx_anual.exportacion"):
+        fig.write_image(f"./cdmx_{año}.png")
+
+
+def crear_mapa_base():
+    """
+    Crea la parte del mapa anual que no depende del año.
+
+    El contorno de las alcaldías, la configuración del mapa y el estilo son
+    iguales para todos los años. Al crearlos una sola vez, cada año solo
+    reemplaza los sismos y las anotaciones, ver crear_mapa_anual().
+
+    Returns
+    -------
+    plotly.graph_objects.Figure
+        La figura con el contorno de las alcaldías y sin sismos.
+
+    """
 
     # Estas listas serán usadas para nuestro mapa Choropleth.
     ubicaciones = list()
     valores = list()
 
-    # Cargamos el GeoJSON de la CDMX.
-    geojson = json.load(open("./assets/Ciudad de México.json", "r", encoding="utf-8"))
+    # Cargamos el GeoJSON simplificado de la CDMX.
+    geojson = cargar_geojson()
 
     # Iteramos sobre las alcaldías dentro del GeoJSON.
     for item in geojson["features"]:
@@ -288,41 +394,9 @@ def registros_anuales(año):
         )
     )
 
-    # Esta lista de listas nos ayudará a definir el color de cada grupo de sismos.
-    # Así como su nombre y rango.
-    bins = [
-        [0, 0.99999, "#ea80fc", "< 1.0"],
-        [1.0, 1.9999, "#00e5ff", "De 1.0 a 1.9"],
-        [2.0, 2.9999, "#fdd835", "De 2.0 a 2.9"],
-        [3.0, 10, "#FFA500", "≥ 3.0"],
-    ]
-
-    # Iteramos sobre la lista anterior y creamos un Scattergeo para cada una.
-    for start, end, color, nombre in bins:
-        # Creamos un DataFrame temporal con el rango de sismos.
-        temp_df = df[df["Magnitud"].between(start, end)]
-
-        # Contamos el número de sismos.
-        cantidad = len(temp_df)
-
-        fig.add_traces(
-            go.Scattergeo(
-                lon=temp_df["Longitud"],
-                lat=temp_df["Latitud"],
-                marker_color=color,
-                marker_size=temp_df["Magnitud"] * 4,
-                marker_line_width=2.25,
-                marker_opacity=1.0,
-                marker_symbol="circle-open",
-                name=f"{nombre} ({cantidad} sismos)"
-                if cantidad != 1
-                else f"{nombre} ({cantidad} sismo)",
-            )
-        )
-
     fig.update_geos(
         fitbounds="geojson",
-        projection_type="mercator",        
+        projection_type="mercator",
         framecolor="#FFFFFF",
         framewidth=2,
         showlakes=False,
@@ -348,6 +422,73 @@ def registros_anuales(año):
         width=1280,
         height=1280,
         paper_bgcolor="#1B4242",
+    )
+
+    return fig
+
+
+def crear_mapa_anual(df, año, fig=None):
+    """
+    Crea la figura del mapa con los sismos registrados dentro de la CDMX en un año.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El catálogo de sismos. No se modifica.
+
+    año : int
+        El año a graficar.
+
+    fig : plotly.graph_objects.Figure
+        Un mapa base creado con crear_mapa_base(). Se reemplazan sus sismos
+        y anotaciones, así se puede reutilizar para varios años. Si no se
+        especifica se crea uno nuevo.
+
+    Returns
+    -------
+    plotly.graph_objects.Figure
+        La figura lista para exportarse.
+
+    """
+
+    if fig is None:
+        fig = crear_mapa_base()
+
+    # Seleccionamos registros del año especificado.
+    df = df[df.index.year == año]
+
+    # Escogemos solamente sismos ocurridos en la CDMX.
+    df = df[df["estado"] == "CDMX"]
+
+    # Filtramos sismos sin magnitud.
+    df = df[df["Magnitud"].notna()]
+
+    # Iniciamos el string para nuestra anotación por mes.
+    por_mes = ["<b>Registros por mes</b>"]
+
+    # Creamos un DataFrame con los registros por mes.
+    df_mes = df.resample("ME").count()["Magnitud"]
+
+    # Iteramos sobre este nuevo DataFrame para crear nuestros totales por año.
+    for index, row in df_mes.items():
+        por_mes.append(f"{MESES[index.month]}: <b>{row}</b>")
+
+    # Contamos todos los sismos de nuestro DataFrame filtrado.
+    subtitulo = f"<b>{len(df)}</b> registros totales"
+
+    # Quitamos los sismos de un año anterior y conservamos el Choropleth.
+    fig.data = fig.data[:1]
+
+    # Dividimos los sismos en los rangos anteriores recorriendo el DataFrame una sola vez.
+    with etapa("cdmx_anual.agregacion") as registro:
+        grupos = dividir_por_rangos(df, [(start, end) for start, end, _, _ in BINS])
+        registro.renglones = len(df)
+
+    # Creamos un Scattergeo para cada rango.
+    fig.add_traces(crear_trazas(grupos))
+
+    # Las anotaciones anteriores se reemplazan por completo.
+    fig.update_layout(
         annotations=[
             dict(
                 x=0.94,
@@ -396,12 +537,109 @@ def registros_anuales(año):
         ],
     )
 
-    fig.write_image(f"./cdmx_{año}.png")
+    return fig
+
+
+def crear_mapas_anuales(df, años):
+    """
+    Crea los mapas de varios años a partir de un solo mapa base.
+
+    El mapa base (alcaldías, configuración y estilo) se crea una sola vez.
+    Para cada año solo se reemplazan los sismos y las anotaciones y la
+    figura se serializa de inmediato, antes de pasar al siguiente año.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El catálogo de sismos. No se modifica.
+
+    años : list
+        Los años a graficar.
+
+    Returns
+    -------
+    list
+        Una lista de tuplas (año, figura en formato JSON), lista para
+        exportar_imagenes().
+
+    """
+
+    # Filtramos la CDMX una sola vez para todos los años.
+    df = df[df["estado"] == "CDMX"]
+
+    fig = crear_mapa_base()
+
+    return [(año, crear_mapa_anual(df, año, fig).to_json()) for año in años]
+
+
+def exportar_mapas_anuales(años, df=None, carpeta=".", procesos=None):
+    """
+    Exporta los mapas de varios años en una sola ejecución.
+
+    Parameters
+    ----------
+    años : list
+        Los años a graficar.
+
+    df : pandas.DataFrame
+        El catálogo ya cargado. Si no se especifica se carga desde el disco.
+
+    carpeta : str
+        La carpeta donde se guardarán las imágenes.
+
+    procesos : int
+        El número de procesos para exportar las imágenes.
+
+    """
+
+    if df is None:
+        with etapa("cdmx_anual.carga") as registro:
+            df = cargar_catalogo(año_inicial=min(años), año_final=max(años))
+            registro.renglones = len(df)
+
+    with etapa("cdmx_anual.figura"):
+        trabajos = [
+            (spec, os.path.join(carpeta, f"cdmx_{año}.png"))
+            for año, spec in crear_mapas_anuales(df, años)
+        ]
+
+    with etapa("cdmx_anual.exportacion"):
+        exportar_imagenes(trabajos, procesos)
+
+
+def registros_por_alcaldia(df, año=None):
+    """
+    Cuenta los sismos con epicentro dentro de cada alcaldía de la CDMX.
+
+    A diferencia de los mapas, aquí no usamos la referencia de localización.
+    Cada sismo se asigna a una alcaldía usando su latitud y longitud.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El catálogo de sismos. No se modifica.
+
+    año : int
+        Si se especifica, solo se cuentan los sismos de ese año.
+
+    Returns
+    -------
+    pandas.Series
+        El número de sismos por alcaldía, incluyendo las que no tienen registros.
+
+    """
+
+    if año is not None:
+        df = df[df.index.year == año]
+
+    alcaldias = asignar_poligonos(df["Latitud"], df["Longitud"])
+
+    return alcaldias.value_counts().sort_values(ascending=False)
 
 
 if __name__ == "__main__":
     main()
 
-    # registros_anuales(2022)
-    # registros_anuales(2023)
     # registros_anuales(2024)
+
+    # exportar_mapas_anuales(range(2010, 2025), carpeta="./imgs")
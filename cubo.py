@@ -0,0 +1,163 @@
+"""
+Este módulo crea un cubo con los conteos del catálogo de sismos.
+
+Todas las gráficas del repositorio son agregaciones de las mismas
+dimensiones: año, mes, estado y magnitud. El cubo guarda, para cada
+combinación (año, mes, estado, magnitud redondeada a 0.1), el número de
+sismos, la suma y el máximo de sus magnitudes. Se crea una sola vez por
+versión del catálogo y se guarda junto al almacén en la carpeta ./cache.
+
+"""
+
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from catalogo import (
+    RUTA_CSV,
+    actualizar_almacen,
+    carpeta_almacen,
+    cargar_catalogo,
+    version_catalogo,
+)
+
+
+def crear_cubo(df):
+    """
+    Agrega el catálogo por año, mes, estado y magnitud.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El catálogo de sismos. Los sismos sin magnitud se descartan.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Un renglón por celda con las columnas año, mes, estado, bin
+        (magnitud × 10), conteo, suma y maximo.
+
+    """
+
+    df = df[df["Magnitud"].notna()]
+
+    # Las magnitudes del SSN tienen un decimal, así que cada bin de 0.1
+    # corresponde a un valor exacto de magnitud.
+    dimensiones = {
+        "año": df.index.year.to_numpy().astype(np.int16),
+        "mes": df.index.month.to_numpy().astype(np.int8),
+        "estado": df["estado"].array,
+        "bin": np.round(df["Magnitud"].to_numpy() * 10).astype(np.int16),
+    }
+
+    # Conservamos los sismos sin estado identificado (dropna=False).
+    cubo = (
+        df["Magnitud"]
+        .groupby(list(dimensiones.values()), observed=True, dropna=False)
+        .agg(["size", "sum", "max"])
+    )
+
+    cubo.index.names = list(dimensiones.keys())
+    cubo.columns = ["conteo", "suma", "maximo"]
+
+    return cubo.reset_index()
+
+
+def cargar_cubo(ruta=RUTA_CSV):
+    """
+    Carga el cubo de la versión actual del catálogo, creándolo si no existe.
+
+    Parameters
+    ----------
+    ruta : str
+        La ruta del CSV del SSN.
+
+    Returns
+    -------
+    pandas.DataFrame
+        El cubo, ver crear_cubo().
+
+    """
+
+    carpeta = carpeta_almacen(ruta)
+    version = version_catalogo(actualizar_almacen(ruta))
+    ruta_cubo = os.path.join(carpeta, f"cubo_{version}.parquet")
+
+    if os.path.exists(ruta_cubo):
+        return pd.read_parquet(ruta_cubo)
+
+    cubo = crear_cubo(cargar_catalogo(ruta))
+
+    temporal = f"{ruta_cubo}.tmp"
+    cubo.to_parquet(temporal)
+    os.replace(temporal, ruta_cubo)
+
+    # Borramos los cubos de versiones anteriores.
+    for anterior in glob.glob(os.path.join(carpeta, "cubo_*.parquet")):
+        if anterior != ruta_cubo:
+            os.remove(anterior)
+
+    return cubo
+
+
+def consultar(
+    cubo,
+    por,
+    año_inicial=None,
+    año_final=None,
+    estado=None,
+    magnitud_minima=None,
+    magnitud_maxima=None,
+):
+    """
+    Filtra el cubo y suma sus celdas agrupando por las dimensiones indicadas.
+
+    Parameters
+    ----------
+    cubo : pandas.DataFrame
+        El cubo, ver crear_cubo().
+
+    por : list
+        Las dimensiones del resultado, por ejemplo ["mes"] o ["año", "mes"].
+
+    año_inicial, año_final : int
+        El rango de años (inclusive), None si no hay límite.
+
+    estado : str
+        La abreviatura del estado, None para todos.
+
+    magnitud_minima, magnitud_maxima : float
+        El rango de magnitud (inclusive), None si no hay límite.
+
+    Returns
+    -------
+    pandas.DataFrame
+        El conteo, la suma y el máximo de las magnitudes por grupo.
+
+    """
+
+    filtro = np.ones(len(cubo), dtype=bool)
+
+    if año_inicial is not None:
+        filtro &= cubo["año"].to_numpy() >= año_inicial
+
+    if año_final is not None:
+        filtro &= cubo["año"].to_numpy() <= año_final
+
+    if estado is not None:
+        filtro &= (cubo["estado"] == estado).to_numpy()
+
+    # Comparamos contra los bins enteros para evitar errores de redondeo.
+    if magnitud_minima is not None:
+        filtro &= cubo["bin"].to_numpy() >= round(magnitud_minima * 10)
+
+    if magnitud_maxima is not None:
+        filtro &= cubo["bin"].to_numpy() <= round(magnitud_maxima * 10)
+
+    return (
+        cubo[filtro]
+        .groupby(por, observed=True, dropna=False)
+        .agg(conteo=("conteo", "sum"), suma=("suma", "sum"), maximo=("maximo", "max"))
+    )
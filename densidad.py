@@ -0,0 +1,322 @@
+"""
+Este módulo crea un índice de densidad de sismos con varios niveles de detalle.
+
+Con cientos de miles de sismos, un marcador por sismo hace que la figura
+pese cientos de MB y que kaleido tarde minutos en exportarla. En su lugar
+los sismos se agrupan en las celdas de un quadtree sobre latitud y
+longitud: en el nivel n el mundo se divide en 2^n × 2^n celdas cuadradas
+y cada celda se divide en 4 en el nivel siguiente.
+
+Cada sismo recibe el código Morton (orden Z) de su celda en el nivel más
+fino. Al ordenar los códigos, las celdas de cualquier nivel son rebanadas
+contiguas, así que después de un solo ordenamiento se puede elegir el
+nivel y contar los sismos de sus celdas sin volver a ordenar. Los sismos
+de un mapa pueden separarse en grupos (por ejemplo rangos de magnitud)
+que comparten ese mismo ordenamiento.
+
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# El nivel más fino, con celdas de 360 / 2^16 ≈ 0.0055 grados (~600 m).
+NIVEL_MAXIMO = 16
+
+# Los niveles que se guardan en el índice.
+NIVELES = range(1, NIVEL_MAXIMO + 1)
+
+# Las celdas cubren 360 grados en ambos ejes para que sean cuadradas.
+EXTENSION = 360.0
+
+# Los bits que ocupa el código Morton del nivel más fino, 2 por nivel.
+BITS = 2 * NIVEL_MAXIMO
+
+# El número máximo de celdas que se dibujan en un mapa.
+MAXIMO_CELDAS = 5000
+
+
+def separar_bits(valores):
+    """
+    Intercala un cero entre cada bit de enteros de hasta 32 bits.
+    """
+
+    valores = valores.astype(np.uint64) & np.uint64(0xFFFFFFFF)
+
+    for corrimiento, mascara in (
+        (16, 0x0000FFFF0000FFFF),
+        (8, 0x00FF00FF00FF00FF),
+        (4, 0x0F0F0F0F0F0F0F0F),
+        (2, 0x3333333333333333),
+        (1, 0x5555555555555555),
+    ):
+        valores = (valores | (valores << np.uint64(corrimiento))) & np.uint64(mascara)
+
+    return valores
+
+
+def juntar_bits(valores):
+    """
+    La operación inversa de separar_bits(): toma los bits pares.
+    """
+
+    valores = valores.astype(np.uint64) & np.uint64(0x5555555555555555)
+
+    for corrimiento, mascara in (
+        (1, 0x3333333333333333),
+        (2, 0x0F0F0F0F0F0F0F0F),
+        (4, 0x00FF00FF00FF00FF),
+        (8, 0x0000FFFF0000FFFF),
+        (16, 0x00000000FFFFFFFF),
+    ):
+        valores = (valores | (valores >> np.uint64(corrimiento))) & np.uint64(mascara)
+
+    return valores
+
+
+def codificar(latitudes, longitudes, nivel=NIVEL_MAXIMO):
+    """
+    Calcula el código Morton de la celda de cada coordenada.
+
+    Parameters
+    ----------
+    latitudes, longitudes : numpy.ndarray
+        Las coordenadas en grados. Deben ser finitas.
+
+    nivel : int
+        El nivel del quadtree.
+
+    Returns
+    -------
+    numpy.ndarray
+        Los códigos (uint64). El código de la celda padre en el nivel
+        n - k es el código corrido 2k bits a la derecha.
+
+    """
+
+    celdas = 1 << nivel
+
+    x = np.floor((np.asarray(longitudes, dtype=np.float64) + 180) / EXTENSION * celdas)
+    y = np.floor((np.asarray(latitudes, dtype=np.float64) + 90) / EXTENSION * celdas)
+
+    # La longitud 180 queda en la última celda en lugar de salirse.
+    x = np.clip(x, 0, celdas - 1)
+    y = np.clip(y, 0, celdas - 1)
+
+    return separar_bits(x) | (separar_bits(y) << np.uint64(1))
+
+
+def decodificar(codigos, nivel):
+    """
+    Regresa el centro de las celdas de un nivel.
+
+    Parameters
+    ----------
+    codigos : numpy.ndarray
+        Los códigos Morton de las celdas.
+
+    nivel : int
+        El nivel de los códigos.
+
+    Returns
+    -------
+    tuple
+        Las latitudes y longitudes del centro de cada celda, y el tamaño
+        de las celdas en grados.
+
+    """
+
+    codigos = np.asarray(codigos, dtype=np.uint64)
+    tamaño = EXTENSION / (1 << nivel)
+
+    x = juntar_bits(codigos).astype(np.float64)
+    y = juntar_bits(codigos >> np.uint64(1)).astype(np.float64)
+
+    return -90 + (y + 0.5) * tamaño, -180 + (x + 0.5) * tamaño, tamaño
+
+
+def crear_indice(df, grupos=None):
+    """
+    Ordena los sismos por grupo y por el código Morton de su celda.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El catálogo de sismos. Los sismos sin magnitud o sin coordenadas
+        se descartan.
+
+    grupos : numpy.ndarray
+        Opcionalmente, el número de grupo (entero no negativo) de cada
+        sismo. Las celdas se cuentan por separado para cada grupo.
+
+    Returns
+    -------
+    tuple
+        Las llaves ordenadas, con el grupo en los bits altos y el código
+        Morton en los 2 * NIVEL_MAXIMO bits bajos, y la magnitud de cada
+        sismo en el mismo orden.
+
+    """
+
+    magnitudes = df["Magnitud"].to_numpy(dtype=np.float32)
+    latitudes = df["Latitud"].to_numpy(dtype=np.float64)
+    longitudes = df["Longitud"].to_numpy(dtype=np.float64)
+
+    if grupos is None:
+        grupos = np.zeros(len(df), dtype=np.uint64)
+
+    validos = np.isfinite(magnitudes) & np.isfinite(latitudes) & np.isfinite(longitudes)
+
+    # Con el grupo en los bits altos, un solo ordenamiento deja juntas las
+    # celdas de cada grupo.
+    llaves = codificar(latitudes[validos], longitudes[validos])
+    llaves |= np.asarray(grupos, dtype=np.uint64)[validos] << np.uint64(BITS)
+
+    orden = np.argsort(llaves, kind="stable")
+
+    return llaves[orden], magnitudes[validos][orden]
+
+
+def contar_celdas(indice):
+    """
+    Regresa el número de celdas con sismos en cada nivel de NIVELES.
+
+    Dos llaves consecutivas quedan en celdas distintas a partir del nivel
+    que contiene el bit más alto en que difieren, así que los conteos de
+    todos los niveles se obtienen con una sola pasada sobre las llaves.
+
+    Parameters
+    ----------
+    indice : tuple
+        El índice, ver crear_indice().
+
+    Returns
+    -------
+    numpy.ndarray
+        El número de celdas de cada nivel, en el mismo orden que NIVELES.
+
+    """
+
+    llaves, _ = indice
+
+    if len(llaves) == 0:
+        return np.zeros(len(NIVELES), dtype=np.int64)
+
+    # Un cambio de grupo separa las celdas en todos los niveles.
+    diferencias = np.minimum(llaves[1:] ^ llaves[:-1], np.uint64(1 << BITS))
+    diferencias = diferencias[diferencias != 0]
+
+    # frexp regresa la posición del bit más alto más uno, sin redondeos
+    # porque las diferencias caben en 53 bits.
+    bit_alto = np.frexp(diferencias.astype(np.float64))[1] - 1
+    primer_nivel = np.maximum(NIVEL_MAXIMO - bit_alto // 2, min(NIVELES))
+
+    cortes = np.cumsum(np.bincount(primer_nivel, minlength=NIVEL_MAXIMO + 1))
+
+    return 1 + cortes[list(NIVELES)]
+
+
+def elegir_nivel(indice, maximo_celdas=MAXIMO_CELDAS):
+    """
+    Regresa el nivel más fino cuyo número de celdas no pasa del máximo.
+
+    Si ningún nivel cabe se regresa el más grueso.
+    """
+
+    aptos = np.flatnonzero(contar_celdas(indice) <= maximo_celdas)
+
+    return NIVELES[aptos.max()] if len(aptos) else min(NIVELES)
+
+
+def consultar_celdas(indice, nivel, grupo=None):
+    """
+    Cuenta los sismos y su magnitud máxima por celda en un nivel del índice.
+
+    Parameters
+    ----------
+    indice : tuple
+        El índice, ver crear_indice().
+
+    nivel : int
+        El nivel de las celdas.
+
+    grupo : int
+        Opcionalmente, solo se regresan las celdas de este grupo.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Un renglón por celda con las columnas Latitud y Longitud (el centro
+        de la celda), conteo y maximo. El tamaño de las celdas en grados
+        está en el atributo "tamaño".
+
+    """
+
+    llaves, magnitudes = indice
+
+    # Las llaves de un grupo son una rebanada contigua.
+    if grupo is not None:
+        limites = np.array([grupo, grupo + 1], dtype=np.uint64) << np.uint64(BITS)
+        inicio, fin = np.searchsorted(llaves, limites)
+        llaves, magnitudes = llaves[inicio:fin], magnitudes[inicio:fin]
+
+    padres = llaves >> np.uint64(2 * (NIVEL_MAXIMO - nivel))
+
+    # Las llaves están ordenadas, cada celda empieza donde cambia el padre.
+    inicios = np.flatnonzero(np.r_[True, padres[1:] != padres[:-1]])[: len(padres)]
+    celdas = padres[inicios] & np.uint64((1 << (2 * nivel)) - 1)
+
+    latitudes, longitudes, tamaño = decodificar(celdas, nivel)
+
+    resultado = pd.DataFrame(
+        {
+            "Latitud": latitudes,
+            "Longitud": longitudes,
+            "conteo": np.diff(np.r_[inicios, len(padres)]).astype(np.int32),
+            "maximo": np.maximum.reduceat(magnitudes, inicios)
+            if len(inicios)
+            else np.array([], dtype=np.float32),
+        }
+    )
+
+    resultado.attrs["tamaño"] = tamaño
+
+    return resultado
+
+
+def agregar_celdas(grupos, maximo_celdas=MAXIMO_CELDAS):
+    """
+    Agrupa los sismos de varios DataFrames en celdas del mismo nivel.
+
+    El índice se crea una sola vez para todos los sismos y se usa el nivel
+    más fino cuyo total de celdas, sumando todos los DataFrames, cabe en
+    el máximo.
+
+    Parameters
+    ----------
+    grupos : list
+        Los DataFrames a agrupar, por ejemplo uno por rango de magnitud.
+
+    maximo_celdas : int
+        El número máximo de celdas del resultado.
+
+    Returns
+    -------
+    list
+        Las celdas de cada DataFrame, ver consultar_celdas().
+
+    """
+
+    columnas = ["Magnitud", "Latitud", "Longitud"]
+    df = pd.DataFrame(
+        {
+            columna: np.concatenate([grupo[columna].to_numpy() for grupo in grupos])
+            for columna in columnas
+        }
+    )
+    numeros = np.repeat(np.arange(len(grupos)), [len(grupo) for grupo in grupos])
+
+    indice = crear_indice(df, numeros)
+    nivel = elegir_nivel(indice, maximo_celdas)
+
+    return [consultar_celdas(indice, nivel, numero) for numero in range(len(grupos))]
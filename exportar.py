@@ -0,0 +1,491 @@
+"""
+Este módulo exporta varias figuras de Plotly a PNG en paralelo.
+
+La conversión a imagen con kaleido es el paso más lento de cada gráfica.
+Aquí repartimos los trabajos (figura, ruta) entre varios procesos. Desde
+kaleido 1.0 cada exportación abre y cierra su propio Chromium, por eso
+cada proceso inicia al arrancar el servidor de kaleido (iniciar_kaleido())
+y lo reutiliza para todas sus imágenes: el costo de abrir el navegador se
+paga una sola vez por proceso y no una vez por imagen.
+
+Además, cada imagen se guarda en un caché identificado por el hash de la
+figura (su JSON) y de las versiones de plotly y kaleido. Si la figura no
+cambió desde la última vez, se reutiliza la imagen en lugar de volver a
+convertirla.
+
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from importlib import metadata
+from multiprocessing.util import Finalize
+
+import kaleido
+import plotly
+import plotly.io as pio
+
+from catalogo import CARPETA_CACHE, guardar_json
+
+
+# La carpeta donde se guardan las imágenes ya convertidas.
+CARPETA_RENDER = os.path.join(CARPETA_CACHE, "render")
+
+# Los días que se conservan las imágenes que ya no corresponden a ninguna ruta.
+DIAS_VIGENCIA = 7
+
+# El PID del proceso que inició el servidor de kaleido.
+_pid_kaleido = None
+
+
+def iniciar_kaleido():
+    """
+    Inicia el servidor de kaleido del proceso actual, si no está iniciado.
+
+    Con el servidor, Chromium se abre una sola vez y todas las llamadas a
+    pio.to_image() y pio.write_image() del proceso lo reutilizan. Se usa
+    como initializer de los procesos del pool, ver crear_pool(). El
+    servidor se detiene al terminar el proceso.
+
+    Con kaleido 0.x no hace nada, ya que su proceso se conserva entre
+    exportaciones. Si no se encuentra Chrome tampoco hace nada y el error
+    se reporta al exportar la primera imagen.
+    """
+
+    global _pid_kaleido
+
+    if not hasattr(kaleido, "start_sync_server") or _pid_kaleido == os.getpid():
+        return
+
+    # Sin navegador el hilo del servidor termina con un error y las
+    # exportaciones se quedarían esperando su respuesta para siempre.
+    from choreographer.browsers.chromium import Chromium
+
+    if Chromium.find_browser(skip_local=False) is None:
+        return
+
+    kaleido.start_sync_server(silence_warnings=True)
+    _pid_kaleido = os.getpid()
+
+    # Los procesos del pool terminan sin ejecutar atexit, pero sí ejecutan
+    # los finalizadores de multiprocessing.
+    Finalize(None, detener_kaleido, exitpriority=10)
+
+
+def detener_kaleido():
+    """
+    Detiene el servidor de kaleido iniciado por iniciar_kaleido().
+    """
+
+    global _pid_kaleido
+
+    if _pid_kaleido == os.getpid():
+        kaleido.stop_sync_server(silence_warnings=True)
+        _pid_kaleido = None
+
+
+def crear_pool(procesos):
+    """
+    Crea un pool de procesos, cada uno con su servidor de kaleido.
+
+    Los procesos se crean con spawn en lugar de fork: un fork copiaría el
+    servidor de kaleido del proceso principal sin el hilo que lo atiende.
+
+    Parameters
+    ----------
+    procesos : int
+        El número de procesos.
+
+    Returns
+    -------
+    concurrent.futures.ProcessPoolExecutor
+        El pool, para usarse con un bloque with.
+
+    """
+
+    return ProcessPoolExecutor(
+        max_workers=procesos,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=iniciar_kaleido,
+    )
+
+
+def exportar_figura(spec, ruta, formato="png"):
+    """
+    Exporta una figura serializada como JSON y mide el tiempo que tomó.
+
+    Esta función se ejecuta dentro de los procesos del pool, por eso recibe
+    la figura como texto y no como objeto.
+
+    Parameters
+    ----------
+    spec : str
+        La figura en formato JSON, tal como la regresa fig.to_json().
+
+    ruta : str
+        La ruta de la imagen a crear.
+
+    formato : str
+        El formato de la imagen.
+
+    Returns
+    -------
+    dict
+        La ruta de la imagen, el PID del proceso y los segundos transcurridos.
+
+    """
+
+    inicio = time.perf_counter()
+
+    pio.write_image(json.loads(spec), ruta, format=formato, validate=False)
+
+    return {
+        "ruta": ruta,
+        "pid": os.getpid(),
+        "segundos": time.perf_counter() - inicio,
+    }
+
+
+def rasterizar_figura(spec, formato="png"):
+    """
+    Convierte una figura serializada como JSON a los bytes de una imagen.
+
+    Parameters
+    ----------
+    spec : str
+        La figura en formato JSON, tal como la regresa fig.to_json().
+
+    formato : str
+        El formato de la imagen.
+
+    Returns
+    -------
+    bytes
+        El contenido de la imagen.
+
+    """
+
+    return pio.to_image(json.loads(spec), format=formato, validate=False)
+
+
+def versiones_render():
+    """
+    Regresa las versiones de plotly y kaleido, que también determinan la imagen.
+
+    Returns
+    -------
+    str
+        Las versiones en una sola cadena.
+
+    """
+
+    try:
+        version_kaleido = metadata.version("kaleido")
+    except metadata.PackageNotFoundError:
+        version_kaleido = ""
+
+    return f"plotly={plotly.__version__};kaleido={version_kaleido}"
+
+
+def hash_figura(spec, formato="png"):
+    """
+    Calcula la llave del caché de una figura.
+
+    Parameters
+    ----------
+    spec : str
+        La figura en formato JSON, tal como la regresa fig.to_json().
+
+    formato : str
+        El formato de la imagen.
+
+    Returns
+    -------
+    str
+        El hash SHA-256 en hexadecimal.
+
+    """
+
+    contenido = "\n".join([versiones_render(), formato, spec])
+
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+def leer_manifiesto_render(carpeta=CARPETA_RENDER):
+    """
+    Lee el manifiesto del caché de imágenes.
+
+    Parameters
+    ----------
+    carpeta : str
+        La carpeta del caché.
+
+    Returns
+    -------
+    dict
+        Las entradas del caché (llave → formato y última vez que se usó)
+        y la llave de la imagen que tiene actualmente cada ruta.
+
+    """
+
+    ruta = os.path.join(carpeta, "manifiesto.json")
+
+    if not os.path.exists(ruta):
+        return {"entradas": {}, "rutas": {}}
+
+    with open(ruta, encoding="utf-8") as archivo:
+        return json.load(archivo)
+
+
+def ruta_en_cache(carpeta, llave, formato="png"):
+    """
+    Regresa la ruta de la imagen guardada en el caché con la llave indicada.
+    """
+
+    return os.path.join(carpeta, f"{llave}.{formato}")
+
+
+def en_cache(manifiesto, carpeta, llave, formato="png"):
+    """
+    Indica si la imagen con la llave indicada ya existe en el caché.
+    """
+
+    return llave in manifiesto["entradas"] and os.path.exists(
+        ruta_en_cache(carpeta, llave, formato)
+    )
+
+
+def guardar_manifiesto_render(manifiesto, carpeta=CARPETA_RENDER):
+    """
+    Borra las imágenes vencidas del caché y guarda el manifiesto.
+
+    Una imagen está vencida si ninguna ruta la usa y no se ha utilizado
+    en los últimos DIAS_VIGENCIA días, por ejemplo la versión anterior
+    de una gráfica cuyos datos cambiaron.
+
+    Parameters
+    ----------
+    manifiesto : dict
+        El manifiesto, ver leer_manifiesto_render().
+
+    carpeta : str
+        La carpeta del caché.
+
+    """
+
+    vigentes = set(manifiesto["rutas"].values())
+    limite = time.time() - DIAS_VIGENCIA * 24 * 60 * 60
+
+    for llave, entrada in list(manifiesto["entradas"].items()):
+        guardada = ruta_en_cache(carpeta, llave, entrada["formato"])
+
+        if llave in vigentes and os.path.exists(guardada):
+            continue
+
+        if entrada["usado"] < limite or not os.path.exists(guardada):
+            del manifiesto["entradas"][llave]
+
+            if os.path.exists(guardada):
+                os.remove(guardada)
+
+    guardar_json(manifiesto, os.path.join(carpeta, "manifiesto.json"))
+
+
+def ejecutar_en_paralelo(funcion, argumentos, procesos=None, con_kaleido=False):
+    """
+    Ejecuta una función con cada grupo de argumentos usando varios procesos.
+
+    Parameters
+    ----------
+    funcion : callable
+        La función a ejecutar, debe poder importarse desde los procesos.
+
+    argumentos : list
+        Una lista de tuplas con los argumentos de cada llamada.
+
+    procesos : int
+        El número de procesos a utilizar. Si no se especifica se usa
+        el número de núcleos. Con 1 se ejecuta en el proceso actual.
+
+    con_kaleido : bool
+        Si es True, la función exporta imágenes y cada proceso inicia su
+        servidor de kaleido, ver crear_pool().
+
+    Returns
+    -------
+    list
+        Los resultados en el mismo orden que los argumentos.
+
+    """
+
+    if procesos is None:
+        procesos = os.cpu_count() or 1
+
+    # No tiene caso crear más procesos que trabajos.
+    procesos = max(1, min(procesos, len(argumentos)))
+
+    if procesos == 1:
+        if con_kaleido:
+            iniciar_kaleido()
+
+        return [funcion(*args) for args in argumentos]
+
+    if con_kaleido:
+        pool = crear_pool(procesos)
+    else:
+        pool = ProcessPoolExecutor(max_workers=procesos)
+
+    with pool as executor:
+        futuros = [executor.submit(funcion, *args) for args in argumentos]
+
+        return [futuro.result() for futuro in futuros]
+
+
+def rasterizar_imagenes(
+    figuras, procesos=None, formato="png", forzar=False, carpeta=CARPETA_RENDER
+):
+    """
+    Convierte una lista de figuras a imágenes en memoria usando varios procesos.
+
+    Las figuras que ya están en el caché no se vuelven a convertir.
+
+    Parameters
+    ----------
+    figuras : list
+        Las figuras de Plotly.
+
+    procesos : int
+        El número de procesos a utilizar.
+
+    formato : str
+        El formato de las imágenes.
+
+    forzar : bool
+        Si es True, convierte todas las figuras aunque estén en el caché.
+
+    carpeta : str
+        La carpeta del caché.
+
+    Returns
+    -------
+    list
+        Los bytes de cada imagen, en el mismo orden que las figuras.
+
+    """
+
+    os.makedirs(carpeta, exist_ok=True)
+    manifiesto = leer_manifiesto_render(carpeta)
+
+    specs = [fig.to_json() for fig in figuras]
+    llaves = [hash_figura(spec, formato) for spec in specs]
+    imagenes = [None] * len(figuras)
+
+    for i, llave in enumerate(llaves):
+        if not forzar and en_cache(manifiesto, carpeta, llave, formato):
+            with open(ruta_en_cache(carpeta, llave, formato), "rb") as archivo:
+                imagenes[i] = archivo.read()
+
+    pendientes = [i for i, imagen in enumerate(imagenes) if imagen is None]
+    argumentos = [(specs[i], formato) for i in pendientes]
+    nuevas = ejecutar_en_paralelo(
+        rasterizar_figura, argumentos, procesos, con_kaleido=True
+    )
+
+    for i, imagen in zip(pendientes, nuevas):
+        with open(ruta_en_cache(carpeta, llaves[i], formato), "wb") as archivo:
+            archivo.write(imagen)
+
+        imagenes[i] = imagen
+
+    ahora = time.time()
+
+    for llave in llaves:
+        manifiesto["entradas"][llave] = {"formato": formato, "usado": ahora}
+
+    guardar_manifiesto_render(manifiesto, carpeta)
+
+    return imagenes
+
+
+def exportar_imagenes(
+    trabajos, procesos=None, formato="png", forzar=False, carpeta=CARPETA_RENDER
+):
+    """
+    Exporta una lista de figuras a imágenes usando varios procesos.
+
+    Las figuras que ya están en el caché se copian en lugar de convertirse,
+    y si la ruta ya tiene la imagen correcta no se hace nada.
+
+    Parameters
+    ----------
+    trabajos : list
+        Una lista de tuplas (figura, ruta). La figura también puede estar
+        serializada como JSON, ver cdmx.crear_mapas_anuales().
+
+    procesos : int
+        El número de procesos a utilizar.
+
+    formato : str
+        El formato de las imágenes.
+
+    forzar : bool
+        Si es True, exporta todas las figuras aunque estén en el caché.
+
+    carpeta : str
+        La carpeta del caché.
+
+    Returns
+    -------
+    list
+        Un diccionario por trabajo, en el mismo orden, con la ruta, los
+        segundos que tomó exportarlo y si la imagen se tomó del caché.
+
+    """
+
+    os.makedirs(carpeta, exist_ok=True)
+    manifiesto = leer_manifiesto_render(carpeta)
+
+    # Serializamos las figuras antes de enviarlas a los procesos.
+    specs = [
+        (fig if isinstance(fig, str) else fig.to_json(), ruta)
+        for fig, ruta in trabajos
+    ]
+    llaves = [hash_figura(spec, formato) for spec, _ in specs]
+    resultados = [None] * len(trabajos)
+
+    for i, ((_, ruta), llave) in enumerate(zip(specs, llaves)):
+        if forzar or not en_cache(manifiesto, carpeta, llave, formato):
+            continue
+
+        absoluta = os.path.abspath(ruta)
+
+        if manifiesto["rutas"].get(absoluta) != llave or not os.path.exists(ruta):
+            shutil.copyfile(ruta_en_cache(carpeta, llave, formato), ruta)
+
+        resultados[i] = {"ruta": ruta, "pid": os.getpid(), "segundos": 0.0}
+
+    pendientes = [i for i, resultado in enumerate(resultados) if resultado is None]
+    convertidos = set(pendientes)
+    argumentos = [(*specs[i], formato) for i in pendientes]
+    exportados = ejecutar_en_paralelo(
+        exportar_figura, argumentos, procesos, con_kaleido=True
+    )
+
+    for i, resultado in zip(pendientes, exportados):
+        shutil.copyfile(resultado["ruta"], ruta_en_cache(carpeta, llaves[i], formato))
+        resultados[i] = resultado
+
+    ahora = time.time()
+
+    for i, ((_, ruta), llave) in enumerate(zip(specs, llaves)):
+        manifiesto["rutas"][os.path.abspath(ruta)] = llave
+        manifiesto["entradas"][llave] = {"formato": formato, "usado": ahora}
+        resultados[i]["cache"] = i not in convertidos
+
+    guardar_manifiesto_render(manifiesto, carpeta)
+
+    return resultados
@@ -0,0 +1,518 @@
+"""
+Este módulo prepara los GeoJSON que se usan como contorno en los mapas.
+
+El GeoJSON original de la CDMX tiene mucha más resolución de la que se
+puede apreciar en una imagen de 1280 píxeles. Aquí simplificamos los
+polígonos con el algoritmo de Douglas-Peucker, redondeamos las coordenadas
+y guardamos el resultado en la carpeta ./cache para no repetir el proceso.
+
+También incluye una unión espacial para saber dentro de qué polígono
+(alcaldía, estado, etc.) se encuentra el epicentro de cada sismo.
+
+"""
+
+import functools
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from catalogo import CARPETA_CACHE, calcular_hash
+
+
+RUTA_CDMX = "./assets/Ciudad de México.json"
+
+# La CDMX mide cerca de 0.55 grados de norte a sur y en el mapa de 1280 px
+# eso equivale a unos 0.00047 grados por píxel. Una tolerancia menor a medio
+# píxel no produce cambios visibles.
+TOLERANCIA = 0.0002
+
+# Con 4 decimales la precisión es de unos 11 metros (0.2 px).
+DECIMALES = 4
+
+# Solo conservamos las propiedades que usan los mapas.
+PROPIEDADES = ["CVEGEO", "NOMGEO"]
+
+# El número máximo de comparaciones punto-arista que se hacen a la vez.
+# Limita la memoria usada por los arreglos temporales.
+COMPARACIONES_POR_BLOQUE = 4_000_000
+
+# El número promedio de aristas por franja horizontal del índice de aristas.
+ARISTAS_POR_FRANJA = 4
+
+
+def simplificar_linea(puntos, tolerancia):
+    """
+    Simplifica una línea con el algoritmo de Douglas-Peucker.
+
+    Parameters
+    ----------
+    puntos : numpy.ndarray
+        Un arreglo de (n, 2) con las coordenadas de la línea.
+
+    tolerancia : float
+        La distancia máxima, en grados, entre la línea original y la simplificada.
+
+    Returns
+    -------
+    numpy.ndarray
+        Los puntos que se conservan, incluyendo el primero y el último.
+
+    """
+
+    conservar = np.zeros(len(puntos), dtype=bool)
+    conservar[0] = conservar[-1] = True
+
+    # Usamos una pila en lugar de recursión para no depender del límite de Python.
+    pila = [(0, len(puntos) - 1)]
+
+    while pila:
+        inicio, fin = pila.pop()
+
+        if fin - inicio < 2:
+            continue
+
+        a = puntos[inicio]
+        relativos = puntos[inicio + 1 : fin] - a
+
+        # Calculamos la distancia de cada punto intermedio a la recta a-b.
+        dx, dy = puntos[fin] - a
+        largo = np.hypot(dx, dy)
+
+        if largo == 0:
+            distancias = np.hypot(relativos[:, 0], relativos[:, 1])
+        else:
+            distancias = np.abs(dx * relativos[:, 1] - dy * relativos[:, 0]) / largo
+
+        indice = np.argmax(distancias)
+
+        # Si el punto más lejano rebasa la tolerancia lo conservamos
+        # y repetimos el proceso con cada mitad.
+        if distancias[indice] > tolerancia:
+            medio = inicio + 1 + indice
+            conservar[medio] = True
+            pila.append((inicio, medio))
+            pila.append((medio, fin))
+
+    return puntos[conservar]
+
+
+def simplificar_anillo(anillo, tolerancia, decimales):
+    """
+    Simplifica un anillo cerrado de un polígono.
+
+    Parameters
+    ----------
+    anillo : list
+        Las coordenadas [lon, lat] del anillo. El último punto es igual al primero.
+
+    tolerancia : float
+        La tolerancia de la simplificación, en grados.
+
+    decimales : int
+        El número de decimales de las coordenadas resultantes.
+
+    Returns
+    -------
+    list
+        Las coordenadas simplificadas y redondeadas.
+
+    """
+
+    puntos = np.asarray(anillo, dtype=float)
+
+    # En un anillo el primer y último punto son el mismo, así que lo dividimos
+    # en dos líneas usando el punto más lejano al inicio.
+    lejano = np.argmax(((puntos - puntos[0]) ** 2).sum(axis=1))
+
+    primera = simplificar_linea(puntos[: lejano + 1], tolerancia)
+    segunda = simplificar_linea(puntos[lejano:], tolerancia)
+
+    resultado = np.round(np.vstack([primera, segunda[1:]]), decimales)
+
+    # Al redondear pueden quedar puntos repetidos seguidos.
+    repetidos = np.zeros(len(resultado), dtype=bool)
+    repetidos[1:] = (resultado[1:] == resultado[:-1]).all(axis=1)
+    resultado = resultado[~repetidos]
+
+    # Un anillo válido necesita al menos 4 puntos.
+    if len(resultado) < 4:
+        return np.round(puntos, decimales).tolist()
+
+    return resultado.tolist()
+
+
+def simplificar_geojson(geojson, tolerancia=TOLERANCIA, decimales=DECIMALES):
+    """
+    Simplifica todos los polígonos de un GeoJSON.
+
+    Parameters
+    ----------
+    geojson : dict
+        Un FeatureCollection con geometrías Polygon o MultiPolygon.
+
+    tolerancia : float
+        La tolerancia de la simplificación, en grados.
+
+    decimales : int
+        El número de decimales de las coordenadas resultantes.
+
+    Returns
+    -------
+    dict
+        Un nuevo FeatureCollection, el original no se modifica.
+
+    """
+
+    features = list()
+
+    for item in geojson["features"]:
+        geometria = item["geometry"]
+
+        if geometria["type"] == "Polygon":
+            poligonos = [geometria["coordinates"]]
+        else:
+            poligonos = geometria["coordinates"]
+
+        poligonos = [
+            [simplificar_anillo(anillo, tolerancia, decimales) for anillo in poligono]
+            for poligono in poligonos
+        ]
+
+        features.append(
+            {
+                "type": "Feature",
+                "properties": {
+                    llave: valor
+                    for llave, valor in item["properties"].items()
+                    if llave in PROPIEDADES
+                },
+                "geometry": {
+                    "type": geometria["type"],
+                    "coordinates": poligonos[0]
+                    if geometria["type"] == "Polygon"
+                    else poligonos,
+                },
+            }
+        )
+
+    return {"type": "FeatureCollection", "features": features}
+
+
+@functools.lru_cache(maxsize=None)
+def cargar_geojson(ruta=RUTA_CDMX, tolerancia=TOLERANCIA, decimales=DECIMALES):
+    """
+    Carga un GeoJSON simplificado, creándolo la primera vez que se necesita.
+
+    El resultado se guarda en la carpeta ./cache usando el hash del archivo
+    original y los parámetros de simplificación. Dentro de un mismo proceso
+    el GeoJSON se carga una sola vez, por lo que no debe modificarse.
+
+    Parameters
+    ----------
+    ruta : str
+        La ruta del GeoJSON original.
+
+    tolerancia : float
+        La tolerancia de la simplificación, en grados.
+
+    decimales : int
+        El número de decimales de las coordenadas resultantes.
+
+    Returns
+    -------
+    dict
+        El GeoJSON simplificado.
+
+    """
+
+    clave = calcular_hash(ruta)[:16]
+    ruta_cache = os.path.join(
+        CARPETA_CACHE, f"geojson_{clave}_{tolerancia}_{decimales}.json"
+    )
+
+    if os.path.exists(ruta_cache):
+        with open(ruta_cache, "r", encoding="utf-8") as archivo:
+            return json.load(archivo)
+
+    with open(ruta, "r", encoding="utf-8") as archivo:
+        geojson = simplificar_geojson(json.load(archivo), tolerancia, decimales)
+
+    os.makedirs(CARPETA_CACHE, exist_ok=True)
+
+    # Guardamos el JSON sin espacios para que sea lo más compacto posible.
+    temporal = f"{ruta_cache}.tmp"
+
+    with open(temporal, "w", encoding="utf-8") as archivo:
+        json.dump(geojson, archivo, ensure_ascii=False, separators=(",", ":"))
+
+    os.replace(temporal, ruta_cache)
+
+    return geojson
+
+
+@functools.lru_cache(maxsize=None)
+def leer_geojson(ruta=RUTA_CDMX):
+    """
+    Lee un GeoJSON sin simplificar. Dentro de un proceso se lee una sola vez.
+
+    Parameters
+    ----------
+    ruta : str
+        La ruta del GeoJSON.
+
+    Returns
+    -------
+    dict
+        El GeoJSON original, no debe modificarse.
+
+    """
+
+    with open(ruta, "r", encoding="utf-8") as archivo:
+        return json.load(archivo)
+
+
+def preparar_poligonos(geojson):
+    """
+    Convierte cada feature de un GeoJSON en arreglos de aristas y una caja envolvente.
+
+    Parameters
+    ----------
+    geojson : dict
+        Un FeatureCollection con geometrías Polygon o MultiPolygon.
+
+    Returns
+    -------
+    list
+        Una tupla por feature con la caja (lon_min, lat_min, lon_max, lat_max)
+        y las coordenadas de inicio y fin de todas sus aristas.
+
+    """
+
+    poligonos = list()
+
+    for item in geojson["features"]:
+        geometria = item["geometry"]
+
+        if geometria["type"] == "Polygon":
+            anillos = geometria["coordinates"]
+        else:
+            anillos = [
+                anillo for poligono in geometria["coordinates"] for anillo in poligono
+            ]
+
+        # Juntamos las aristas de todos los anillos, incluyendo los huecos.
+        # Con la regla par-impar los huecos se descuentan solos.
+        inicios = list()
+        finales = list()
+
+        for anillo in anillos:
+            puntos = np.asarray(anillo, dtype=float)
+            inicios.append(puntos[:-1])
+            finales.append(puntos[1:])
+
+        inicios = np.vstack(inicios)
+        finales = np.vstack(finales)
+
+        caja = (
+            inicios[:, 0].min(),
+            inicios[:, 1].min(),
+            inicios[:, 0].max(),
+            inicios[:, 1].max(),
+        )
+
+        poligonos.append((caja, inicios, finales))
+
+    return poligonos
+
+
+def indexar_aristas(inicios, finales):
+    """
+    Agrupa las aristas de un polígono en franjas horizontales.
+
+    El rayo horizontal de un punto solo puede cruzar las aristas cuyo rango
+    de latitudes contiene al punto, así que basta con revisar las aristas
+    de la franja donde cae el punto. Cada arista se guarda en todas las
+    franjas que toca y las aristas horizontales se descartan porque nunca
+    cruzan el rayo.
+
+    Parameters
+    ----------
+    inicios, finales : numpy.ndarray
+        Las coordenadas de inicio y fin de cada arista.
+
+    Returns
+    -------
+    tuple
+        La latitud mínima, el alto de las franjas, el número de franjas,
+        la posición donde empieza cada franja en el arreglo de aristas
+        (más el final) y el número de cada arista, ordenadas por franja.
+
+    """
+
+    y1, y2 = inicios[:, 1], finales[:, 1]
+    aristas = np.flatnonzero(y1 != y2)
+
+    minimos = np.minimum(y1, y2)[aristas]
+    maximos = np.maximum(y1, y2)[aristas]
+
+    lat_min = minimos.min() if len(aristas) else 0.0
+    lat_max = maximos.max() if len(aristas) else 0.0
+
+    franjas = max(1, len(aristas) // ARISTAS_POR_FRANJA)
+    alto = (lat_max - lat_min) / franjas or 1.0
+
+    primera = ubicar_franjas(minimos, lat_min, alto, franjas)
+    ultima = ubicar_franjas(maximos, lat_min, alto, franjas)
+
+    # Repetimos cada arista una vez por cada franja que toca.
+    cuantas = ultima - primera + 1
+    numeros = np.repeat(aristas, cuantas)
+    desfase = np.arange(cuantas.sum()) - np.repeat(
+        np.cumsum(cuantas) - cuantas, cuantas
+    )
+    posiciones = np.repeat(primera, cuantas) + desfase
+
+    orden = np.argsort(posiciones, kind="stable")
+    limites = np.r_[0, np.cumsum(np.bincount(posiciones, minlength=franjas))]
+
+    return lat_min, alto, franjas, limites, numeros[orden]
+
+
+def ubicar_franjas(lat, lat_min, alto, franjas):
+    """
+    Regresa la franja de cada latitud. Las que están fuera quedan en los extremos.
+    """
+
+    with np.errstate(invalid="ignore"):
+        posiciones = np.floor((lat - lat_min) / alto)
+
+    return np.clip(np.nan_to_num(posiciones), 0, franjas - 1).astype(np.int64)
+
+
+def puntos_dentro(lon, lat, inicios, finales):
+    """
+    Determina qué puntos están dentro de un polígono usando ray casting.
+
+    Cada punto se compara solo contra las aristas de su franja horizontal,
+    ver indexar_aristas(). Las comparaciones se hacen en bloques de puntos
+    para limitar el uso de memoria.
+
+    Parameters
+    ----------
+    lon, lat : numpy.ndarray
+        Las coordenadas de los puntos.
+
+    inicios, finales : numpy.ndarray
+        Las coordenadas de inicio y fin de cada arista.
+
+    Returns
+    -------
+    numpy.ndarray
+        Un arreglo booleano, True si el punto está dentro.
+
+    """
+
+    dentro = np.zeros(len(lon), dtype=bool)
+
+    x1, y1 = inicios[:, 0], inicios[:, 1]
+    x2, y2 = finales[:, 0], finales[:, 1]
+
+    # La pendiente inversa de cada arista. Las aristas horizontales nunca
+    # cruzan el rayo, así que su valor no importa.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pendiente = (x2 - x1) / (y2 - y1)
+
+    lat_min, alto, franjas, limites, numeros = indexar_aristas(inicios, finales)
+    por_franja = np.diff(limites)
+
+    tamaño = max(1, COMPARACIONES_POR_BLOQUE // max(1, por_franja.max()))
+
+    for inicio in range(0, len(lon), tamaño):
+        px = lon[inicio : inicio + tamaño]
+        py = lat[inicio : inicio + tamaño]
+
+        # Formamos los pares punto-arista con las aristas de la franja de
+        # cada punto.
+        franja = ubicar_franjas(py, lat_min, alto, franjas)
+        cuantas = por_franja[franja]
+
+        punto = np.repeat(np.arange(len(px)), cuantas)
+        desfase = np.arange(cuantas.sum()) - np.repeat(
+            np.cumsum(cuantas) - cuantas, cuantas
+        )
+        arista = numeros[np.repeat(limites[franja], cuantas) + desfase]
+
+        px, py = px[punto], py[punto]
+        ax, ay = x1[arista], y1[arista]
+
+        # Una arista cruza el rayo horizontal hacia la derecha del punto
+        # si el punto está entre sus dos extremos verticales y a la izquierda
+        # de la intersección.
+        with np.errstate(invalid="ignore"):
+            cruza = ((ay > py) != (y2[arista] > py)) & (
+                px < ax + (py - ay) * pendiente[arista]
+            )
+
+        cruces = np.bincount(punto[cruza], minlength=len(cuantas))
+        dentro[inicio : inicio + tamaño] = cruces % 2 == 1
+
+    return dentro
+
+
+def asignar_poligonos(lat, lon, geojson=None, propiedad="NOMGEO"):
+    """
+    Asigna a cada punto el polígono del GeoJSON que lo contiene.
+
+    Primero se descartan los puntos fuera de la caja envolvente de cada
+    polígono y solo los restantes pasan por la prueba de punto en polígono.
+    Funciona con cualquier FeatureCollection, por ejemplo alcaldías o estados.
+
+    Parameters
+    ----------
+    lat, lon : array-like
+        Las coordenadas de los puntos, por ejemplo df["Latitud"] y df["Longitud"].
+
+    geojson : dict
+        El GeoJSON con los polígonos. Por defecto las alcaldías de la CDMX
+        a resolución completa.
+
+    propiedad : str
+        La propiedad de cada feature que se usa como nombre. Debe ser única.
+
+    Returns
+    -------
+    pandas.Categorical
+        El nombre del polígono de cada punto, NaN si no está en ninguno.
+
+    """
+
+    if geojson is None:
+        geojson = leer_geojson()
+
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+
+    nombres = [item["properties"][propiedad] for item in geojson["features"]]
+    codigos = np.full(len(lat), -1, dtype=np.int16)
+
+    for numero, (caja, inicios, finales) in enumerate(preparar_poligonos(geojson)):
+        lon_min, lat_min, lon_max, lat_max = caja
+
+        # Solo revisamos los puntos dentro de la caja que aún no tienen polígono.
+        candidatos = np.flatnonzero(
+            (codigos == -1)
+            & (lon >= lon_min)
+            & (lon <= lon_max)
+            & (lat >= lat_min)
+            & (lat <= lat_max)
+        )
+
+        if len(candidatos) == 0:
+            continue
+
+        dentro = puntos_dentro(lon[candidatos], lat[candidatos], inicios, finales)
+        codigos[candidatos[dentro]] = numero
+
+    return pd.Categorical.from_codes(codigos, categories=nombres)
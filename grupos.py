@@ -0,0 +1,112 @@
+"""
+Este módulo divide un DataFrame en grupos (meses, rangos de magnitud, etc.)
+recorriéndolo una sola vez.
+
+En lugar de aplicar una máscara booleana por grupo, lo cual recorre todo el
+DataFrame cada vez, calculamos el código de grupo de cada renglón, los
+ordenamos de forma estable y cortamos el resultado en rebanadas contiguas.
+
+"""
+
+import numpy as np
+
+
+def dividir_por_codigos(df, codigos, grupos):
+    """
+    Divide un DataFrame según el código de grupo de cada renglón.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El DataFrame a dividir. No se modifica.
+
+    codigos : numpy.ndarray
+        El código de cada renglón, de 0 a grupos - 1. Los renglones con
+        código -1 no pertenecen a ningún grupo y se descartan.
+
+    grupos : int
+        El número de grupos.
+
+    Returns
+    -------
+    list
+        Un DataFrame por grupo. Cada uno conserva el orden original.
+
+    """
+
+    codigos = np.asarray(codigos)
+
+    # El orden estable conserva el orden original dentro de cada grupo.
+    orden = np.argsort(codigos, kind="stable")
+
+    # Buscamos dónde empieza cada grupo dentro de los códigos ordenados.
+    limites = np.searchsorted(codigos[orden], np.arange(grupos + 1))
+
+    ordenado = df.iloc[orden]
+
+    return [ordenado.iloc[limites[i] : limites[i + 1]] for i in range(grupos)]
+
+
+def dividir_por_mes(df):
+    """
+    Divide un DataFrame con fechas como índice en los 12 meses del año.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El DataFrame a dividir. No se modifica.
+
+    Returns
+    -------
+    dict
+        Un DataFrame por mes, con el número de mes (1 a 12) como llave.
+
+    """
+
+    partes = dividir_por_codigos(df, df.index.month.to_numpy() - 1, 12)
+
+    return dict(zip(range(1, 13), partes))
+
+
+def dividir_por_rangos(df, rangos, columna="Magnitud"):
+    """
+    Divide un DataFrame en rangos de valores de una columna.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El DataFrame a dividir. No se modifica.
+
+    rangos : list
+        Una lista de tuplas (inicio, fin), ambos inclusive, ordenadas y sin
+        traslaparse. Los valores fuera de todos los rangos se descartan.
+
+    columna : str
+        La columna a utilizar.
+
+    Returns
+    -------
+    list
+        Un DataFrame por rango, en el mismo orden.
+
+    """
+
+    valores = df[columna].to_numpy()
+
+    # Usamos el mismo tipo de la columna para que los límites tengan
+    # la misma precisión que los valores (por ejemplo float32).
+    tipo = valores.dtype if valores.dtype.kind == "f" else float
+    valores = valores.astype(tipo, copy=False)
+
+    inicios = np.array([inicio for inicio, _ in rangos], dtype=tipo)
+    finales = np.array([fin for _, fin in rangos], dtype=tipo)
+
+    # El rango de cada valor es el último cuyo inicio es menor o igual.
+    codigos = np.searchsorted(inicios, valores, side="right") - 1
+
+    # Descartamos los valores antes del primer rango, en un hueco entre
+    # rangos, después del último o sin valor (NaN).
+    fuera = (codigos < 0) | ~(valores <= finales[np.maximum(codigos, 0)])
+    codigos[fuera] = -1
+
+    return dividir_por_codigos(df, codigos, len(rangos))
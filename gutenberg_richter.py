@@ -0,0 +1,497 @@
+"""
+Este script estima la magnitud de completitud (Mc) y el valor b de la ley de Gutenberg-Richter.
+
+La ley de Gutenberg-Richter dice que log10(N) = a - b M, donde N es el
+número de sismos de magnitud M o superior. Mc se estima con el método de
+máxima curvatura (el bin de magnitud con más sismos más una corrección) y
+el valor b con el estimador de máxima verosimilitud de Aki y Utsu.
+
+Todo se calcula a partir de los conteos por bin de 0.1 de magnitud, los
+mismos del cubo. Por eso la incertidumbre por bootstrap no remuestrea los
+sismos uno por uno: remuestrear N sismos de un histograma equivale a tomar
+una muestra multinomial de sus conteos. Así todas las muestras de un grupo
+de ventanas se calculan a la vez con NumPy y los grupos se reparten entre
+varios procesos.
+
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from catalogo import ESTADOS
+from cubo import cargar_cubo, consultar
+from exportar import ejecutar_en_paralelo
+from instrumentacion import etapa
+
+
+# El ancho de cada bin de magnitud, igual al del cubo.
+DELTA = 0.1
+
+# La corrección que se suma al Mc de máxima curvatura.
+CORRECCION = 0.2
+
+# El mínimo de sismos sobre Mc para estimar el valor b.
+MINIMO_SISMOS = 50
+
+# El número de muestras de bootstrap.
+MUESTRAS = 1000
+
+# El número de ventanas (o estados) que calcula cada proceso a la vez.
+VENTANAS_POR_LOTE = 32
+
+
+def main(año_inicial=2000, año_final=None, ventana=5, procesos=None):
+    """
+    Crea las gráficas del valor b por estado y por ventana de tiempo.
+
+    Parameters
+    ----------
+    año_inicial, año_final : int
+        El rango de años a analizar. Sin año final se usa el último del catálogo.
+
+    ventana : int
+        El número de años de cada ventana móvil.
+
+    procesos : int
+        El número de procesos para el bootstrap.
+
+    """
+
+    with etapa("gutenberg_richter.carga"):
+        cubo = cargar_cubo()
+
+    with etapa("gutenberg_richter.estados"):
+        conteos = conteos_por_estado(cubo, año_inicial, año_final)
+        por_estado = estimar(conteos, procesos=procesos)
+
+    with etapa("gutenberg_richter.ventanas"):
+        conteos = conteos_por_ventana(cubo, ventana, año_inicial, año_final)
+        por_ventana = estimar(conteos, procesos=procesos)
+
+    with etapa("gutenberg_richter.exportacion"):
+        fig = crear_figura_estados(por_estado)
+        fig.write_image("./gutenberg_richter_estados.png")
+
+        fig = crear_figura_ventanas(por_ventana, ventana)
+        fig.write_image("./gutenberg_richter_ventanas.png")
+
+
+def conteos_por_estado(cubo, año_inicial=None, año_final=None):
+    """
+    Regresa el número de sismos por estado y bin de magnitud.
+
+    Parameters
+    ----------
+    cubo : pandas.DataFrame
+        El cubo, ver cubo.crear_cubo().
+
+    año_inicial, año_final : int
+        El rango de años (inclusive), None si no hay límite.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Un renglón por estado y una columna por bin (magnitud × 10).
+
+    """
+
+    conteos = consultar(cubo, ["estado", "bin"], año_inicial, año_final)["conteo"]
+
+    # Descartamos los sismos sin estado identificado.
+    conteos = conteos[conteos.index.get_level_values("estado").notna()]
+
+    conteos = conteos.unstack("bin", fill_value=0)
+
+    return completar_bins(conteos).reindex(ESTADOS, fill_value=0)
+
+
+def conteos_por_ventana(
+    cubo, ventana=5, año_inicial=None, año_final=None, estado=None
+):
+    """
+    Regresa el número de sismos por bin de magnitud en ventanas móviles de años.
+
+    Parameters
+    ----------
+    cubo : pandas.DataFrame
+        El cubo, ver cubo.crear_cubo().
+
+    ventana : int
+        El número de años de cada ventana.
+
+    año_inicial, año_final : int
+        El rango de años (inclusive), None si no hay límite.
+
+    estado : str
+        La abreviatura del estado, None para todos.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Un renglón por ventana, identificada por su último año, y una
+        columna por bin (magnitud × 10).
+
+    """
+
+    conteos = consultar(cubo, ["año", "bin"], año_inicial, año_final, estado)
+    conteos = completar_bins(conteos["conteo"].unstack("bin", fill_value=0))
+
+    # Incluimos los años sin sismos para que cada ventana tenga los mismos años.
+    años = range(conteos.index.min(), conteos.index.max() + 1)
+    conteos = conteos.reindex(años, fill_value=0)
+
+    # La suma de cada ventana es la diferencia de dos sumas acumuladas.
+    ceros = np.zeros((1, conteos.shape[1]), dtype=np.int64)
+    acumulado = np.vstack([ceros, conteos.cumsum().to_numpy()])
+    sumas = acumulado[ventana:] - acumulado[:-ventana]
+
+    return pd.DataFrame(
+        sumas, index=conteos.index[ventana - 1 :], columns=conteos.columns
+    )
+
+
+def completar_bins(conteos):
+    """
+    Agrega las columnas de los bins sin sismos entre el primero y el último.
+    """
+
+    bins = range(int(conteos.columns.min()), int(conteos.columns.max()) + 1)
+
+    return conteos.reindex(columns=bins, fill_value=0)
+
+
+def calcular(conteos, magnitudes, delta=DELTA, correccion=CORRECCION):
+    """
+    Calcula Mc y el valor b para uno o varios histogramas a la vez.
+
+    Parameters
+    ----------
+    conteos : numpy.ndarray
+        Los conteos por bin, con los bins en el último eje. Los demás ejes
+        (ventanas, muestras de bootstrap, etc.) se calculan en paralelo.
+
+    magnitudes : numpy.ndarray
+        La magnitud de cada bin.
+
+    delta : float
+        El ancho de cada bin.
+
+    correccion : float
+        La corrección que se suma al Mc de máxima curvatura.
+
+    Returns
+    -------
+    tuple
+        Tres arreglos con la forma de los demás ejes: Mc, el valor b y el
+        número de sismos sobre Mc. El valor b es NaN si hay menos de
+        MINIMO_SISMOS sismos sobre Mc.
+
+    """
+
+    bins = conteos.shape[-1]
+
+    # Máxima curvatura: el bin con más sismos, más la corrección.
+    indice_mc = np.argmax(conteos, axis=-1) + int(round(correccion / delta))
+    indice_mc = np.minimum(indice_mc, bins - 1)
+
+    sobre_mc = np.arange(bins) >= indice_mc[..., None]
+
+    n = np.where(sobre_mc, conteos, 0).sum(axis=-1)
+    suma = np.where(sobre_mc, conteos * magnitudes, 0).sum(axis=-1)
+    # Sin sismos no hay Mc.
+    mc = np.where(conteos.sum(axis=-1) > 0, magnitudes[indice_mc], np.nan)
+
+    # Estimador de Aki-Utsu con la corrección de Utsu por bins de ancho delta.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        b = np.log10(np.e) / (suma / n - (mc - delta / 2))
+
+    b = np.where(n >= MINIMO_SISMOS, b, np.nan)
+
+    return mc, b, n
+
+
+def bootstrap(conteos, magnitudes, muestras=MUESTRAS, semilla=None):
+    """
+    Calcula la desviación estándar de Mc y del valor b por bootstrap.
+
+    Esta función se ejecuta dentro de los procesos del pool.
+
+    Parameters
+    ----------
+    conteos : numpy.ndarray
+        Los conteos de un lote de ventanas, de forma (ventanas, bins).
+
+    magnitudes : numpy.ndarray
+        La magnitud de cada bin.
+
+    muestras : int
+        El número de muestras de bootstrap.
+
+    semilla : numpy.random.SeedSequence
+        La semilla del generador aleatorio.
+
+    Returns
+    -------
+    tuple
+        Dos arreglos de forma (ventanas,): la desviación estándar de Mc y
+        la del valor b.
+
+    """
+
+    rng = np.random.default_rng(semilla)
+
+    totales = conteos.sum(axis=-1)
+
+    # Las ventanas sin sismos usan probabilidades uniformes; su resultado es NaN.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        probabilidades = np.where(
+            totales[:, None] > 0, conteos / totales[:, None], 1 / conteos.shape[-1]
+        )
+
+    # Todas las muestras de todas las ventanas a la vez: (muestras, ventanas, bins).
+    remuestreo = rng.multinomial(
+        totales, probabilidades, size=(muestras, len(conteos))
+    )
+
+    mc, b, _ = calcular(remuestreo, magnitudes)
+
+    mc_std = np.where(totales > 0, mc.std(axis=0), np.nan)
+
+    # Las ventanas con muy pocos sismos no tienen ningún valor b.
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        b_std = np.nanstd(b, axis=0)
+
+    return mc_std, b_std
+
+
+def estimar(conteos, muestras=MUESTRAS, procesos=None, semilla=0):
+    """
+    Estima Mc y el valor b con su incertidumbre para cada renglón de conteos.
+
+    Parameters
+    ----------
+    conteos : pandas.DataFrame
+        Un renglón por estado o ventana y una columna por bin (magnitud × 10),
+        ver conteos_por_estado() y conteos_por_ventana().
+
+    muestras : int
+        El número de muestras de bootstrap.
+
+    procesos : int
+        El número de procesos para el bootstrap.
+
+    semilla : int
+        La semilla del generador aleatorio.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Las columnas mc, b, n (sismos sobre Mc), mc_std y b_std, con el
+        mismo índice que los conteos.
+
+    """
+
+    matriz = conteos.to_numpy(dtype=np.int64)
+    magnitudes = conteos.columns.to_numpy(dtype=np.float64) * DELTA
+
+    mc, b, n = calcular(matriz, magnitudes)
+
+    # Repartimos las ventanas en lotes, cada uno con su propia semilla.
+    inicios = range(0, len(matriz), VENTANAS_POR_LOTE)
+    semillas = np.random.SeedSequence(semilla).spawn(len(inicios))
+
+    argumentos = [
+        (matriz[inicio : inicio + VENTANAS_POR_LOTE], magnitudes, muestras, lote)
+        for inicio, lote in zip(inicios, semillas)
+    ]
+
+    resultados = ejecutar_en_paralelo(bootstrap, argumentos, procesos)
+
+    if resultados:
+        mc_std = np.concatenate([mc_std for mc_std, _ in resultados])
+        b_std = np.concatenate([b_std for _, b_std in resultados])
+    else:
+        mc_std = b_std = np.array([])
+
+    return pd.DataFrame(
+        {"mc": mc, "b": b, "n": n, "mc_std": mc_std, "b_std": b_std},
+        index=conteos.index,
+    )
+
+
+def aplicar_estilo(fig, titulo, eje_x):
+    """
+    Aplica el estilo de las gráficas del repositorio a una figura.
+    """
+
+    fig.update_xaxes(
+        title=eje_x,
+        ticks="outside",
+        ticklen=10,
+        tickfont_size=14,
+        title_standoff=18,
+        tickcolor="#FFFFFF",
+        linewidth=2,
+        gridwidth=0.0,
+        showline=True,
+        mirror=True,
+    )
+
+    fig.update_yaxes(
+        title="Valor b",
+        ticks="outside",
+        tickfont_size=14,
+        ticklen=10,
+        title_standoff=6,
+        tickcolor="#FFFFFF",
+        linewidth=2,
+        gridwidth=0.5,
+        showline=True,
+        mirror=True,
+    )
+
+    fig.update_layout(
+        showlegend=False,
+        width=1280,
+        height=720,
+        font_family="Quicksand",
+        font_color="white",
+        font_size=18,
+        title_text=titulo,
+        title_x=0.5,
+        title_y=0.965,
+        margin_t=60,
+        margin_l=100,
+        margin_r=40,
+        margin_b=90,
+        title_font_size=24,
+        plot_bgcolor="#1E1E1E",
+        paper_bgcolor="#20252f",
+        annotations=[
+            dict(
+                x=0.015,
+                y=-0.13,
+                xref="paper",
+                yref="paper",
+                xanchor="left",
+                yanchor="top",
+                text="Fuente: SSN",
+            ),
+            dict(
+                x=1.01,
+                y=-0.13,
+                xref="paper",
+                yref="paper",
+                xanchor="right",
+                yanchor="top",
+                text="🧁 @lapanquecita",
+            ),
+        ],
+    )
+
+    return fig
+
+
+def crear_figura_estados(resultados):
+    """
+    Crea la gráfica de barras con el valor b de cada estado.
+
+    Parameters
+    ----------
+    resultados : pandas.DataFrame
+        El resultado de estimar() con los estados como índice.
+
+    Returns
+    -------
+    plotly.graph_objects.Figure
+        La figura lista para exportarse.
+
+    """
+
+    resultados = resultados[resultados["b"].notna()].sort_values("b")
+
+    fig = go.Figure()
+
+    fig.add_trace(
+        go.Bar(
+            x=resultados.index,
+            y=resultados["b"],
+            error_y=dict(type="data", array=resultados["b_std"], color="#FFFFFF"),
+            marker_color="#00e5ff",
+            customdata=resultados[["mc", "n"]],
+            hovertemplate="%{x}: b = %{y:.2f}<br>Mc = %{customdata[0]:.1f}"
+            "<br>%{customdata[1]} sismos<extra></extra>",
+        )
+    )
+
+    return aplicar_estilo(
+        fig,
+        "Valor b de Gutenberg-Richter por estado (máxima verosimilitud)",
+        "Estado",
+    )
+
+
+def crear_figura_ventanas(resultados, ventana=5):
+    """
+    Crea la gráfica del valor b en ventanas móviles, con su incertidumbre.
+
+    Parameters
+    ----------
+    resultados : pandas.DataFrame
+        El resultado de estimar() con el último año de cada ventana como índice.
+
+    ventana : int
+        El número de años de cada ventana, para el título.
+
+    Returns
+    -------
+    plotly.graph_objects.Figure
+        La figura lista para exportarse.
+
+    """
+
+    fig = go.Figure()
+
+    # La banda de una desviación estándar alrededor del valor b.
+    fig.add_trace(
+        go.Scatter(
+            x=np.concatenate([resultados.index, resultados.index[::-1]]),
+            y=np.concatenate(
+                [
+                    resultados["b"] + resultados["b_std"],
+                    (resultados["b"] - resultados["b_std"])[::-1],
+                ]
+            ),
+            fill="toself",
+            fillcolor="rgba(0, 229, 255, 0.25)",
+            line_width=0,
+            hoverinfo="skip",
+        )
+    )
+
+    fig.add_trace(
+        go.Scatter(
+            x=resultados.index,
+            y=resultados["b"],
+            mode="lines+markers",
+            line_color="#00e5ff",
+            line_width=3,
+            customdata=resultados[["mc", "n"]],
+            hovertemplate="%{x}: b = %{y:.2f}<br>Mc = %{customdata[0]:.1f}"
+            "<br>%{customdata[1]} sismos<extra></extra>",
+        )
+    )
+
+    return aplicar_estilo(
+        fig,
+        f"Valor b de Gutenberg-Richter en México (ventanas de {ventana} años)",
+        "Último año de la ventana",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Este módulo mide el tiempo y la memoria de cada etapa de las gráficas.
+
+Las etapas (carga, limpieza, agregación, figura, exportación) se marcan con
+el context manager etapa():
+
+with etapa("carga") as registro:
+    df = cargar_catalogo()
+    registro.renglones = len(df)
+
+Cada registro guarda el tiempo de la etapa y la memoria residente máxima
+(RSS) alcanzada hasta que terminó la etapa. Este máximo es el del proceso
+desde su inicio, no el de la etapa: solo aumenta cuando una etapa supera
+a todas las anteriores. También se guarda el máximo de los procesos hijos
+que ya terminaron, por ejemplo los procesos que exportan las imágenes.
+En Windows no hay forma de obtener estos máximos y quedan como None.
+
+Por defecto la instrumentación está desactivada y etapa() no hace nada. Se
+activa con la variable de entorno SISMOS_TRAZA o con activar(), indicando
+el archivo donde se guardará la traza al terminar el programa. Si el archivo
+termina en .trace.json se usa el formato de Chrome (chrome://tracing o
+Perfetto), de lo contrario una lista JSON con un registro por etapa.
+
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# resource solo existe en sistemas tipo Unix.
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# La variable de entorno que activa la instrumentación.
+VARIABLE_ENTORNO = "SISMOS_TRAZA"
+
+
+class Registro:
+    """
+    Los datos de una etapa. El código instrumentado puede asignar renglones.
+    """
+
+    __slots__ = (
+        "nombre",
+        "hilo",
+        "inicio",
+        "segundos",
+        "rss_maximo_acumulado_mb",
+        "rss_maximo_hijos_mb",
+        "renglones",
+    )
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.hilo = None
+        self.inicio = 0.0
+        self.segundos = 0.0
+        self.rss_maximo_acumulado_mb = None
+        self.rss_maximo_hijos_mb = None
+        self.renglones = None
+
+
+# El registro que se regresa cuando la instrumentación está desactivada.
+_NULO = Registro(None)
+
+_ruta = None
+_origen = time.perf_counter()
+_registros = list()
+
+
+def activar(ruta):
+    """
+    Activa la instrumentación y guarda la traza en la ruta indicada al salir.
+
+    Parameters
+    ----------
+    ruta : str
+        El archivo de la traza. Con extensión .trace.json se usa el formato
+        de Chrome.
+
+    """
+
+    global _ruta
+
+    if _ruta is None:
+        atexit.register(guardar)
+
+    _ruta = ruta
+
+
+def activa():
+    """
+    Indica si la instrumentación está activa.
+    """
+
+    return _ruta is not None
+
+
+def rss_maximo_mb(quien="proceso"):
+    """
+    Regresa la memoria residente máxima en MB desde el inicio del proceso.
+
+    Parameters
+    ----------
+    quien : str
+        "proceso" para el proceso actual o "hijos" para el mayor de los
+        procesos hijos que ya terminaron.
+
+    Returns
+    -------
+    float
+        El máximo en MB, None si el sistema no lo reporta (Windows).
+
+    """
+
+    if resource is None:
+        return None
+
+    if quien == "hijos":
+        maximo = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    else:
+        maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Linux reporta KB y macOS bytes.
+    if sys.platform == "darwin":
+        return maximo / 1024**2
+
+    return maximo / 1024
+
+
+@contextmanager
+def etapa(nombre):
+    """
+    Mide el tiempo de una etapa y la memoria máxima alcanzada al terminarla.
+
+    Parameters
+    ----------
+    nombre : str
+        El nombre de la etapa, por ejemplo "carga" o "top10.figura".
+
+    Yields
+    ------
+    Registro
+        El registro de la etapa, para asignar el número de renglones.
+
+    """
+
+    if _ruta is None:
+        yield _NULO
+        return
+
+    registro = Registro(nombre)
+    registro.hilo = threading.get_ident()
+    registro.inicio = time.perf_counter()
+
+    try:
+        yield registro
+    finally:
+        registro.segundos = time.perf_counter() - registro.inicio
+        registro.rss_maximo_acumulado_mb = rss_maximo_mb()
+        registro.rss_maximo_hijos_mb = rss_maximo_mb("hijos")
+        _registros.append(registro)
+
+
+def guardar(ruta=None):
+    """
+    Guarda los registros en formato JSON o en el formato de Chrome.
+
+    Parameters
+    ----------
+    ruta : str
+        El archivo de la traza. Si no se especifica se usa el de activar().
+
+    """
+
+    ruta = ruta or _ruta
+
+    if ruta is None or not _registros:
+        return
+
+    pid = os.getpid()
+
+    if ruta.endswith(".trace.json"):
+        datos = {
+            "traceEvents": [
+                {
+                    "name": registro.nombre,
+                    "ph": "X",
+                    "ts": (registro.inicio - _origen) * 1e6,
+                    "dur": registro.segundos * 1e6,
+                    "pid": pid,
+                    "tid": registro.hilo,
+                    "args": {
+                        "rss_maximo_acumulado_mb": registro.rss_maximo_acumulado_mb,
+                        "rss_maximo_hijos_mb": registro.rss_maximo_hijos_mb,
+                        "renglones": registro.renglones,
+                    },
+                }
+                for registro in _registros
+            ]
+        }
+    else:
+        datos = [
+            {
+                "etapa": registro.nombre,
+                "inicio": registro.inicio - _origen,
+                "segundos": registro.segundos,
+                "rss_maximo_acumulado_mb": registro.rss_maximo_acumulado_mb,
+                "rss_maximo_hijos_mb": registro.rss_maximo_hijos_mb,
+                "renglones": registro.renglones,
+            }
+            for registro in _registros
+        ]
+
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        json.dump(datos, archivo, ensure_ascii=False, indent=2)
+
+
+if os.environ.get(VARIABLE_ENTORNO):
+    activar(os.environ[VARIABLE_ENTORNO])
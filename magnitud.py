@@ -1,7 +1,15 @@
+import io
+
 import pandas as pd
 import plotly.graph_objects as go
 from PIL import Image
 
+from catalogo import cargar_catalogo
+from cubo import cargar_cubo, consultar
+from exportar import rasterizar_imagenes
+from instrumentacion import etapa
+from replicas import filtrar_principales
+
 MESES = {
     1: "Ene.",
     2: "Feb.",
@@ -17,8 +25,11 @@ MESES = {
     12: "Dic.",
 }
 
+# Los rangos de magnitud que se grafican, uno por imagen.
+RANGOS = [(5.0, 5.9), (6.0, 6.9), (7.0, 7.9), (8.0, 8.9)]
+
 
-def plot_magnitud(low, high, archivo):
+def plot_magnitud(low, high, archivo, df=None, solo_principales=False):
     """
     Crea una gráfica de barras con el número de sismos ocurridos por mes.
 
@@ -32,29 +43,157 @@ def plot_magnitud(low, high, archivo):
 
     archivo : int
         El nombre del archivo a guardar.
+
+    df : pandas.DataFrame
+        El catálogo ya cargado. Si no se especifica, los conteos se obtienen
+        del cubo precalculado sin leer los sismos individuales.
+
+    solo_principales : bool
+        Si es True, no se cuentan las réplicas. El cubo no distingue las
+        réplicas, así que en este caso se carga el catálogo.
+    """
+
+    if df is None and solo_principales:
+        df = cargar_catalogo(magnitud_minima=low)
+
+    with etapa("magnitud.figura"):
+        if df is None:
+            conteos = conteos_del_cubo(cargar_cubo(), low, high)
+            fig = figura_desde_conteos(conteos, low, high)
+        else:
+            fig = crear_figura(df, low, high, solo_principales=solo_principales)
+
+    with etapa("magnitud.exportacion"):
+        fig.write_image(f"./{archivo}.png")
+
+
+def conteos_del_cubo(cubo, low, high, año_inicial=None, año_final=None, estado=None):
+    """
+    Obtiene del cubo el número de sismos por mes dentro de un rango de magnitud.
+
+    Parameters
+    ----------
+    cubo : pandas.DataFrame
+        El cubo de conteos, ver cubo.crear_cubo().
+
+    low : int
+        La magnitud mínima del sismo.
+
+    high : int
+        La magnitud máxima del sismo.
+
+    año_inicial, año_final : int
+        El rango de años (inclusive), None si no hay límite.
+
+    estado : str
+        La abreviatura del estado, None para todos.
+
+    Returns
+    -------
+    pandas.Series
+        El número de sismos por mes (1 a 12).
+    """
+
+    meses = consultar(
+        cubo,
+        ["mes"],
+        año_inicial=año_inicial,
+        año_final=año_final,
+        estado=estado,
+        magnitud_minima=low,
+        magnitud_maxima=high,
+    )
+
+    return meses["conteo"]
+
+
+def crear_figura(
+    df, low, high, periodo="1900-2025", lugar="México", solo_principales=False
+):
+    """
+    Crea la figura de barras con el número de sismos ocurridos por mes.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El catálogo de sismos. No se modifica.
+
+    low : int
+        La magnitud mínima del sismo.
+
+    high : int
+        La magnitud máxima del sismo.
+
+    periodo : str
+        El periodo que se muestra en el título.
+
+    lugar : str
+        El lugar que se muestra en el título.
+
+    solo_principales : bool
+        Si es True, se descartan las réplicas y precursores de otros sismos,
+        ver replicas.identificar_principales().
+
+    Returns
+    -------
+    plotly.graph_objects.Figure
+        La figura lista para exportarse.
+    """
+
+    # Las réplicas siempre tienen menor magnitud que su sismo principal, así
+    # que basta con buscarlas entre los sismos de magnitud low o superior.
+    # No filtramos por high antes porque un sismo más fuerte puede ser el
+    # principal de sismos dentro del rango.
+    if solo_principales:
+        with etapa("magnitud.replicas") as registro:
+            df = filtrar_principales(df[df["Magnitud"] >= low])
+            registro.renglones = len(df)
+
+    with etapa("magnitud.agregacion") as registro:
+        registro.renglones = len(df)
+
+        # Filtramos por magnitud, esto también descarta los sismos sin magnitud.
+        df = df[df["Magnitud"].between(low, high)]
+
+        # Contamos los sismos por mes de ocurrencia.
+        conteos = df.index.month.value_counts()
+
+    return figura_desde_conteos(conteos, low, high, periodo, lugar)
+
+
+def figura_desde_conteos(conteos, low, high, periodo="1900-2025", lugar="México"):
     """
+    Crea la figura de barras a partir del número de sismos por mes.
+
+    Parameters
+    ----------
+    conteos : pandas.Series
+        El número de sismos con el mes (1 a 12) como índice.
 
-    # Cargamos el dataset de sismos.
-    df = pd.read_csv("./data.csv", parse_dates=["Fecha"], index_col="Fecha")
+    low : int
+        La magnitud mínima del sismo.
 
-    # Quitamos sismos sin magnitud.
-    df = df[df["Magnitud"] != "no calculable"]
+    high : int
+        La magnitud máxima del sismo.
 
-    # Convertimos el resto de magnitudes a float.
-    df["Magnitud"] = df["Magnitud"].astype(float)
+    periodo : str
+        El periodo que se muestra en el título.
 
-    # Filtramos por magnitud.
-    df = df[df["Magnitud"].between(low, high)]
+    lugar : str
+        El lugar que se muestra en el título.
 
-    # Creamos una columna para el mes de ocurrencia.
-    df["mes"] = df.index.month
+    Returns
+    -------
+    plotly.graph_objects.Figure
+        La figura lista para exportarse.
+    """
 
     # Creamos un DataFrame esqueleto para los registros por mes.
     # Esto para siempre tener 12 columnas, una por mes.
     meses_df = pd.DataFrame({"total": [0] * 12}, index=range(1, 13))
 
     # Actualizamos los valores del esqueleto con los valores reales.
-    meses_df.update(df["mes"].value_counts().to_frame("total"))
+    meses_df.update(conteos.to_frame("total"))
 
     # Preparamos los textos para cada barra.
     meses_df["perc"] = meses_df["total"] / meses_df["total"].sum() * 100
@@ -124,7 +263,7 @@ def plot_magnitud(low, high, archivo):
         font_family="Inter",
         font_color="#FFFFFF",
         font_size=24,
-        title_text=f"Eventos sísmicos de magnitud <b>{low}-{high}</b> registrados en México (1900-2025)",
+        title_text=f"Eventos sísmicos de magnitud <b>{low}-{high}</b> registrados en {lugar} ({periodo})",
         title_x=0.5,
         title_y=0.965,
         margin_t=80,
@@ -165,35 +304,129 @@ def plot_magnitud(low, high, archivo):
         ],
     )
 
-    fig.write_image(f"./{archivo}.png")
+    return fig
 
 
-def combine_images():
+def combine_images(carpeta=".", paneles=None, archivo="final.png"):
     """
-    Combina todas las imágenes creadas en la función anterior.
+    Combina verticalmente las imágenes de cada rango de magnitud.
+
+    Parameters
+    ----------
+    carpeta : str
+        La carpeta donde se guarda el resultado.
+
+    paneles : list
+        Las imágenes a combinar, de arriba hacia abajo. Cada una puede ser
+        una ruta o los bytes de un PNG. Si no se especifica se usan los
+        archivos 1.png, 2.png, etc. creados por plot_magnitud().
+
+    archivo : str
+        El nombre de la imagen combinada.
+    """
+
+    if paneles is None:
+        paneles = [f"{carpeta}/{numero}.png" for numero in range(1, len(RANGOS) + 1)]
+
+    unir_paneles(paneles).save(f"{carpeta}/{archivo}")
+
+
+def unir_paneles(paneles):
+    """
+    Une verticalmente las imágenes de cada rango de magnitud en una sola.
+
+    Parameters
+    ----------
+    paneles : list
+        Las imágenes a unir, de arriba hacia abajo. Cada una puede ser una
+        ruta o los bytes de un PNG.
+
+    Returns
+    -------
+    PIL.Image.Image
+        La imagen combinada.
+
     """
 
-    image1 = Image.open("./1.png")
-    image2 = Image.open("./2.png")
-    image3 = Image.open("./3.png")
-    image4 = Image.open("./4.png")
+    # Los bytes se leen directamente desde memoria, sin pasar por el disco.
+    imagenes = [
+        Image.open(io.BytesIO(panel) if isinstance(panel, bytes) else panel)
+        for panel in paneles
+    ]
 
-    result_width = image1.width
-    result_height = image1.height + image2.height + image3.height + image4.height
+    result_width = max(imagen.width for imagen in imagenes)
+    result_height = sum(imagen.height for imagen in imagenes)
 
     result = Image.new("RGB", (result_width, result_height))
-    result.paste(im=image1, box=(0, 0))
-    result.paste(im=image2, box=(0, image1.height))
-    result.paste(im=image3, box=(0, image1.height + image2.height))
-    result.paste(im=image4, box=(0, image1.height + image2.height + image3.height))
 
-    result.save("./final.png")
+    # Pegamos cada imagen debajo de la anterior.
+    y = 0
 
+    for imagen in imagenes:
+        result.paste(im=imagen, box=(0, y))
+        y += imagen.height
 
-if __name__ == "__main__":
-    plot_magnitud(5.0, 5.9, 1)
-    plot_magnitud(6.0, 6.9, 2)
-    plot_magnitud(7.0, 7.9, 3)
-    plot_magnitud(8.0, 8.9, 4)
+    return result
+
+
+def combinar_magnitudes(
+    df=None,
+    rangos=RANGOS,
+    carpeta=".",
+    procesos=None,
+    forzar=False,
+    solo_principales=False,
+):
+    """
+    Crea las gráficas de cada rango de magnitud y las combina en una sola imagen.
+
+    Las gráficas se convierten a PNG en memoria (en paralelo) y se combinan
+    directamente, sin crear los archivos intermedios 1.png, 2.png, etc.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El catálogo ya cargado. Si no se especifica, los conteos se obtienen
+        del cubo precalculado.
 
-    combine_images()
+    rangos : list
+        Una lista de tuplas (low, high), una por panel.
+
+    carpeta : str
+        La carpeta donde se guarda el resultado.
+
+    procesos : int
+        El número de procesos para convertir las gráficas a imagen.
+
+    forzar : bool
+        Si es True, convierte las gráficas aunque estén en el caché.
+
+    solo_principales : bool
+        Si es True, no se cuentan las réplicas. En este caso se carga el
+        catálogo en lugar de usar el cubo.
+    """
+
+    if df is None and solo_principales:
+        df = cargar_catalogo(magnitud_minima=min(low for low, _ in rangos))
+
+    with etapa("magnitud.figura"):
+        # Sin un catálogo cargado, los conteos se obtienen del cubo.
+        if df is None:
+            cubo = cargar_cubo()
+            figuras = [
+                figura_desde_conteos(conteos_del_cubo(cubo, low, high), low, high)
+                for low, high in rangos
+            ]
+        else:
+            figuras = [
+                crear_figura(df, low, high, solo_principales=solo_principales)
+                for low, high in rangos
+            ]
+
+    with etapa("magnitud.exportacion"):
+        paneles = rasterizar_imagenes(figuras, procesos, forzar=forzar)
+        combine_images(carpeta, paneles)
+
+
+if __name__ == "__main__":
+    combinar_magnitudes()
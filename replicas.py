@@ -0,0 +1,331 @@
+"""
+Este módulo identifica las réplicas (y precursores) de cada sismo principal.
+
+Un sismo grande, como el del 19 de septiembre de 2017, viene acompañado de
+cientos de réplicas que no son eventos independientes. Para no contarlas
+usamos las ventanas de Gardner y Knopoff (1974): cada sismo principal tiene
+una distancia y un número de días, que dependen de su magnitud, dentro de
+los cuales todos los sismos de menor magnitud se consideran dependientes.
+
+En lugar de comparar todos los pares de sismos, lo cual es O(N²), los sismos
+se procesan por niveles de magnitud, del mayor al menor. Los pares de cada
+nivel se buscan de una sola vez en un KD-tree con las coordenadas
+proyectadas sobre una esfera, al que se agrega el tiempo como cuarta
+coordenada cuando el nivel tiene muchos sismos.
+
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+
+# El radio medio de la Tierra en km.
+RADIO_TIERRA = 6371.0
+
+# El ancho en magnitud de cada nivel. Todos los sismos de un nivel buscan sus
+# pares a la vez con la ventana más grande del nivel.
+ANCHO_NIVEL = 1.0
+
+# Si un nivel tendría más de este número de pares por sismo del catálogo al
+# buscar solo por distancia, se usa un KD-tree que también incluye el tiempo.
+PARES_POR_SISMO = 5
+
+
+def ventanas_gardner_knopoff(magnitudes):
+    """
+    Calcula la ventana de distancia y tiempo de cada magnitud.
+
+    Parameters
+    ----------
+    magnitudes : numpy.ndarray
+        Las magnitudes de los sismos.
+
+    Returns
+    -------
+    tuple
+        Dos arreglos: la distancia en km y la duración en días.
+
+    """
+
+    magnitudes = np.asarray(magnitudes, dtype=np.float64)
+
+    distancias = 10 ** (0.1238 * magnitudes + 0.983)
+    dias = np.where(
+        magnitudes >= 6.5,
+        10 ** (0.032 * magnitudes + 2.7389),
+        10 ** (0.5409 * magnitudes - 0.547),
+    )
+
+    return distancias, dias
+
+
+def proyectar(latitudes, longitudes):
+    """
+    Convierte latitud y longitud en coordenadas cartesianas (km) sobre la esfera.
+    """
+
+    latitudes = np.radians(latitudes)
+    longitudes = np.radians(longitudes)
+
+    return RADIO_TIERRA * np.column_stack(
+        [
+            np.cos(latitudes) * np.cos(longitudes),
+            np.cos(latitudes) * np.sin(longitudes),
+            np.sin(latitudes),
+        ]
+    )
+
+
+def calcular_tiempos(df):
+    """
+    Regresa el momento de cada sismo en días, usando la hora si está disponible.
+    """
+
+    tiempos = df.index.to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+    # La hora puede venir como texto o como timedelta (catalogo.normalizar()).
+    if "Hora" in df.columns:
+        horas = df["Hora"]
+
+        if horas.dtype.kind != "m":
+            horas = pd.to_timedelta(horas.astype(str), errors="coerce")
+
+        horas = horas.fillna(pd.Timedelta(0)).to_numpy().astype("timedelta64[ns]")
+        tiempos = tiempos + horas.view(np.int64)
+
+    return tiempos / (24 * 60 * 60 * 1e9)
+
+
+def buscar_pares(arbol, puntos, tiempos, lote, inferiores, cuerda, dias):
+    """
+    Busca los pares de sismos que pueden estar en la ventana de un sismo del lote.
+
+    Si hay pocos pares se consultan las distancias en el KD-tree de todo el
+    catálogo y el tiempo se revisa después. De lo contrario se construye un
+    KD-tree con el tiempo escalado como cuarta coordenada, de modo que la
+    ventana de distancia y tiempo sea un cubo (distancia de Chebyshev).
+
+    Parameters
+    ----------
+    arbol : scipy.spatial.cKDTree
+        El KD-tree de los puntos de todo el catálogo.
+
+    puntos : numpy.ndarray
+        Las coordenadas cartesianas de los sismos, ver proyectar().
+
+    tiempos : numpy.ndarray
+        El momento de cada sismo en días.
+
+    lote : numpy.ndarray
+        Los índices de los sismos del nivel.
+
+    inferiores : numpy.ndarray
+        Los índices de los sismos de niveles menores que aún no son dependientes.
+
+    cuerda, dias : float
+        La ventana más grande del lote: la cuerda en km y la duración en días.
+
+    Returns
+    -------
+    tuple
+        Dos arreglos de índices (a, b) con un sismo a del lote y un sismo b
+        que puede estar en su ventana. Incluye pares de más que se deben
+        descartar con la ventana de cada sismo.
+
+    """
+
+    # Un pequeño margen para no perder pares en el límite por redondeo.
+    radio = cuerda * (1 + 1e-9)
+
+    # Estimamos los pares que regresaría la búsqueda por distancia con una
+    # muestra del lote.
+    muestra = lote[:: -(-len(lote) // 64)]
+    vecinos = arbol.query_ball_point(puntos[muestra], radio, return_length=True)
+
+    if vecinos.mean() * len(lote) <= PARES_POR_SISMO * len(puntos):
+        pares = cKDTree(puntos[lote]).sparse_distance_matrix(
+            arbol, radio, output_type="ndarray"
+        )
+        return lote[pares["i"]], pares["j"]
+
+    coordenadas = np.column_stack([puntos, tiempos * (cuerda / dias)])
+    arbol_lote = cKDTree(coordenadas[lote])
+
+    # Los pares dentro del lote se regresan en ambos sentidos.
+    pares = arbol_lote.query_pairs(radio, p=np.inf, output_type="ndarray")
+    a = [lote[pares[:, 0]], lote[pares[:, 1]]]
+    b = [lote[pares[:, 1]], lote[pares[:, 0]]]
+
+    if len(inferiores):
+        pares = arbol_lote.sparse_distance_matrix(
+            cKDTree(coordenadas[inferiores]), radio, p=np.inf, output_type="ndarray"
+        )
+        a.append(lote[pares["i"]])
+        b.append(inferiores[pares["j"]])
+
+    return np.concatenate(a), np.concatenate(b)
+
+
+def marcar_dependientes(lote, a, b, dependientes):
+    """
+    Decide qué sismos de un lote son principales y marca a sus dependientes.
+
+    Recorrer los sismos uno por uno equivale a decidirlos en rondas: un sismo
+    es dependiente si un principal que se recorre antes lo tiene en su
+    ventana, y es principal cuando todos los que se recorren antes y lo
+    tienen en su ventana ya son dependientes. Solo se necesitan tantas
+    rondas como la cadena más larga de sismos dentro de la ventana del
+    anterior.
+
+    Parameters
+    ----------
+    lote : numpy.ndarray
+        Los índices de los sismos del nivel que aún no son dependientes.
+
+    a, b : numpy.ndarray
+        Los pares de sismos: a es del lote, se recorre antes que b y b está
+        dentro de su ventana.
+
+    dependientes : numpy.ndarray
+        Un arreglo booleano, True para los sismos dependientes. Se modifica.
+
+    """
+
+    indecisos = np.zeros(len(dependientes), dtype=bool)
+    indecisos[lote] = True
+
+    internos = indecisos[b]
+    a_lote, b_lote = a[internos], b[internos]
+
+    while True:
+        pendientes = lote[indecisos[lote]]
+
+        if not len(pendientes):
+            break
+
+        # Los pares de un sismo dependiente o hacia uno ya decidido no importan.
+        vigentes = ~dependientes[a_lote] & indecisos[b_lote]
+        a_lote, b_lote = a_lote[vigentes], b_lote[vigentes]
+
+        # Un sismo decidido que no es dependiente es principal.
+        marcados = b_lote[~indecisos[a_lote]]
+        dependientes[marcados] = True
+        indecisos[marcados] = False
+
+        # Los sismos que no esperan a ningún otro sismo indeciso son principales.
+        esperan = np.zeros(len(dependientes), dtype=bool)
+        esperan[b_lote[indecisos[a_lote]]] = True
+        indecisos[pendientes[~esperan[pendientes]]] = False
+
+    # Los sismos de niveles menores dependen de cualquier principal del lote.
+    a, b = a[~internos], b[~internos]
+    dependientes[b[~dependientes[a]]] = True
+
+
+def identificar_principales(df):
+    """
+    Identifica los sismos principales con las ventanas de Gardner y Knopoff.
+
+    Los sismos se recorren de mayor a menor magnitud. Cada sismo que no es
+    dependiente de otro se considera principal y todos los sismos de menor
+    o igual magnitud dentro de su ventana (antes o después) se marcan como
+    dependientes. Los sismos de cada nivel de magnitud se procesan juntos,
+    ver buscar_pares() y marcar_dependientes().
+
+    Como un sismo solo puede depender de otro de mayor o igual magnitud, el
+    resultado es el mismo si antes se descartan los sismos por debajo de una
+    magnitud mínima, lo cual reduce mucho el tiempo de cálculo.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El catálogo de sismos con la fecha como índice. No se modifica.
+
+    Returns
+    -------
+    numpy.ndarray
+        Un arreglo booleano, True para los sismos principales. Los sismos
+        sin magnitud o sin coordenadas se consideran principales.
+
+    """
+
+    principales = np.ones(len(df), dtype=bool)
+
+    magnitudes = df["Magnitud"].to_numpy(dtype=np.float64)
+    latitudes = df["Latitud"].to_numpy(dtype=np.float64)
+    longitudes = df["Longitud"].to_numpy(dtype=np.float64)
+
+    validos = np.flatnonzero(
+        np.isfinite(magnitudes) & np.isfinite(latitudes) & np.isfinite(longitudes)
+    )
+
+    if len(validos) < 2:
+        return principales
+
+    # Ordenamos por tiempo, así el índice de cada sismo indica cuál es más antiguo.
+    tiempos = calcular_tiempos(df)[validos]
+    orden = np.argsort(tiempos, kind="stable")
+    validos = validos[orden]
+    tiempos = tiempos[orden]
+    magnitudes = magnitudes[validos]
+
+    puntos = proyectar(latitudes[validos], longitudes[validos])
+    arbol = cKDTree(puntos)
+
+    distancias, dias = ventanas_gardner_knopoff(magnitudes)
+
+    # Comparamos contra la cuerda que corresponde a cada distancia sobre la esfera.
+    angulos = np.minimum(distancias / (2 * RADIO_TIERRA), np.pi / 2)
+    cuerdas = 2 * RADIO_TIERRA * np.sin(angulos)
+
+    niveles = np.floor(magnitudes / ANCHO_NIVEL).astype(np.int64)
+    dependientes = np.zeros(len(validos), dtype=bool)
+
+    for nivel in range(niveles.max(), niveles.min() - 1, -1):
+        lote = np.flatnonzero((niveles == nivel) & ~dependientes)
+
+        if not len(lote):
+            continue
+
+        inferiores = np.flatnonzero((niveles < nivel) & ~dependientes)
+        a, b = buscar_pares(
+            arbol,
+            puntos,
+            tiempos,
+            lote,
+            inferiores,
+            cuerdas[lote].max(),
+            dias[lote].max(),
+        )
+
+        # Nos quedamos con los pares dentro de la ventana del sismo que se
+        # recorre primero: el de mayor magnitud o, si empatan, el más antiguo.
+        # El tiempo se revisa antes que la distancia porque es más barato.
+        dentro = (
+            (
+                (magnitudes[a] > magnitudes[b])
+                | ((magnitudes[a] == magnitudes[b]) & (a < b))
+            )
+            & (tiempos[b] >= tiempos[a] - dias[a])
+            & (tiempos[b] <= tiempos[a] + dias[a])
+            & ~dependientes[b]
+        )
+        a, b = a[dentro], b[dentro]
+
+        diferencias = puntos[b] - puntos[a]
+        dentro = np.einsum("ij,ij->i", diferencias, diferencias) <= cuerdas[a] ** 2
+
+        marcar_dependientes(lote, a[dentro], b[dentro], dependientes)
+
+    principales[validos[dependientes]] = False
+
+    return principales
+
+
+def filtrar_principales(df):
+    """
+    Regresa solo los sismos principales del catálogo, ver identificar_principales().
+    """
+
+    return df[identificar_principales(df)]
@@ -0,0 +1,497 @@
+"""
+Un servicio HTTP local que genera las gráficas bajo demanda.
+
+Al iniciar se cargan el catálogo y las librerías y se arranca el servidor
+de kaleido (ver exportar.iniciar_kaleido()), el cual mantiene abierto un
+solo Chromium mientras el servicio esté activo. Una primera exportación
+espera a que el navegador esté listo, así cada petición solo paga el
+filtrado, la figura y su conversión a PNG. Las imágenes se guardan en un
+caché LRU en memoria con un tamaño máximo y las peticiones simultáneas de
+la misma gráfica esperan a que termine una sola exportación.
+
+Cada gráfica tiene su ruta y sus parámetros son los mismos de las
+especificaciones de sismos.py, por ejemplo:
+
+http://127.0.0.1:8000/top10?año_inicial=2000&año_final=2010&estado=OAX
+
+http://127.0.0.1:8000/magnitud?rangos=5.0-5.9,6.0-6.9&solo_principales=1
+
+http://127.0.0.1:8000/cdmx_anual?año=2024
+
+La ruta / regresa las gráficas disponibles y el estado del caché en JSON.
+Por defecto el servicio solo escucha en 127.0.0.1. Se ejecuta así:
+
+python -m servidor --puerto 8000
+
+"""
+
+import argparse
+import io
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import plotly.graph_objects as go
+import plotly.io as pio
+
+import cdmx
+import magnitud
+from catalogo import ESTADOS, cargar_catalogo
+from exportar import detener_kaleido, iniciar_kaleido
+from instrumentacion import etapa
+from sismos import VALORES_POR_DEFECTO, completar_spec, crear_figuras, leer_rango
+
+
+# El tamaño máximo por defecto del caché de imágenes.
+TAMAÑO_CACHE_MB = 256
+
+# Las gráficas que se pueden pedir, cada una es una ruta.
+GRAFICAS = [*VALORES_POR_DEFECTO, "cdmx_anual"]
+
+# kaleido no se debe usar desde varios hilos a la vez.
+_candado_render = threading.Lock()
+
+
+def leer_booleano(texto):
+    """
+    Convierte un parámetro como "1", "true" o "no" en un booleano.
+    """
+
+    texto = texto.lower()
+
+    if texto in ("1", "true", "si", "sí"):
+        return True
+
+    if texto in ("0", "false", "no"):
+        return False
+
+    raise ValueError(f"valor booleano inválido: {texto}")
+
+
+def leer_rangos(texto):
+    """
+    Convierte rangos como "5.0-5.9,6.0-6.9" en una lista de tuplas.
+    """
+
+    try:
+        return [leer_rango(rango) for rango in texto.split(",")]
+    except argparse.ArgumentTypeError as error:
+        raise ValueError(str(error))
+
+
+def leer_estado(texto):
+    """
+    Valida la abreviatura de un estado.
+    """
+
+    if texto not in ESTADOS:
+        raise ValueError(f"estado desconocido: {texto}")
+
+    return texto
+
+
+# Cómo se convierte cada parámetro de la consulta. La salida no se acepta,
+# las imágenes solo se regresan en la respuesta.
+TIPOS = {
+    "año": int,
+    "año_inicial": int,
+    "año_final": int,
+    "magnitud_minima": float,
+    "magnitud_maxima": float,
+    "estado": leer_estado,
+    "k": int,
+    "rangos": leer_rangos,
+    "solo_principales": leer_booleano,
+}
+
+
+def leer_consulta(grafica, consulta):
+    """
+    Convierte la ruta y la consulta de una petición en una especificación.
+
+    Parameters
+    ----------
+    grafica : str
+        La gráfica solicitada, ver GRAFICAS.
+
+    consulta : str
+        La consulta de la URL, por ejemplo "año_inicial=2000&k=5".
+
+    Returns
+    -------
+    dict
+        La especificación completa. Para cdmx_anual solo tiene la gráfica
+        y el año.
+
+    Raises
+    ------
+    ValueError
+        Si la gráfica o algún parámetro no es válido.
+
+    """
+
+    parametros = parse_qs(consulta, keep_blank_values=True)
+    spec = {"grafica": grafica}
+
+    for nombre, valores in parametros.items():
+        if nombre not in TIPOS:
+            raise ValueError(f"parámetro desconocido: {nombre}")
+
+        if len(valores) > 1:
+            raise ValueError(f"parámetro repetido: {nombre}")
+
+        try:
+            spec[nombre] = TIPOS[nombre](valores[0])
+        except ValueError as error:
+            raise ValueError(f"{nombre}: {error}")
+
+    if grafica == "cdmx_anual":
+        if set(spec) != {"grafica", "año"}:
+            raise ValueError("cdmx_anual solo acepta el parámetro año")
+
+        return spec
+
+    if "año" in spec:
+        raise ValueError("el parámetro año solo aplica a cdmx_anual")
+
+    spec = completar_spec(spec)
+    del spec["salida"]
+
+    return spec
+
+
+def rasterizar(fig):
+    """
+    Convierte una figura a PNG con el kaleido del proceso.
+    """
+
+    with _candado_render:
+        return pio.to_image(fig, format="png")
+
+
+def crear_png(df, spec):
+    """
+    Crea la imagen de una especificación, ver leer_consulta().
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El catálogo de sismos. No se modifica.
+
+    spec : dict
+        La especificación de la gráfica.
+
+    Returns
+    -------
+    bytes
+        El contenido del PNG.
+
+    """
+
+    with etapa(f"servidor.{spec['grafica']}.figura"):
+        if spec["grafica"] == "cdmx_anual":
+            figuras = [cdmx.crear_mapa_anual(df, spec["año"])]
+        else:
+            figuras = crear_figuras(df, spec)
+
+    with etapa(f"servidor.{spec['grafica']}.exportacion"):
+        paneles = [rasterizar(fig) for fig in figuras]
+
+        if spec["grafica"] != "magnitud":
+            return paneles[0]
+
+        # Los paneles de magnitud se combinan en memoria.
+        imagen = io.BytesIO()
+        magnitud.unir_paneles(paneles).save(imagen, format="PNG")
+
+        return imagen.getvalue()
+
+
+class CacheLRU:
+    """
+    Un caché de imágenes en memoria que descarta las menos usadas.
+
+    Si varias peticiones buscan la misma llave mientras se está creando,
+    solo la primera la crea y las demás esperan su resultado.
+
+    Parameters
+    ----------
+    maximo_bytes : int
+        El tamaño máximo de todas las imágenes juntas.
+
+    """
+
+    def __init__(self, maximo_bytes):
+        self.maximo_bytes = maximo_bytes
+        self.bytes = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.coalescidas = 0
+        self._imagenes = OrderedDict()
+        self._pendientes = dict()
+        self._candado = threading.Lock()
+
+    def obtener(self, llave, crear):
+        """
+        Regresa la imagen de una llave, creándola si no está en el caché.
+
+        Parameters
+        ----------
+        llave : str
+            La llave de la imagen.
+
+        crear : callable
+            Una función sin argumentos que regresa los bytes de la imagen.
+
+        Returns
+        -------
+        tuple
+            Los bytes de la imagen y su origen: "hit" si ya estaba en el
+            caché, "coalescida" si se esperó a otra petición o "miss".
+
+        """
+
+        with self._candado:
+            if llave in self._imagenes:
+                self._imagenes.move_to_end(llave)
+                self.aciertos += 1
+                return self._imagenes[llave], "hit"
+
+            futuro = self._pendientes.get(llave)
+            propio = futuro is None
+
+            if propio:
+                futuro = self._pendientes[llave] = Future()
+                self.fallos += 1
+            else:
+                self.coalescidas += 1
+
+        if not propio:
+            return futuro.result(), "coalescida"
+
+        try:
+            imagen = crear()
+        except Exception as error:
+            with self._candado:
+                del self._pendientes[llave]
+
+            futuro.set_exception(error)
+            raise
+
+        with self._candado:
+            del self._pendientes[llave]
+            self._guardar(llave, imagen)
+
+        futuro.set_result(imagen)
+
+        return imagen, "miss"
+
+    def _guardar(self, llave, imagen):
+        # Una imagen más grande que todo el caché no se guarda.
+        if len(imagen) > self.maximo_bytes:
+            return
+
+        self._imagenes[llave] = imagen
+        self.bytes += len(imagen)
+
+        while self.bytes > self.maximo_bytes:
+            _, descartada = self._imagenes.popitem(last=False)
+            self.bytes -= len(descartada)
+
+    def estado(self):
+        """
+        Regresa el tamaño y los contadores del caché.
+        """
+
+        with self._candado:
+            return {
+                "imagenes": len(self._imagenes),
+                "bytes": self.bytes,
+                "maximo_bytes": self.maximo_bytes,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "coalescidas": self.coalescidas,
+            }
+
+
+class Manejador(BaseHTTPRequestHandler):
+    """
+    Atiende las peticiones GET de las gráficas.
+    """
+
+    server_version = "sismos"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        grafica = url.path.strip("/")
+
+        if not grafica:
+            self.responder_json(
+                HTTPStatus.OK,
+                {"graficas": GRAFICAS, "cache": self.server.cache.estado()},
+            )
+            return
+
+        if grafica not in GRAFICAS:
+            self.responder_json(
+                HTTPStatus.NOT_FOUND, {"error": f"gráfica desconocida: {grafica}"}
+            )
+            return
+
+        try:
+            spec = leer_consulta(grafica, url.query)
+        except ValueError as error:
+            self.responder_json(HTTPStatus.BAD_REQUEST, {"error": str(error)})
+            return
+
+        # La misma especificación siempre produce la misma llave.
+        llave = json.dumps(spec, sort_keys=True, ensure_ascii=False)
+
+        try:
+            imagen, origen = self.server.cache.obtener(
+                llave, lambda: self.server.crear_imagen(self.server.df, spec)
+            )
+        except Exception as error:
+            self.log_error("error al crear %s: %r", llave, error)
+            self.responder_json(
+                HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(error)}
+            )
+            return
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(imagen)))
+        self.send_header("X-Cache", origen)
+        self.end_headers()
+        self.wfile.write(imagen)
+
+    def responder_json(self, estatus, datos):
+        """
+        Envía una respuesta en formato JSON.
+        """
+
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+
+        self.send_response(estatus)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+
+class Servidor(ThreadingHTTPServer):
+    """
+    El servidor HTTP con el catálogo cargado y el caché de imágenes.
+
+    Las imágenes se crean con crear_imagen(df, spec), por defecto crear_png().
+    """
+
+    daemon_threads = True
+
+    def __init__(self, direccion, df, maximo_bytes, crear_imagen=crear_png):
+        super().__init__(direccion, Manejador)
+        self.df = df
+        self.cache = CacheLRU(maximo_bytes)
+        self.crear_imagen = crear_imagen
+
+    def server_close(self):
+        super().server_close()
+        detener_kaleido()
+
+
+def calentar():
+    """
+    Inicia el servidor de kaleido y exporta una figura vacía.
+
+    La primera exportación espera a que Chromium abra y cargue plotly.js,
+    así la primera petición no paga ese costo.
+    """
+
+    iniciar_kaleido()
+
+    with etapa("servidor.calentar"):
+        rasterizar(go.Figure())
+
+
+def crear_servidor(
+    host="127.0.0.1",
+    puerto=8000,
+    df=None,
+    cache_mb=TAMAÑO_CACHE_MB,
+    crear_imagen=None,
+):
+    """
+    Crea el servidor con el catálogo cargado y kaleido listo, sin iniciarlo.
+
+    Parameters
+    ----------
+    host : str
+        La dirección donde escucha el servidor.
+
+    puerto : int
+        El puerto. Con 0 se escoge uno libre, ver servidor.server_address.
+
+    df : pandas.DataFrame
+        El catálogo ya cargado. Si no se especifica se carga desde el disco.
+
+    cache_mb : float
+        El tamaño máximo del caché de imágenes en MB.
+
+    crear_imagen : callable
+        Una función (df, spec) que regresa los bytes de la imagen, por ejemplo
+        para probar el servidor sin Chromium. Por defecto se usa crear_png()
+        y se inicia kaleido.
+
+    Returns
+    -------
+    Servidor
+        El servidor, listo para serve_forever().
+
+    """
+
+    if df is None:
+        with etapa("servidor.carga") as registro:
+            df = cargar_catalogo()
+            registro.renglones = len(df)
+
+    if crear_imagen is None:
+        crear_imagen = crear_png
+        calentar()
+
+    return Servidor((host, puerto), df, int(cache_mb * 1024**2), crear_imagen)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Sirve las gráficas del catálogo de sismos por HTTP."
+    )
+    parser.add_argument(
+        "--host", default="127.0.0.1", help="La dirección donde escucha el servidor."
+    )
+    parser.add_argument("--puerto", type=int, default=8000, help="El puerto.")
+    parser.add_argument(
+        "--cache-mb",
+        type=float,
+        default=TAMAÑO_CACHE_MB,
+        help="El tamaño máximo del caché de imágenes en MB.",
+    )
+    args = parser.parse_args()
+
+    servidor = crear_servidor(args.host, args.puerto, cache_mb=args.cache_mb)
+    host, puerto = servidor.server_address[:2]
+    print(f"http://{host}:{puerto}/")
+
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
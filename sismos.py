@@ -0,0 +1,737 @@
+"""
+Punto de entrada para generar todas las gráficas en un solo proceso.
+
+El catálogo se carga una sola vez y los DataFrames filtrados se comparten
+entre todas las gráficas. Por ejemplo:
+
+python -m sismos render --all
+
+python -m sismos render magnitud top10 --carpeta ./imgs
+
+python -m sismos render --all --streaming
+
+python -m sismos ingestar ./descarga.csv
+
+python -m sismos animar --frecuencia semana --ventana 4 --salida cdmx.mp4
+
+python -m sismos --traza traza.trace.json render --all
+
+python -m sismos top10 --año-inicial 2000 --año-final 2010 --estado OAX
+
+python -m sismos lote graficas.json
+
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+import animacion
+import cdmx
+import magnitud
+import strip_chart
+import top10
+from catalogo import ESTADOS, RUTA_CSV, cargar_catalogo, ingestar_csv
+from exportar import exportar_imagenes, rasterizar_imagenes
+from instrumentacion import activar, etapa
+from streaming import TAMAÑO_BLOQUE, ConteoPorMes, Subconjunto, TopKPorAño, procesar
+
+
+# Las gráficas que se pueden generar.
+GRAFICAS = ["cdmx", "cdmx_anual", "magnitud", "strip_chart", "top10"]
+
+
+def crear_trabajos(df, graficas, años=None, carpeta="."):
+    """
+    Crea las figuras solicitadas a partir de un mismo catálogo.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El catálogo de sismos.
+
+    graficas : list
+        Los nombres de las gráficas a crear, ver GRAFICAS.
+
+    años : list
+        Los años para los mapas anuales de la CDMX. Si no se especifica
+        se usan todos los años desde 2010.
+
+    carpeta : str
+        La carpeta donde se guardarán las imágenes.
+
+    Returns
+    -------
+    list
+        Una lista de tuplas (figura, ruta).
+
+    """
+
+    trabajos = list()
+
+    # Filtramos los sismos sin magnitud una sola vez para todas las gráficas.
+    df = df[df["Magnitud"].notna()]
+
+    if "strip_chart" in graficas:
+        fig = strip_chart.crear_figura(df)
+        trabajos.append((fig, os.path.join(carpeta, "strip_chart.png")))
+
+    if "top10" in graficas:
+        fig = top10.crear_figura(df)
+        trabajos.append((fig, os.path.join(carpeta, "top10.png")))
+
+    # Los mapas de la CDMX comparten el mismo subconjunto de sismos.
+    if "cdmx" in graficas or "cdmx_anual" in graficas:
+        df_cdmx = df[df["estado"] == "CDMX"]
+
+        if "cdmx" in graficas:
+            fig = cdmx.crear_mapa(df_cdmx)
+            trabajos.append((fig, os.path.join(carpeta, "cdmx.png")))
+
+        if "cdmx_anual" in graficas:
+            if años is None:
+                años = range(2010, df.index.year.max() + 1)
+
+            # Todos los años comparten el mismo mapa base.
+            for año, spec in cdmx.crear_mapas_anuales(df_cdmx, años):
+                trabajos.append((spec, os.path.join(carpeta, f"cdmx_{año}.png")))
+
+    return trabajos
+
+
+def imprimir_resultado(resultado):
+    """
+    Imprime la ruta de una imagen exportada y el tiempo que tomó.
+    """
+
+    if resultado["cache"]:
+        print(f"{resultado['ruta']} (sin cambios)")
+    else:
+        print(f"{resultado['ruta']} ({resultado['segundos']:.2f} s)")
+
+
+def render(graficas, años=None, carpeta=".", procesos=None, forzar=False):
+    """
+    Carga el catálogo una vez y exporta todas las gráficas solicitadas.
+
+    Parameters
+    ----------
+    graficas : list
+        Los nombres de las gráficas a crear, ver GRAFICAS.
+
+    años : list
+        Los años para los mapas anuales de la CDMX.
+
+    carpeta : str
+        La carpeta donde se guardarán las imágenes.
+
+    procesos : int
+        El número de procesos para exportar las imágenes.
+
+    forzar : bool
+        Si es True, exporta las imágenes aunque estén en el caché.
+
+    """
+
+    os.makedirs(carpeta, exist_ok=True)
+
+    with etapa("carga") as registro:
+        df = cargar_catalogo()
+        registro.renglones = len(df)
+
+    with etapa("figuras") as registro:
+        trabajos = crear_trabajos(df, graficas, años, carpeta)
+        registro.renglones = len(trabajos)
+
+    with etapa("exportacion"):
+        resultados = exportar_imagenes(trabajos, procesos, forzar=forzar)
+
+    for resultado in resultados:
+        imprimir_resultado(resultado)
+
+    # Las gráficas de magnitud se combinan en memoria en una sola imagen.
+    # Sus conteos se obtienen del cubo, sin recorrer el catálogo.
+    if "magnitud" in graficas:
+        magnitud.combinar_magnitudes(
+            carpeta=carpeta, procesos=procesos, forzar=forzar
+        )
+        print(os.path.join(carpeta, "final.png"))
+
+
+def render_por_bloques(
+    graficas,
+    años=None,
+    carpeta=".",
+    procesos=None,
+    ruta=RUTA_CSV,
+    tamaño=TAMAÑO_BLOQUE,
+    forzar=False,
+):
+    """
+    Igual que render() pero lee el CSV por bloques, sin cargar el catálogo completo.
+
+    Cada gráfica solo necesita un resumen pequeño del catálogo: los conteos
+    por mes, los 10 sismos más fuertes de cada año, los sismos de magnitud
+    6.0 o superior y los sismos de la CDMX. Estos resúmenes se acumulan
+    bloque por bloque en una sola lectura del CSV.
+
+    Parameters
+    ----------
+    graficas : list
+        Los nombres de las gráficas a crear, ver GRAFICAS.
+
+    años : list
+        Los años para los mapas anuales de la CDMX.
+
+    carpeta : str
+        La carpeta donde se guardarán las imágenes.
+
+    procesos : int
+        El número de procesos para exportar las imágenes.
+
+    ruta : str
+        La ruta del CSV del SSN.
+
+    tamaño : int
+        El número de renglones por bloque.
+
+    forzar : bool
+        Si es True, exporta las imágenes aunque estén en el caché.
+
+    """
+
+    os.makedirs(carpeta, exist_ok=True)
+
+    acumuladores = dict()
+
+    if "strip_chart" in graficas:
+        acumuladores["strip_chart"] = Subconjunto(lambda df: df["Magnitud"] >= 6.0)
+
+    if "top10" in graficas:
+        acumuladores["top10"] = TopKPorAño(10, 2011, 2023)
+
+    if "cdmx" in graficas or "cdmx_anual" in graficas:
+        acumuladores["cdmx"] = Subconjunto(
+            lambda df: (df["estado"] == "CDMX") & (df.index.year >= 2010)
+        )
+
+    conteos = list()
+
+    if "magnitud" in graficas:
+        conteos = [ConteoPorMes(low, high) for low, high in magnitud.RANGOS]
+
+    with etapa("lectura_por_bloques") as registro:
+        estadisticas = procesar(list(acumuladores.values()) + conteos, ruta, tamaño)
+        registro.renglones = estadisticas["renglones"]
+
+    print(f"{estadisticas['renglones']:,} registros leídos")
+
+    trabajos = list()
+
+    if "strip_chart" in graficas:
+        fig = strip_chart.crear_figura(acumuladores["strip_chart"].resultado())
+        trabajos.append((fig, os.path.join(carpeta, "strip_chart.png")))
+
+    if "top10" in graficas:
+        fig = top10.crear_figura(acumuladores["top10"].resultado())
+        trabajos.append((fig, os.path.join(carpeta, "top10.png")))
+
+    if "cdmx" in acumuladores:
+        df_cdmx = acumuladores["cdmx"].resultado()
+
+        if "cdmx" in graficas:
+            fig = cdmx.crear_mapa(df_cdmx)
+            trabajos.append((fig, os.path.join(carpeta, "cdmx.png")))
+
+        if "cdmx_anual" in graficas:
+            if años is None:
+                años = range(2010, estadisticas["ultimo_año"] + 1)
+
+            # Todos los años comparten el mismo mapa base.
+            for año, spec in cdmx.crear_mapas_anuales(df_cdmx, años):
+                trabajos.append((spec, os.path.join(carpeta, f"cdmx_{año}.png")))
+
+    with etapa("exportacion"):
+        resultados = exportar_imagenes(trabajos, procesos, forzar=forzar)
+
+    for resultado in resultados:
+        imprimir_resultado(resultado)
+
+    if conteos:
+        figuras = [
+            magnitud.figura_desde_conteos(conteo.resultado(), conteo.low, conteo.high)
+            for conteo in conteos
+        ]
+        imagenes = rasterizar_imagenes(figuras, procesos, forzar=forzar)
+        magnitud.combine_images(carpeta, imagenes)
+        print(os.path.join(carpeta, "final.png"))
+
+
+# Los valores por defecto de cada gráfica parametrizable, iguales a los de sus scripts.
+VALORES_POR_DEFECTO = {
+    "cdmx": {"año_inicial": 2010, "salida": "./cdmx.png"},
+    "magnitud": {"rangos": magnitud.RANGOS, "salida": "./final.png"},
+    "strip_chart": {"magnitud_minima": 6.0, "salida": "./strip_chart.png"},
+    "top10": {
+        "año_inicial": 2011,
+        "año_final": 2023,
+        "k": 10,
+        "salida": "./top10.png",
+    },
+}
+
+# Los campos que puede tener una especificación.
+CAMPOS = {
+    "grafica",
+    "año_inicial",
+    "año_final",
+    "magnitud_minima",
+    "magnitud_maxima",
+    "estado",
+    "k",
+    "rangos",
+    "salida",
+    "solo_principales",
+}
+
+
+def completar_spec(spec):
+    """
+    Valida una especificación y le agrega los valores por defecto de su gráfica.
+
+    Parameters
+    ----------
+    spec : dict
+        La especificación, por ejemplo {"grafica": "top10", "año_inicial": 2000}.
+        Los campos con valor None toman el valor por defecto.
+
+    Returns
+    -------
+    dict
+        Una especificación nueva con todos los campos.
+
+    """
+
+    grafica = spec.get("grafica")
+
+    if grafica not in VALORES_POR_DEFECTO:
+        raise ValueError(f"gráfica desconocida: {grafica}")
+
+    desconocidos = set(spec) - CAMPOS
+
+    if desconocidos:
+        raise ValueError(f"campos desconocidos: {', '.join(sorted(desconocidos))}")
+
+    completo = dict.fromkeys(CAMPOS)
+    completo.update(VALORES_POR_DEFECTO[grafica])
+    completo.update(
+        {campo: valor for campo, valor in spec.items() if valor is not None}
+    )
+
+    return completo
+
+
+def filtrar(df, spec):
+    """
+    Filtra el catálogo por los años, magnitudes y estado de una especificación.
+    """
+
+    años = df.index.year
+    filtro = np.ones(len(df), dtype=bool)
+
+    if spec["año_inicial"] is not None:
+        filtro &= años >= spec["año_inicial"]
+
+    if spec["año_final"] is not None:
+        filtro &= años <= spec["año_final"]
+
+    # Comparamos con la misma precisión que las magnitudes (float32).
+    if spec["magnitud_minima"] is not None:
+        filtro &= (df["Magnitud"] >= np.float32(spec["magnitud_minima"])).to_numpy()
+
+    if spec["magnitud_maxima"] is not None:
+        filtro &= (df["Magnitud"] <= np.float32(spec["magnitud_maxima"])).to_numpy()
+
+    if spec["estado"] is not None:
+        filtro &= (df["estado"] == spec["estado"]).to_numpy()
+
+    return df[filtro]
+
+
+def crear_figuras(df, spec):
+    """
+    Crea las figuras de una especificación completa, ver completar_spec().
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El catálogo de sismos. No se modifica.
+
+    spec : dict
+        La especificación de la gráfica.
+
+    Returns
+    -------
+    list
+        Las figuras: una por rango para la gráfica de magnitud y una
+        sola para las demás.
+
+    """
+
+    df = filtrar(df, spec)
+
+    # El título muestra el periodo solicitado o el que cubren los datos.
+    años = df.index.year
+    primero = spec["año_inicial"] or (años.min() if len(df) else "")
+    ultimo = spec["año_final"] or (años.max() if len(df) else "")
+    periodo = f"{primero}-{ultimo}"
+    lugar = spec["estado"] or "México"
+
+    if spec["grafica"] == "cdmx":
+        return [cdmx.crear_mapa(df, spec["año_inicial"], periodo)]
+
+    if spec["grafica"] == "strip_chart":
+        minima = spec["magnitud_minima"]
+        return [
+            strip_chart.crear_figura(
+                df, minima, periodo, lugar, bool(spec["solo_principales"])
+            )
+        ]
+
+    if spec["grafica"] == "top10":
+        return [
+            top10.crear_figura(
+                df, spec["año_inicial"], spec["año_final"], spec["k"], lugar
+            )
+        ]
+
+    return [
+        magnitud.crear_figura(
+            df, low, high, periodo, lugar, bool(spec["solo_principales"])
+        )
+        for low, high in spec["rangos"]
+    ]
+
+
+def ejecutar_specs(specs, df=None, procesos=None, forzar=False):
+    """
+    Crea y exporta varias gráficas en un solo proceso.
+
+    El intérprete, las librerías, el catálogo y kaleido se cargan una sola
+    vez para todas las especificaciones.
+
+    Parameters
+    ----------
+    specs : list
+        Las especificaciones de cada gráfica, ver completar_spec().
+
+    df : pandas.DataFrame
+        El catálogo ya cargado. Si no se especifica se carga desde el disco.
+
+    procesos : int
+        El número de procesos para exportar las imágenes.
+
+    forzar : bool
+        Si es True, exporta las imágenes aunque estén en el caché.
+
+    """
+
+    specs = [completar_spec(spec) for spec in specs]
+
+    if df is None:
+        with etapa("carga") as registro:
+            # Con una sola gráfica solo leemos los años y magnitudes que necesita.
+            if len(specs) == 1:
+                spec = specs[0]
+                df = cargar_catalogo(
+                    año_inicial=spec["año_inicial"],
+                    año_final=spec["año_final"],
+                    magnitud_minima=spec["magnitud_minima"],
+                    magnitud_maxima=spec["magnitud_maxima"],
+                )
+            else:
+                df = cargar_catalogo()
+
+            registro.renglones = len(df)
+
+    with etapa("figuras"):
+        figuras = [crear_figuras(df, spec) for spec in specs]
+
+    for spec in specs:
+        carpeta = os.path.dirname(spec["salida"])
+
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+
+    trabajos = [
+        (figs[0], spec["salida"])
+        for spec, figs in zip(specs, figuras)
+        if spec["grafica"] != "magnitud"
+    ]
+
+    with etapa("exportacion"):
+        resultados = exportar_imagenes(trabajos, procesos, forzar=forzar)
+
+    for resultado in resultados:
+        imprimir_resultado(resultado)
+
+    # Los paneles de todas las gráficas de magnitud se convierten juntos
+    # y después se combinan en la imagen de cada especificación.
+    magnitudes = [
+        (spec, figs)
+        for spec, figs in zip(specs, figuras)
+        if spec["grafica"] == "magnitud"
+    ]
+
+    if magnitudes:
+        with etapa("magnitud.exportacion"):
+            paneles = rasterizar_imagenes(
+                [fig for _, figs in magnitudes for fig in figs], procesos, forzar=forzar
+            )
+
+            inicio = 0
+
+            for spec, figs in magnitudes:
+                carpeta, archivo = os.path.split(spec["salida"])
+                fin = inicio + len(figs)
+                magnitud.combine_images(carpeta or ".", paneles[inicio:fin], archivo)
+                inicio = fin
+
+                print(spec["salida"])
+
+
+def leer_rango(texto):
+    """
+    Convierte un rango de magnitud como "5.0-5.9" en una tupla (5.0, 5.9).
+    """
+
+    try:
+        low, high = (float(valor) for valor in texto.split("-"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"rango inválido: {texto}, usa 5.0-5.9")
+
+    return low, high
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="sismos", description="Genera las gráficas del catálogo de sismos."
+    )
+    parser.add_argument(
+        "--traza",
+        help="Guarda el tiempo y la memoria de cada etapa en un JSON "
+        "(formato de Chrome si termina en .trace.json).",
+    )
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    parser_render = subparsers.add_parser(
+        "render", help="Genera varias gráficas cargando el catálogo una sola vez."
+    )
+    parser_render.add_argument(
+        "graficas", nargs="*", help=f"Gráficas a generar: {', '.join(GRAFICAS)}."
+    )
+    parser_render.add_argument(
+        "--all", action="store_true", help="Genera todas las gráficas."
+    )
+    parser_render.add_argument(
+        "--años", nargs="+", type=int, help="Años para los mapas anuales de la CDMX."
+    )
+    parser_render.add_argument(
+        "--carpeta", default=".", help="Carpeta donde se guardan las imágenes."
+    )
+    parser_render.add_argument(
+        "--procesos",
+        type=int,
+        help="Procesos para exportar las imágenes, por defecto uno por núcleo.",
+    )
+    parser_render.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Lee el CSV por bloques, para catálogos que no caben en memoria.",
+    )
+    parser_render.add_argument(
+        "--bloque",
+        type=int,
+        default=TAMAÑO_BLOQUE,
+        help="Renglones por bloque con --streaming.",
+    )
+    parser_render.add_argument(
+        "--force",
+        dest="forzar",
+        action="store_true",
+        help="Exporta todas las imágenes aunque no hayan cambiado.",
+    )
+
+    parser_ingestar = subparsers.add_parser(
+        "ingestar", help="Agrega al catálogo los sismos nuevos de un CSV del SSN."
+    )
+    parser_ingestar.add_argument("csv", help="El CSV descargado del SSN.")
+    parser_ingestar.add_argument(
+        "--catalogo", default=RUTA_CSV, help="El CSV del catálogo a actualizar."
+    )
+
+    parser_animar = subparsers.add_parser(
+        "animar", help="Crea una animación de los sismos de la CDMX en el tiempo."
+    )
+    parser_animar.add_argument(
+        "--frecuencia",
+        choices=list(animacion.FRECUENCIAS),
+        default="mes",
+        help="La duración de cada cuadro.",
+    )
+    parser_animar.add_argument(
+        "--ventana",
+        type=int,
+        help="Periodos por cuadro. Si no se especifica, los sismos se acumulan.",
+    )
+    parser_animar.add_argument(
+        "--salida", default="./cdmx.gif", help="La animación (.gif, .apng o .mp4)."
+    )
+    parser_animar.add_argument(
+        "--fps", type=int, default=10, help="Cuadros por segundo."
+    )
+    parser_animar.add_argument(
+        "--procesos",
+        type=int,
+        help="Procesos para exportar los cuadros, por defecto uno por núcleo.",
+    )
+
+    # Los argumentos comunes de las gráficas parametrizables.
+    filtros = argparse.ArgumentParser(add_help=False)
+    filtros.add_argument("--año-inicial", type=int, help="El primer año a graficar.")
+    filtros.add_argument("--año-final", type=int, help="El último año a graficar.")
+    filtros.add_argument("--magnitud-minima", type=float, help="La magnitud mínima.")
+    filtros.add_argument("--magnitud-maxima", type=float, help="La magnitud máxima.")
+    filtros.add_argument("--salida", help="La ruta de la imagen.")
+    filtros.add_argument(
+        "--force",
+        dest="forzar",
+        action="store_true",
+        help="Exporta la imagen aunque no haya cambiado.",
+    )
+
+    # Las gráficas por mes de ocurrencia pueden descartar las réplicas.
+    principales = argparse.ArgumentParser(add_help=False)
+    principales.add_argument(
+        "--solo-principales",
+        action="store_true",
+        default=None,
+        help="Descarta las réplicas y precursores (Gardner-Knopoff).",
+    )
+
+    por_estado = argparse.ArgumentParser(add_help=False)
+    por_estado.add_argument(
+        "--estado", choices=ESTADOS, help="La abreviatura del estado, por ejemplo OAX."
+    )
+
+    subparsers.add_parser(
+        "cdmx", parents=[filtros], help="Mapa de los sismos dentro de la CDMX."
+    )
+
+    parser_magnitud = subparsers.add_parser(
+        "magnitud",
+        parents=[filtros, por_estado, principales],
+        help="Sismos por mes de ocurrencia para varios rangos de magnitud.",
+    )
+    parser_magnitud.add_argument(
+        "--rangos",
+        nargs="+",
+        type=leer_rango,
+        help="Rangos de magnitud, por ejemplo 5.0-5.9 6.0-6.9.",
+    )
+
+    subparsers.add_parser(
+        "strip_chart",
+        parents=[filtros, por_estado, principales],
+        help="Sismos por mes de ocurrencia y magnitud.",
+    )
+
+    parser_top10 = subparsers.add_parser(
+        "top10",
+        parents=[filtros, por_estado],
+        help="Los sismos de mayor magnitud de cada año.",
+    )
+    parser_top10.add_argument("-k", type=int, help="El número de sismos por año.")
+
+    parser_lote = subparsers.add_parser(
+        "lote", help="Genera las gráficas de un JSON con varias especificaciones."
+    )
+    parser_lote.add_argument(
+        "archivo",
+        help='El JSON, por ejemplo [{"grafica": "top10", "año_inicial": 2000}].',
+    )
+    parser_lote.add_argument(
+        "--procesos",
+        type=int,
+        help="Procesos para exportar las imágenes, por defecto uno por núcleo.",
+    )
+    parser_lote.add_argument(
+        "--force",
+        dest="forzar",
+        action="store_true",
+        help="Exporta todas las imágenes aunque no hayan cambiado.",
+    )
+
+    args = parser.parse_args()
+
+    if args.traza:
+        activar(args.traza)
+
+    if args.comando == "render":
+        graficas = GRAFICAS if args.all else args.graficas
+
+        if not graficas:
+            parser.error("especifica al menos una gráfica o usa --all")
+
+        for grafica in graficas:
+            if grafica not in GRAFICAS:
+                parser.error(f"gráfica desconocida: {grafica}")
+
+        if args.streaming:
+            render_por_bloques(
+                graficas,
+                args.años,
+                args.carpeta,
+                args.procesos,
+                tamaño=args.bloque,
+                forzar=args.forzar,
+            )
+        else:
+            render(graficas, args.años, args.carpeta, args.procesos, args.forzar)
+
+    elif args.comando == "ingestar":
+        cambios = ingestar_csv(args.csv, args.catalogo)
+
+        for año, renglones in cambios.items():
+            print(f"{año}: {renglones:,} registros nuevos o revisados")
+
+    elif args.comando in VALORES_POR_DEFECTO:
+        spec = {campo: getattr(args, campo) for campo in CAMPOS if hasattr(args, campo)}
+        spec["grafica"] = args.comando
+
+        ejecutar_specs([spec], forzar=args.forzar)
+
+    elif args.comando == "lote":
+        with open(args.archivo, encoding="utf-8") as archivo:
+            specs = json.load(archivo)
+
+        # Validamos todas las especificaciones antes de cargar el catálogo.
+        try:
+            for spec in specs:
+                completar_spec(spec)
+        except ValueError as error:
+            parser.error(str(error))
+
+        ejecutar_specs(specs, procesos=args.procesos, forzar=args.forzar)
+
+    elif args.comando == "animar":
+        animacion.main(
+            args.frecuencia, args.ventana, args.salida, args.fps, args.procesos
+        )
+        print(args.salida)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Este módulo lee el CSV del SSN por bloques para catálogos que no caben en memoria.
+
+Cada bloque se normaliza igual que en catalogo.py y se envía a varios
+acumuladores (conteos por mes, los k sismos más fuertes por año, un
+subconjunto como los sismos de la CDMX, etc.). Solo se mantiene en memoria
+un bloque a la vez más el estado de los acumuladores, y las gráficas que
+se crean con sus resultados son idénticas a las del catálogo completo.
+
+"""
+
+import numpy as np
+import pandas as pd
+
+from catalogo import COLUMNAS_CATEGORICAS, RUTA_CSV, normalizar, unificar_categorias
+from top10 import seleccionar_top_k
+
+
+# El número de renglones por bloque.
+TAMAÑO_BLOQUE = 200_000
+
+
+def leer_por_bloques(ruta=RUTA_CSV, tamaño=TAMAÑO_BLOQUE):
+    """
+    Lee y normaliza el CSV del SSN por bloques.
+
+    Parameters
+    ----------
+    ruta : str
+        La ruta del CSV.
+
+    tamaño : int
+        El número de renglones por bloque.
+
+    Yields
+    ------
+    pandas.DataFrame
+        Cada bloque normalizado con la fecha como índice.
+
+    """
+
+    bloques = pd.read_csv(
+        ruta,
+        parse_dates=["Fecha"],
+        index_col="Fecha",
+        dtype={columna: "category" for columna in COLUMNAS_CATEGORICAS},
+        chunksize=tamaño,
+    )
+
+    with bloques:
+        for bloque in bloques:
+            yield normalizar(bloque)
+
+
+class ConteoPorMes:
+    """
+    Cuenta los sismos por mes de ocurrencia dentro de un rango de magnitud.
+    """
+
+    def __init__(self, low, high):
+        self.low = low
+        self.high = high
+        self.conteos = np.zeros(12, dtype=np.int64)
+
+    def agregar(self, df):
+        meses = df.loc[df["Magnitud"].between(self.low, self.high), "mes"]
+        self.conteos += np.bincount(meses.to_numpy() - 1, minlength=12)
+
+    def resultado(self):
+        return pd.Series(self.conteos, index=range(1, 13))
+
+
+class TopKPorAño:
+    """
+    Conserva los k sismos de mayor magnitud de cada año.
+
+    Los k más fuertes de todo el catálogo siempre están entre los k más
+    fuertes de lo que se ha leído hasta el momento, así que basta con guardar
+    esos candidatos y combinarlos con cada bloque nuevo.
+    """
+
+    def __init__(self, k=10, año_inicial=None, año_final=None):
+        self.k = k
+        self.año_inicial = año_inicial
+        self.año_final = año_final
+        self.candidatos = None
+
+    def agregar(self, df):
+        años = df.index.year
+
+        if self.año_inicial is not None:
+            df = df[años >= self.año_inicial]
+            años = df.index.year
+
+        if self.año_final is not None:
+            df = df[años <= self.año_final]
+
+        # Los candidatos van primero para que los empates favorezcan
+        # a los sismos más antiguos, igual que con el catálogo completo.
+        if self.candidatos is not None:
+            df = unificar_categorias(pd.concat([self.candidatos, df]))
+
+        top = seleccionar_top_k(df, self.k)
+        self.candidatos = top.drop(columns=["grupo", "posicion"]).set_index("Fecha")
+
+    def resultado(self):
+        return self.candidatos
+
+
+class Subconjunto:
+    """
+    Guarda los renglones que cumplen una condición, por ejemplo los sismos de la CDMX.
+    """
+
+    def __init__(self, condicion):
+        self.condicion = condicion
+        self.partes = list()
+
+    def agregar(self, df):
+        self.partes.append(df[self.condicion(df)])
+
+    def resultado(self):
+        return unificar_categorias(pd.concat(self.partes))
+
+
+def procesar(acumuladores, ruta=RUTA_CSV, tamaño=TAMAÑO_BLOQUE):
+    """
+    Lee el CSV una sola vez y envía cada bloque a todos los acumuladores.
+
+    Parameters
+    ----------
+    acumuladores : list
+        Objetos con un método agregar(df), por ejemplo ConteoPorMes.
+
+    ruta : str
+        La ruta del CSV.
+
+    tamaño : int
+        El número de renglones por bloque.
+
+    Returns
+    -------
+    dict
+        El número de renglones leídos y el último año del catálogo.
+
+    """
+
+    renglones = 0
+    ultimo_año = None
+
+    for bloque in leer_por_bloques(ruta, tamaño):
+        for acumulador in acumuladores:
+            acumulador.agregar(bloque)
+
+        renglones += len(bloque)
+
+        if len(bloque):
+            año = int(bloque.index.year.max())
+            ultimo_año = año if ultimo_año is None else max(ultimo_año, año)
+
+    return {"renglones": renglones, "ultimo_año": ultimo_año}
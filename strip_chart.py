@@ -9,9 +9,13 @@ http://www2.ssn.unam.mx:8080/catalogo/
 """
 
 import numpy as np
-import pandas as pd
 import plotly.graph_objects as go
 
+from catalogo import cargar_catalogo
+from instrumentacion import etapa
+from replicas import filtrar_principales
+from grupos import dividir_por_mes
+
 # Este diccionario será utilizado para nuestras
 # etiquetas del eje horizontal.
 MESES = {
@@ -30,29 +34,83 @@ MESES = {
 }
 
 
-def main():
+def main(df=None, solo_principales=False):
+    # Cargamos nuestro dataset de sismos, solo los de magnitud 6.0 o superior.
+    if df is None:
+        with etapa("strip_chart.carga") as registro:
+            df = cargar_catalogo(magnitud_minima=6.0)
+            registro.renglones = len(df)
+
+    with etapa("strip_chart.figura"):
+        fig = crear_figura(df, solo_principales=solo_principales)
+
+    with etapa("strip_chart.exportacion"):
+        fig.write_image("./strip_chart.png")
+
+
+def crear_figura(
+    df,
+    magnitud_minima=6.0,
+    periodo="1900-2024",
+    lugar="México",
+    solo_principales=False,
+):
+    """
+    Crea la gráfica de puntos con los sismos de magnitud 6.0 o superior por mes.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El catálogo de sismos. No se modifica.
+
+    magnitud_minima : float
+        La magnitud mínima de los sismos a graficar.
+
+    periodo : str
+        El periodo que se muestra en el título.
+
+    lugar : str
+        El lugar que se muestra en el título.
+
+    solo_principales : bool
+        Si es True, se descartan las réplicas y precursores de otros sismos,
+        ver replicas.identificar_principales().
+
+    Returns
+    -------
+    plotly.graph_objects.Figure
+        La figura lista para exportarse.
+
+    """
+
     # Creamos 12 tonos de colores tipo hsla, con 100% de saturación
     # 75% de iluminación y 90% de transparencia.
     tonos_de_color = [f"hsla({h}, 100%, 75%, 1.0)" for h in np.linspace(0, 360, 12)]
 
-    # Cargamos nuestro dataset de sismos.
-    df = pd.read_csv("./data.csv", parse_dates=["Fecha"], index_col="Fecha")
-
     # Filtramos todos los sismos sin magnitud.
-    df = df[df["Magnitud"] != "no calculable"].copy()
-
-    # Convertimos las magnitudes a float.
-    df["Magnitud"] = df["Magnitud"].astype(float)
+    df = df[df["Magnitud"].notna()]
 
     # Seleccionamos sismos de magnitud 6.0 o superior.
-    df = df[df["Magnitud"] >= 6.0]
+    df = df[df["Magnitud"] >= magnitud_minima]
+
+    # Las réplicas siempre tienen menor magnitud que su sismo principal,
+    # así que basta con buscarlas entre los sismos ya filtrados.
+    if solo_principales:
+        with etapa("strip_chart.replicas") as registro:
+            df = filtrar_principales(df)
+            registro.renglones = len(df)
+
+    # Dividimos los sismos por mes de ocurrencia recorriendo el DataFrame una sola vez.
+    with etapa("strip_chart.agregacion") as registro:
+        por_mes = dividir_por_mes(df)
+        registro.renglones = len(df)
 
     fig = go.Figure()
 
     # Vamor a iterar sobre todos los meses y extraer los sismos correspondientes.
     for numero, mes in MESES.items():
         # Seleccionamos todos los sismos del mes correspondiente.
-        temp_df = df[df.index.month == numero]
+        temp_df = por_mes[numero]
 
         # Vamos a crear la etiqueta para el eje horizontal.
         # Esta etiqueta es la misma cadena de caracteres repetida el 'numero
@@ -119,7 +177,7 @@ def main():
         font_family="Quicksand",
         font_color="white",
         font_size=18,
-        title_text="Distribución de eventos sísmicos de <b>magnitud ≥ 6.0</b> por mes de ocurrencia en México (1900-2024)",
+        title_text=f"Distribución de eventos sísmicos de <b>magnitud ≥ {magnitud_minima}</b> por mes de ocurrencia en {lugar} ({periodo})",
         title_x=0.5,
         title_y=0.965,
         margin_t=60,
@@ -160,7 +218,7 @@ def main():
         ],
     )
 
-    fig.write_image("./strip_chart.png")
+    return fig
 
 
 if __name__ == "__main__":
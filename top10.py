@@ -7,11 +7,16 @@ Los datos más nuevos se pueden obtener del siguiente enlace:
 http://www2.ssn.unam.mx:8080/catalogo/
 """
 
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 
+from catalogo import cargar_catalogo
+from instrumentacion import etapa
+
 # Este diccionario será utilizado para asignar colores
 # a cada estado de la república.
+# El orden de las llaves es el mismo que el de catalogo.ESTADOS.
 COLORES = {
     "AGS": "#f44336",
     "BC": "#d50000",
@@ -48,50 +53,159 @@ COLORES = {
 }
 
 
-def main():
-    # Cargamos nuestro dataset de sismos.
-    df = pd.read_csv("./data.csv", parse_dates=["Fecha"], index_col="Fecha")
+def main(df=None, año_inicial=2011, año_final=2023, k=10):
+    # Cargamos nuestro dataset de sismos, solo los años que vamos a graficar.
+    if df is None:
+        with etapa("top10.carga") as registro:
+            df = cargar_catalogo(año_inicial=año_inicial, año_final=año_final)
+            registro.renglones = len(df)
+
+    with etapa("top10.figura"):
+        fig = crear_figura(df, año_inicial, año_final, k)
+
+    with etapa("top10.exportacion"):
+        fig.write_image("./top10.png")
+
+
+def seleccionar_top_k(df, k=10, por=None):
+    """
+    Selecciona los k sismos de mayor magnitud de cada grupo en una sola pasada.
+
+    En lugar de filtrar y ordenar todo el catálogo una vez por grupo, se
+    agrupa una sola vez y cada grupo usa una selección parcial (nlargest).
+    Los empates se resuelven a favor del sismo más antiguo, ya que el
+    catálogo está en orden cronológico. Antes se usaba sort_values (quicksort,
+    inestable), el cual los resolvía en un orden arbitrario; por eso cambian
+    los sismos o su posición en las trazas de los años con empates en el
+    límite de los k.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El catálogo de sismos. No se modifica.
+
+    k : int
+        El número de sismos por grupo.
+
+    por : str o array-like
+        La llave de cada grupo: el nombre de una columna (por ejemplo "estado")
+        o un arreglo con un valor por sismo (por ejemplo la década).
+        Por defecto se agrupa por año.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Los sismos seleccionados ordenados por grupo y magnitud, con la fecha
+        como columna y dos columnas nuevas: grupo y posicion (0 a k-1).
+
+    """
 
     # Filtramos todos los sismos sin magnitud.
-    df = df[df["Magnitud"] != "no calculable"].copy()
+    validos = df["Magnitud"].notna().to_numpy()
+    df = df[validos]
+
+    if por is None:
+        llaves = df.index.year
+    elif isinstance(por, str):
+        llaves = df[por]
+    else:
+        llaves = np.asarray(por)[validos]
+
+    # Usamos posiciones en lugar del índice porque las fechas se pueden repetir.
+    magnitudes = pd.Series(df["Magnitud"].to_numpy())
+    llaves = pd.Series(np.asarray(llaves))
+
+    seleccion = magnitudes.groupby(llaves, sort=True).nlargest(k)
+    posiciones = seleccion.index.get_level_values(-1)
+
+    top = df.iloc[posiciones].reset_index()
+    top["grupo"] = seleccion.index.get_level_values(0)
+    top["posicion"] = top.groupby("grupo", sort=False).cumcount()
+
+    return top
+
+
+def crear_etiquetas(top):
+    """
+    Crea el texto de cada círculo: magnitud, estado y fecha (día/mes).
 
-    # Convertimos las magnitudes a float.
-    df["Magnitud"] = df["Magnitud"].astype(float)
+    Parameters
+    ----------
+    top : pandas.DataFrame
+        Los sismos seleccionados por seleccionar_top_k().
 
-    # Extraemos el estado donde ocurrió cada sismo usando una función personalizada.
-    df["estado"] = df["Referencia de localizacion"].apply(
-        lambda x: x.split(",")[-1].strip()
+    Returns
+    -------
+    pandas.Series
+        El texto de cada sismo.
+
+    """
+
+    # Concatenamos columnas completas en lugar de formatear renglón por renglón.
+    return (
+        top["Magnitud"].round(1).astype(str)
+        + "<br><b>"
+        + top["estado"].astype(str)
+        + "</b><br>"
+        + top["Fecha"].dt.strftime("%d/%m")
     )
 
-    fig = go.Figure()
 
-    # iteramos sobre los años que nos interesan.
-    for año in range(2011, 2024):
-        # Creamos un DataFrame con el año correspondiente
-        # ordenamos las magnitudes de mayor a menor y seleccionamos
-        # solo las primeras 10.
-        temp_df = df[df.index.year == año].sort_values("Magnitud", ascending=False)[:10]
-
-        # Reseteamos el índice para que sea un valor del 0 al 9.
-        temp_df.reset_index(inplace=True)
-
-        # Aquí creamos el texto para los círculos usando el nombre del estado extráido previamente.
-        # así como la magnitud y la fecha.
-        temp_df["text"] = temp_df.apply(
-            lambda x: f"{x['Magnitud']:,}<br><b>{x['estado']}</b><br>{x['Fecha']:%d/%m}",
-            axis=1,
-        )
+def crear_figura(df, año_inicial=2011, año_final=2023, k=10, lugar="México"):
+    """
+    Crea la gráfica de círculos con los k sismos de mayor magnitud por año.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        El catálogo de sismos. No se modifica.
+
+    año_inicial : int
+        El primer año a graficar.
+
+    año_final : int
+        El último año a graficar (inclusive).
+
+    k : int
+        El número de sismos por año.
+
+    lugar : str
+        El lugar que se muestra en el título.
 
-        # Aquí definimos el color de cada círculo usando el diccionario de colores.
-        temp_df["color"] = temp_df["estado"].map(COLORES)
+    Returns
+    -------
+    plotly.graph_objects.Figure
+        La figura lista para exportarse.
 
-        # El eje vertical va a ser el año 8 veces.
+    """
+
+    # Seleccionamos los años que nos interesan.
+    años = df.index.year
+    df = df[(años >= año_inicial) & (años <= año_final)]
+
+    # Obtenemos los k sismos más fuertes de todos los años a la vez.
+    with etapa("top10.agregacion") as registro:
+        top = seleccionar_top_k(df, k)
+        registro.renglones = len(df)
+
+    # Aquí creamos el texto para los círculos usando el nombre del estado extráido previamente.
+    # así como la magnitud y la fecha.
+    top["text"] = crear_etiquetas(top)
+
+    # Aquí definimos el color de cada círculo usando el diccionario de colores.
+    top["color"] = top["estado"].astype(object).map(COLORES)
+
+    fig = go.Figure()
+
+    # Creamos una serie por año.
+    for año, temp_df in top.groupby("grupo", sort=True):
+        # El eje vertical va a ser el año repetido una vez por sismo.
         # Esto es como un hack para que nuestra visualización funcione.
-        y = [f"{año:.0f}" for _ in range(10)]
+        y = [f"{año:.0f}"] * len(temp_df)
 
         fig.add_trace(
             go.Scatter(
-                x=temp_df.index,
+                x=temp_df["posicion"],
                 y=y,
                 mode="markers+text",
                 text=temp_df["text"],
@@ -102,8 +216,11 @@ def main():
             )
         )
 
+    # El tamaño de la imagen crece con el número de columnas y de años.
+    filas = año_final - año_inicial + 1
+
     fig.update_xaxes(
-        range=[-0.6, 9.6],
+        range=[-0.6, k - 0.4],
         showticklabels=False,
         ticklen=10,
         zeroline=False,
@@ -116,7 +233,7 @@ def main():
     fig.update_yaxes(
         title="Año del evento sísmico",
         title_font_size=28,
-        range=[-0.6, 12.6],
+        range=[-0.6, filas - 0.4],
         ticks="outside",
         ticklen=10,
         zeroline=False,
@@ -130,12 +247,12 @@ def main():
 
     fig.update_layout(
         showlegend=False,
-        width=1280,
-        height=1600,
+        width=180 + 110 * k,
+        height=170 + 110 * filas,
         font_family="Quicksand",
         font_color="#FFFFFF",
         font_size=18,
-        title_text="Los 10 eventos sísmicos con mayor magnitud<br>registrados en México por año (2011-2023)",
+        title_text=f"Los {k} eventos sísmicos con mayor magnitud<br>registrados en {lugar} por año ({año_inicial}-{año_final})",
         title_x=0.5,
         title_y=0.97,
         margin_t=120,
@@ -176,7 +293,7 @@ def main():
         ],
     )
 
-    fig.write_image("./top10.png")
+    return fig
 
 
 if __name__ == "__main__":